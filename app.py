@@ -1,106 +1,512 @@
 from flask import Flask, request, jsonify, render_template, send_file, Response, stream_with_context
+import asyncio
 import os
-import polib
-from googletrans import Translator
+import re
+import shlex
+import shutil
+import queue
+import sys
 import tempfile
+import threading
 import time
+import uuid
 from werkzeug.utils import secure_filename
 import json
-from datetime import datetime, timedelta
+import logging
+from collections import Counter, deque
+from contextvars import copy_context
+from concurrent.futures import ThreadPoolExecutor
+from backends import shared_backend
+from batching import BatchPacker, build_batch_text, item_size, parse_batch_reply
+from jobs import JobManager, QueueFullError, CANCELLED, COMPLETE, FAILED, DEFAULT_EVENT_TAIL
+from checkpoint import Checkpoint, entry_key
+from rate_limit import (
+    RateLimiter, CircuitBreaker, backoff_delay,
+    DEFAULT_PATH as DEFAULT_RATE_LIMIT_PATH, DEFAULT_RATE, DEFAULT_BURST,
+    DEFAULT_FAILURE_THRESHOLD, DEFAULT_RESET_TIMEOUT
+)
+from dedup import group_entries, expand_groups
+from incremental import load_reference, select_entries
+from edit_journal import EditJournal
+from entry_index import EntryIndex, FILTERS as ENTRY_FILTERS
+from upload_store import UploadStore
+from janitor import StorageJanitor, DEFAULT_QUOTA, DEFAULT_TTL, DEFAULT_SWEEP_INTERVAL
+from archive import (
+    ArchiveError, archive_format, extract_catalogs, split_archive_name, write_archive,
+    ARCHIVE_EXTENSIONS, CATALOG_EXTENSIONS, DEFAULT_MAX_EXTRACT_SIZE
+)
+from streaming import (
+    POStreamWriter, copy_catalog, estimate_entries, read_po_chunks, DEFAULT_CHUNK_ENTRIES
+)
+from translation_memory import TranslationMemory, DEFAULT_PATH as DEFAULT_TM_PATH
+from text_filter import filter_entries, mask, unmask, unmask_parts
+from mo_file import read_mofile
+from metrics import MetricsRegistry, DEFAULT_PATH as DEFAULT_METRICS_PATH, DEFAULT_FLUSH_INTERVAL
+from structured_log import current_job, log_event
+from tracing import NULL_SPAN, Tracer, current_tracer, span
 
 app = Flask(__name__)
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size（单次请求，大文件分块上传）
+# 分块上传允许的文件总大小
+app.config['MAX_UPLOAD_SIZE'] = int(os.environ.get('MAX_UPLOAD_SIZE', 1024 * 1024 * 1024))
+# 进度事件的最短间隔（秒）和单个事件中新译文的最大字节数
+app.config['SSE_MIN_INTERVAL'] = float(os.environ.get('SSE_MIN_INTERVAL', 1.0))
+app.config['SSE_MAX_EVENT_BYTES'] = int(os.environ.get('SSE_MAX_EVENT_BYTES', 32 * 1024))
+# 压缩包解压后的总大小上限
+app.config['MAX_ARCHIVE_EXTRACT_SIZE'] = DEFAULT_MAX_EXTRACT_SIZE
+# 分块上传时每个分块的大小（须小于 MAX_CONTENT_LENGTH）
+app.config['UPLOAD_CHUNK_SIZE'] = 8 * 1024 * 1024
+# 流式翻译时每次解析的条目数
+app.config['STREAM_CHUNK_ENTRIES'] = DEFAULT_CHUNK_ENTRIES
 app.config['UPLOAD_FOLDER'] = tempfile.gettempdir()
+# 任务的中间文件（解压的源文件、未打包的结果）和翻译结果目录；后台清理只接管此目录，不扫描系统临时目录中的其他文件
+app.config['RESULTS_FOLDER'] = os.environ.get(
+    'RESULTS_FOLDER', os.path.join(app.config['UPLOAD_FOLDER'], 'mopo-results')
+)
+# 同时在途的翻译批次数（受翻译后端限流约束，不宜过大）
+app.config['TRANSLATE_WORKERS'] = int(os.environ.get('TRANSLATE_WORKERS', 4))
+# 以异步方式翻译批次（所有批次在一个事件循环中并发，不为每个在途批次占用线程），以及每个目标语言的在途批次数
+app.config['TRANSLATE_ASYNC'] = os.environ.get('TRANSLATE_ASYNC', '0') == '1'
+app.config['TRANSLATE_ASYNC_CONCURRENCY'] = int(os.environ.get('TRANSLATE_ASYNC_CONCURRENCY', 16))
+# 每批请求的初始字符预算，运行中根据请求结果自适应调整
+app.config['BATCH_CHAR_BUDGET'] = int(os.environ.get('BATCH_CHAR_BUDGET', 2000))
+app.config['TRANSLATION_MEMORY_PATH'] = DEFAULT_TM_PATH
+# 同时执行的翻译任务数，以及允许排队的任务总数
+app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', 2))
+app.config['JOB_QUEUE_LIMIT'] = int(os.environ.get('JOB_QUEUE_LIMIT', 100))
+# 任务保存在进程内存中，默认拒绝以多个 worker 进程启动（负载均衡保证同一任务的请求路由到同一 worker 时可设为 1）
+app.config['ALLOW_MULTIPLE_WORKERS'] = os.environ.get('ALLOW_MULTIPLE_WORKERS', '0') == '1'
+# 每个任务在内存中保留的最近进度事件数
+app.config['JOB_EVENT_TAIL'] = DEFAULT_EVENT_TAIL
+# 翻译后端：后端名称（google / fake）或 TranslationBackend 实例
+app.config['TRANSLATION_BACKEND'] = os.environ.get('TRANSLATION_BACKEND', 'google')
+# 翻译服务的全局限流（所有任务和进程共享）与熔断
+app.config['RATE_LIMIT_PATH'] = DEFAULT_RATE_LIMIT_PATH
+app.config['RATE_LIMIT_PER_SECOND'] = DEFAULT_RATE
+app.config['RATE_LIMIT_BURST'] = DEFAULT_BURST
+app.config['CIRCUIT_FAILURE_THRESHOLD'] = DEFAULT_FAILURE_THRESHOLD
+app.config['CIRCUIT_RESET_TIMEOUT'] = DEFAULT_RESET_TIMEOUT
+# 单个批次的最大重试次数，重试间隔按指数退避（带随机抖动）
+app.config['TRANSLATE_MAX_RETRIES'] = int(os.environ.get('TRANSLATE_MAX_RETRIES', 3))
+app.config['RETRY_BASE_DELAY'] = float(os.environ.get('RETRY_BASE_DELAY', 1))
+app.config['RETRY_MAX_DELAY'] = float(os.environ.get('RETRY_MAX_DELAY', 30))
+# 按内容寻址的上传文件和翻译结果存储
+app.config['UPLOAD_STORE_FOLDER'] = os.environ.get(
+    'UPLOAD_STORE_FOLDER', os.path.join(tempfile.gettempdir(), 'mopo-store')
+)
+# 存储文件清单（SQLite）及后台清理：总大小上限（字节）、未访问多久后删除（秒）、清理间隔（秒）
+app.config['STORAGE_MANIFEST_PATH'] = os.environ.get(
+    'STORAGE_MANIFEST_PATH', os.path.join(app.config['UPLOAD_STORE_FOLDER'], 'manifest.sqlite3')
+)
+app.config['STORAGE_QUOTA'] = DEFAULT_QUOTA
+app.config['STORAGE_TTL'] = DEFAULT_TTL
+app.config['STORAGE_SWEEP_INTERVAL'] = DEFAULT_SWEEP_INTERVAL
+# 在本地处理无需翻译的条目（只有占位符、网址、数字、代码标识符等），并在请求中保护占位符和标记
+app.config['FILTER_UNTRANSLATABLE'] = os.environ.get('FILTER_UNTRANSLATABLE', '1') != '0'
+# 指标的跨进程汇总存储（SQLite）及每个进程写入的间隔（秒）
+app.config['METRICS_PATH'] = DEFAULT_METRICS_PATH
+app.config['METRICS_FLUSH_INTERVAL'] = DEFAULT_FLUSH_INTERVAL
+# 为所有任务记录性能跟踪（也可以在提交任务时用 trace 参数单独开启），通过 /jobs/<id>/trace 下载
+app.config['TRACE_JOBS'] = os.environ.get('TRACE_JOBS', '0') == '1'
+# 翻译检查点目录，任务中断后重新提交同一文件时从检查点继续
+app.config['CHECKPOINT_FOLDER'] = os.environ.get(
+    'CHECKPOINT_FOLDER', os.path.join(tempfile.gettempdir(), 'mopo-checkpoints')
+)
+
+# 翻译语言（TARGET_LANG 为未指定目标语言时的默认值）
+SOURCE_LANG = 'auto'
+TARGET_LANG = 'zh-cn'
+# 目标语言代码的格式，如 ja、zh-cn、pt_BR
+LANG_PATTERN = re.compile(r'[A-Za-z]{2,3}([-_][A-Za-z0-9]{2,8})*')
+
+# 持久化翻译记忆库，所有翻译请求共用
+translation_memory = TranslationMemory(app.config['TRANSLATION_MEMORY_PATH'])
+
+# 上传文件和翻译结果存储
+upload_store = UploadStore(app.config['UPLOAD_STORE_FOLDER'])
+
+# 所有翻译请求先经过熔断器和限流器
+rate_limiter = RateLimiter(
+    app.config['RATE_LIMIT_PATH'],
+    rate=app.config['RATE_LIMIT_PER_SECOND'],
+    burst=app.config['RATE_LIMIT_BURST']
+)
+circuit_breaker = CircuitBreaker(
+    app.config['RATE_LIMIT_PATH'],
+    failure_threshold=app.config['CIRCUIT_FAILURE_THRESHOLD'],
+    reset_timeout=app.config['CIRCUIT_RESET_TIMEOUT']
+)
+
+# 指标，各进程（gunicorn worker）的值汇总后由 /metrics 导出
+metrics = MetricsRegistry(app.config['METRICS_PATH'], app.config['METRICS_FLUSH_INTERVAL'])
+UPLOAD_BYTES = metrics.counter('mopo_upload_bytes_total', '接收的上传字节数', ('kind',))
+UPLOAD_SECONDS = metrics.histogram('mopo_upload_seconds', '上传请求的处理耗时', ('kind',))
+PARSE_SECONDS = metrics.histogram('mopo_parse_seconds', '解压压缩包或解析一块源文件条目的耗时', ('format',))
+BATCH_SECONDS = metrics.histogram('mopo_batch_seconds', '翻译一个批次的总耗时（含重试和回退）', ('outcome',))
+BATCH_ENTRIES = metrics.histogram(
+    'mopo_batch_entries', '每个批次的原文数', buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000)
+)
+REQUEST_SECONDS = metrics.histogram('mopo_backend_request_seconds', '单次翻译请求的耗时（不含限流等待）', ('outcome',))
+REQUEST_BYTES = metrics.counter('mopo_backend_request_bytes_total', '发送给翻译服务的字节数')
+WAIT_SECONDS = metrics.counter('mopo_backend_wait_seconds_total', '翻译请求等待限流和熔断的总时间', ('reason',))
+RETRIES = metrics.counter('mopo_batch_retries_total', '批次重试次数', ('reason',))
+FALLBACKS = metrics.counter('mopo_fallbacks_total', '译文分段不匹配后的回退次数', ('kind',))
+SAVE_SECONDS = metrics.histogram('mopo_save_seconds', '写出翻译结果的耗时', ('format',))
+DOWNLOAD_SECONDS = metrics.histogram('mopo_download_seconds', '下载请求的处理耗时（含合并编辑）', ('kind',))
+DOWNLOAD_BYTES = metrics.counter('mopo_download_bytes_total', '下载的文件字节数', ('kind',))
+JOBS_IN_FLIGHT = metrics.gauge('mopo_jobs_in_flight', '正在执行的翻译任务数')
+JOBS = metrics.counter('mopo_jobs_total', '结束的翻译任务数', ('status',))
+JOB_SECONDS = metrics.histogram(
+    'mopo_job_seconds', '翻译任务的执行耗时', ('status',), buckets=(1, 5, 10, 30, 60, 300, 600, 1800, 3600, 7200)
+)
+ENTRIES = metrics.counter('mopo_entries_total', '翻译任务处理的条目数（按处理方式）', ('source',))
+EVICTED_FILES = metrics.counter('mopo_storage_evicted_files_total', '后台清理删除的存储文件数', ('kind', 'reason'))
+EVICTED_BYTES = metrics.counter('mopo_storage_evicted_bytes_total', '后台清理释放的字节数', ('reason',))
+
+def record_eviction(kind, size, reason):
+    """记录后台清理删除的文件"""
+    EVICTED_FILES.inc(kind=kind, reason=reason)
+    EVICTED_BYTES.inc(size, reason=reason)
+
+# 上传文件、翻译结果、条目索引、编辑日志等的清单，后台按配额和有效期清理，未结束任务的文件受保护
+storage = StorageJanitor(
+    app.config['STORAGE_MANIFEST_PATH'],
+    quota=app.config['STORAGE_QUOTA'],
+    ttl=app.config['STORAGE_TTL'],
+    sweep_interval=app.config['STORAGE_SWEEP_INTERVAL'],
+    active_jobs=lambda: [
+        (job.id, [job.params['filepath'], job.params.get('reference_filepath')])
+        for job in job_manager.active_jobs()
+    ],
+    on_evict=record_eviction,
+    # 启用清单之前留下的文件在清理线程启动时登记一次
+    adopt_folders=[
+        (upload_store.blob_folder, 'upload', None),
+        (upload_store.result_folder, 'output', None),
+        (os.path.join(app.config['UPLOAD_FOLDER'], 'mopo-index'), 'index', None),
+        (os.path.join(app.config['UPLOAD_FOLDER'], 'mopo-journals'), 'journal', None),
+        (os.path.join(app.config['UPLOAD_FOLDER'], 'mopo-uploads'), 'upload_part', None),
+        (app.config['CHECKPOINT_FOLDER'], 'checkpoint', None),
+        (app.config['RESULTS_FOLDER'], 'output', None),
+    ]
+)
+
+# 存储中的文件扩展名（压缩包只保留最后一个扩展名，如 .tar.gz 存为 .gz）
+UPLOAD_EXTENSIONS = CATALOG_EXTENSIONS + tuple(os.path.splitext(ext)[1] for ext, _ in ARCHIVE_EXTENSIONS)
 
 def allowed_file(filename):
-    """检查文件是否允许上传"""
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in {'po', 'mo'}
-
-def translate_batch(entries, start_idx, batch_size):
-    """批量翻译条目"""
-    translator = None
-    max_retries = 3
-    retry_delay = 2  # 重试延迟秒数
+    """检查文件是否允许上传（PO/MO文件或包含它们的压缩包）"""
+    return '.' in filename and (filename.rsplit('.', 1)[1].lower() in {'po', 'mo'} or archive_format(filename) is not None)
+
+def limiter_state():
+    """限流器和熔断器的当前状态"""
+    state = rate_limiter.state()
+    state.update(circuit_breaker.state())
+    return state
+
+def record_waits(stats, circuit_wait, throttle_wait):
+    """累计请求前等待熔断和限流的时间"""
+    stats['circuit_wait'] += circuit_wait
+    stats['throttle_wait'] += throttle_wait
+    if circuit_wait:
+        WAIT_SECONDS.inc(circuit_wait, reason='circuit')
+    if throttle_wait:
+        WAIT_SECONDS.inc(throttle_wait, reason='throttle')
+
+def record_reply(translated_text, request_start):
+    """记录请求结果（熔断器状态和请求耗时），返回请求耗时"""
+    request_latency = time.time() - request_start
+    if translated_text:
+        circuit_breaker.record_success()
+    else:
+        circuit_breaker.record_failure()
+    REQUEST_SECONDS.observe(request_latency, outcome='success' if translated_text else 'empty')
+    return request_latency
+
+def record_error(request_start):
+    """记录失败的请求"""
+    circuit_breaker.record_failure()
+    REQUEST_SECONDS.observe(time.time() - request_start, outcome='error')
+
+def request_translation(translator, text, stats, dest=TARGET_LANG):
+    """经过熔断器和限流器后发送一次翻译请求，返回 (译文, 请求耗时)
+
+    请求耗时不含等待限流的时间，等待时间累计到 stats 中。
+    """
+    with span('circuit_wait', 'wait'):
+        circuit_wait = circuit_breaker.wait()
+    with span('throttle_wait', 'wait'):
+        throttle_wait = rate_limiter.acquire()
+    record_waits(stats, circuit_wait, throttle_wait)
+    REQUEST_BYTES.inc(len(text.encode('utf-8')))
+    request_start = time.time()
+    try:
+        with span('backend_request', 'request', chars=len(text), dest=dest) as request_span:
+            translated_text = translator.translate(text, dest=dest, src=SOURCE_LANG)
+            request_span.set(empty=not translated_text)
+    except Exception:
+        record_error(request_start)
+        raise
+    return translated_text, record_reply(translated_text, request_start)
+
+async def request_translation_async(translator, text, stats, dest=TARGET_LANG):
+    """request_translation() 的异步版本，等待限流和请求期间不占用线程"""
+    with span('circuit_wait', 'wait'):
+        circuit_wait = await circuit_breaker.wait_async()
+    with span('throttle_wait', 'wait'):
+        throttle_wait = await rate_limiter.acquire_async()
+    record_waits(stats, circuit_wait, throttle_wait)
+    REQUEST_BYTES.inc(len(text.encode('utf-8')))
+    request_start = time.time()
+    try:
+        with span('backend_request', 'request', chars=len(text), dest=dest) as request_span:
+            translated_text = await translator.translate_async(text, dest=dest, src=SOURCE_LANG)
+            request_span.set(empty=not translated_text)
+    except Exception:
+        # 熔断器状态保存在SQLite中，在线程中更新，不阻塞事件循环
+        await asyncio.to_thread(record_error, request_start)
+        raise
+    return translated_text, await asyncio.to_thread(record_reply, translated_text, request_start)
+
+# batch_steps 产出的操作：发送翻译请求、等待重试
+REQUEST = 'request'
+SLEEP = 'sleep'
+
+def batch_steps(batch, packer, stats, dest):
+    """批量翻译的处理过程（重试、回退和拆分），本身不发送请求也不等待，由同步或异步的执行方完成
+
+    产出 (REQUEST, 文本) 时执行方发送翻译请求，送回 (译文, 请求耗时) 或抛入请求的异常；
+    产出 (SLEEP, 秒数) 时执行方等待后继续。返回批次是否翻译成功。
+    """
+    max_retries = app.config['TRANSLATE_MAX_RETRIES']
     
-    # 收集这个批次的所有条目
-    batch = entries[start_idx:start_idx + batch_size]
+    # 只翻译有原文的条目
+    batch = [entry for entry in batch if entry.msgid and entry.msgid.strip()]
+    if not batch:
+        return True
     
     for retry in range(max_retries):
         try:
-            if translator is None:
-                translator = Translator()
-            
-            # 使用特殊分隔符
-            separator = "\n=+=+=+=+=\n"
-            
-            # 组合文本时添加索引标记
-            combined_texts = []
-            for i, entry in enumerate(batch):
-                if entry.msgid and entry.msgid.strip():
-                    # 在每个文本前添加索引标记
-                    marked_text = f"[{i}]{entry.msgid}"
-                    combined_texts.append(marked_text)
-            
-            if not combined_texts:
-                return True
-            
-            combined_text = separator.join(combined_texts)
+            # 组合文本时添加索引标记，占位符和标记替换为编号标记以免被翻译服务改写
+            masks = [mask(entry.msgid) if app.config['FILTER_UNTRANSLATABLE'] else (entry.msgid, []) for entry in batch]
+            combined_text = build_batch_text([text for text, _ in masks])
             
             # 执行翻译
-            translation = translator.translate(combined_text, dest='zh-cn')
+            translated_text, request_latency = yield REQUEST, combined_text
             
-            if translation and translation.text:
-                # 分割并处理翻译结果
-                translated_parts = translation.text.split(separator)
-                
-                # 验证翻译结果数量
-                if len(translated_parts) == len(combined_texts):
-                    # 处理每个翻译结果
-                    for i, (entry, translated_part) in enumerate(zip(batch, translated_parts)):
-                        if entry.msgid and entry.msgid.strip():
-                            # 去除可能的索引标记和空白
-                            cleaned_text = translated_part.strip()
-                            if cleaned_text.startswith(f"[{i}]"):
-                                cleaned_text = cleaned_text[len(f"[{i}]"):].strip()
-                            entry.msgstr = cleaned_text
-                    return True
-                else:
-                    print(f"警告：翻译结果数量不匹配（原文：{len(combined_texts)}，译文：{len(translated_parts)}）")
-                    # 如果数量不匹配，单独翻译每个条目
-                    for entry in batch:
-                        if entry.msgid and entry.msgid.strip():
-                            single_translation = translator.translate(entry.msgid, dest='zh-cn')
-                            if single_translation and single_translation.text:
-                                entry.msgstr = single_translation.text.strip()
+            if translated_text:
+                # 按索引标记解析译文并还原占位符，能匹配上的部分直接保留
+                translated_parts = unmask_parts(parse_batch_reply(translated_text, len(batch)), masks)
+                for i, cleaned_text in translated_parts.items():
+                    batch[i].msgstr = cleaned_text
+                    
+                missing = [entry for i, entry in enumerate(batch) if i not in translated_parts]
+                if not missing:
+                    if packer:
+                        packer.record_success(request_latency, len(combined_text))
                     return True
+                    
+                log_event(
+                    'batch_mismatch',
+                    f"翻译结果数量不匹配（原文：{len(batch)}，匹配：{len(translated_parts)}），重新翻译缺失的条目",
+                    logging.WARNING, entries=len(batch), matched=len(translated_parts), dest=dest
+                )
+                if packer:
+                    packer.record_mismatch()
+                stats['fallbacks'] += 1
+                stats['rebatched_entries'] += len(missing)
+                
+                if len(missing) < len(batch):
+                    # 只重新翻译缺失的条目
+                    FALLBACKS.inc(kind='missing')
+                    return (yield from batch_steps(missing, packer, stats, dest))
+                if len(batch) > 1:
+                    # 译文完全无法解析时，将批次分成两半重试
+                    FALLBACKS.inc(kind='split')
+                    mid = len(batch) // 2
+                    first = yield from batch_steps(batch[:mid], packer, stats, dest)
+                    second = yield from batch_steps(batch[mid:], packer, stats, dest)
+                    return first and second
+                # 单个条目丢失了索引标记或占位符，不加索引标记单独翻译（占位符仍然保护）
+                FALLBACKS.inc(kind='single')
+                single_text, tokens = masks[0]
+                single_translation, _ = yield REQUEST, single_text
+                if single_translation:
+                    restored = unmask(single_translation.strip(), tokens)
+                    if restored is not None:
+                        batch[0].msgstr = restored
+                        return True
+                    # 译文破坏了占位符，不能使用
+                    RETRIES.inc(reason='placeholder')
+                    log_event(
+                        'batch_placeholder_broken', f"译文中的占位符或标记不完整 (重试 {retry + 1}/{max_retries})",
+                        logging.WARNING, dest=dest
+                    )
+                    if retry < max_retries - 1:
+                        yield SLEEP, backoff_delay(retry, app.config['RETRY_BASE_DELAY'], app.config['RETRY_MAX_DELAY'])
+                    continue
             
-            time.sleep(0.5)  # 批次间延迟
+            RETRIES.inc(reason='empty')
+            log_event('batch_empty', f"翻译结果为空 (重试 {retry + 1}/{max_retries})", logging.WARNING, dest=dest)
             
         except Exception as e:
-            print(f"批次翻译出错 (重试 {retry + 1}/{max_retries}): {str(e)}")
-            translator = None  # 重置翻译器
-            if retry < max_retries - 1:
-                time.sleep(retry_delay)
-            continue
+            RETRIES.inc(reason='error')
+            log_event(
+                'batch_error', f"批次翻译出错 (重试 {retry + 1}/{max_retries}): {str(e)}", logging.WARNING,
+                dest=dest, error=type(e).__name__
+            )
+            if packer:
+                packer.record_failure()
+                # 批次超出缩减后的预算时，按新预算拆分后重新翻译
+                if len(batch) > 1 and sum(item_size(item) for item in batch) > packer.budget:
+                    results = []
+                    for sub_batch in packer.pack(batch):
+                        results.append((yield from batch_steps(sub_batch, packer, stats, dest)))
+                    return all(results)
+            # 出错的连接由翻译后端的连接池重建，这里直接重试
+            
+        if retry < max_retries - 1:
+            yield SLEEP, backoff_delay(retry, app.config['RETRY_BASE_DELAY'], app.config['RETRY_MAX_DELAY'])
     
-    print("达到最大重试次数，跳过当前批次")
+    log_event('batch_failed', "达到最大重试次数，跳过当前批次", logging.ERROR, entries=len(batch), dest=dest)
     return False
 
-def cleanup_old_files():
-    """清理超过1天的临时文件"""
-    now = datetime.now()
-    upload_dir = os.path.join(os.path.dirname(__file__), 'uploads')
-    if not os.path.exists(upload_dir):
-        return
-        
-    for filename in os.listdir(upload_dir):
-        file_path = os.path.join(upload_dir, filename)
-        file_modified = datetime.fromtimestamp(os.path.getmtime(file_path))
-        if now - file_modified > timedelta(days=1):
-            try:
-                os.remove(file_path)
-            except:
-                pass
+def translation_backend():
+    """进程内共用的翻译后端，所有批次和任务共用其连接"""
+    return shared_backend(app.config['TRANSLATION_BACKEND'])
+
+def translate_batch(batch, packer=None, stats=None, dest=TARGET_LANG):
+    """批量翻译条目为目标语言 dest
+
+    packer 用于反馈请求结果以调整批次大小，
+    stats（Counter）用于统计分段不匹配后的重新翻译次数和限流等待时间。
+    """
+    if stats is None:
+        stats = Counter()
+    translator = translation_backend()
+    steps = batch_steps(batch, packer, stats, dest)
+    reply = error = None
+    try:
+        while True:
+            action, value = steps.throw(error) if error is not None else steps.send(reply)
+            reply = error = None
+            if action == REQUEST:
+                try:
+                    reply = request_translation(translator, value, stats, dest)
+                except Exception as e:
+                    error = e
+            else:
+                with span('retry_backoff', 'wait'):
+                    time.sleep(value)
+    except StopIteration as stop:
+        return stop.value
+
+async def translate_batch_async(batch, packer=None, stats=None, dest=TARGET_LANG):
+    """translate_batch() 的异步版本，请求和等待期间不占用线程"""
+    if stats is None:
+        stats = Counter()
+    translator = translation_backend()
+    steps = batch_steps(batch, packer, stats, dest)
+    reply = error = None
+    try:
+        while True:
+            action, value = steps.throw(error) if error is not None else steps.send(reply)
+            reply = error = None
+            if action == REQUEST:
+                try:
+                    reply = await request_translation_async(translator, value, stats, dest)
+                except Exception as e:
+                    error = e
+            else:
+                with span('retry_backoff', 'wait'):
+                    await asyncio.sleep(value)
+    except StopIteration as stop:
+        return stop.value
+
+def run_batch(batch, packer=None, stats=None, dest=TARGET_LANG):
+    """翻译一个批次，记录批次耗时和大小"""
+    start = time.time()
+    with span('batch', 'batch', entries=len(batch), dest=dest) as batch_span:
+        success = translate_batch(batch, packer, stats, dest)
+        batch_span.set(success=success, fallbacks=stats['fallbacks'])
+    BATCH_SECONDS.observe(time.time() - start, outcome='success' if success else 'failure')
+    BATCH_ENTRIES.observe(len(batch))
+    return success
+
+async def run_batch_async(batch, packer=None, stats=None, dest=TARGET_LANG):
+    """run_batch() 的异步版本"""
+    start = time.time()
+    with span('batch', 'batch', entries=len(batch), dest=dest) as batch_span:
+        success = await translate_batch_async(batch, packer, stats, dest)
+        batch_span.set(success=success, fallbacks=stats['fallbacks'])
+    BATCH_SECONDS.observe(time.time() - start, outcome='success' if success else 'failure')
+    BATCH_ENTRIES.observe(len(batch))
+    return success
+
+_event_loop = None
+_event_loop_lock = threading.Lock()
+
+def event_loop():
+    """异步翻译批次共用的事件循环，在后台线程中运行（首次使用时启动，避免在 gunicorn fork 之前创建线程）"""
+    global _event_loop
+    with _event_loop_lock:
+        if _event_loop is None:
+            _event_loop = asyncio.new_event_loop()
+            threading.Thread(target=_event_loop.run_forever, name='translate-async', daemon=True).start()
+        return _event_loop
+
+def dispatch_batches(batches, workers, packer=None, dest=TARGET_LANG):
+    """并发分发翻译批次，按提交顺序依次产出 (起始索引, 批次, 是否成功, 批次统计)
+
+    TRANSLATE_ASYNC 开启时所有批次在共用的事件循环中并发翻译，在途批次数为 TRANSLATE_ASYNC_CONCURRENCY，
+    不再为每个在途批次占用一个线程；否则使用 workers 个工作线程。
+    """
+    if app.config['TRANSLATE_ASYNC']:
+        loop = event_loop()
+        max_in_flight = max(1, app.config['TRANSLATE_ASYNC_CONCURRENCY'])
+        # 协程在提交时的上下文副本中运行，日志带有当前任务ID，跟踪记录写入当前任务
+        submit = lambda batch, stats: asyncio.run_coroutine_threadsafe(
+            run_batch_async(batch, packer, stats, dest), loop
+        )
+        executor = None
+    else:
+        # 在途批次数为工作线程数的两倍，保证队首批次较慢时其余线程不会空闲
+        max_in_flight = workers * 2
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"batch-{dest}")
+        # 在上下文中执行，工作线程的日志带有当前任务ID，跟踪记录写入当前任务
+        submit = lambda batch, stats: executor.submit(copy_context().run, run_batch, batch, packer, stats, dest)
+    in_flight = deque()
+    try:
+        # 批次按需从 batches 中取出，保证使用最新的批次预算
+        start = 0
+        for batch in batches:
+            # 每个批次使用独立的统计对象，由调用方在主线程中汇总
+            stats = Counter()
+            future = submit(batch, stats)
+            in_flight.append((start, batch, stats, future))
+            start += len(batch)
+            
+            if len(in_flight) >= max_in_flight:
+                batch_start, batch, stats, future = in_flight.popleft()
+                with span('wait_batch', 'wait'):
+                    success = future.result()
+                yield batch_start, batch, success, stats
+                
+        while in_flight:
+            batch_start, batch, stats, future = in_flight.popleft()
+            with span('wait_batch', 'wait'):
+                success = future.result()
+            yield batch_start, batch, success, stats
+    finally:
+        # 客户端断开时取消尚未完成的批次
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        for *_, future in in_flight:
+            future.cancel()
+
+def request_owner():
+    """当前请求所属的用户，用于任务的公平调度"""
+    return request.headers.get('X-User-Id') or request.remote_addr or 'anonymous'
 
 @app.route('/')
 def index():
@@ -108,6 +514,7 @@ def index():
     return render_template('index.html')
 
 @app.route('/upload', methods=['POST'])
+@UPLOAD_SECONDS.time(kind='single')
 def upload_file():
     """处理文件上传"""
     if 'file' not in request.files:
@@ -121,235 +528,1136 @@ def upload_file():
         return jsonify({'error': '不支持的文件类型'}), 400
         
     try:
-        # 保存上传的文件
+        # 按内容哈希保存上传的文件，同名文件不会互相覆盖
         filename = secure_filename(file.filename)
-        temp_input = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(temp_input)
+        file_hash, stored_path = upload_store.save_stream(file.stream, filename)
+        storage.register(stored_path, 'upload')
+        UPLOAD_BYTES.inc(os.path.getsize(stored_path), kind='single')
         
         # 返回文件路径和名称
         return jsonify({
             'status': 'success',
-            'filepath': temp_input,
-            'filename': filename
+            'filepath': stored_path,
+            'filename': filename,
+            'file_hash': file_hash
         })
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/translate', methods=['POST'])
-def translate():
-    """处理翻译请求"""
-    data = request.get_json()
-    filepath = data.get('filepath')
-    filename = data.get('filename')
+def upload_session_path(upload_id):
+    """分块上传的临时文件路径（不含扩展名），上传ID无效时返回 None"""
+    if not re.fullmatch(r'[0-9a-f]{32}', upload_id):
+        return None
+    return os.path.join(app.config['UPLOAD_FOLDER'], 'mopo-uploads', upload_id)
+
+@app.route('/uploads', methods=['POST'])
+def create_upload():
+    """开始分块上传（用于超过单次请求大小限制的文件），返回上传ID"""
+    data = request.get_json() or {}
+    filename = data.get('filename') or ''
+    if not filename:
+        return jsonify({'error': '没有选择文件'}), 400
+    if not allowed_file(filename):
+        return jsonify({'error': '不支持的文件类型'}), 400
+    if int(data.get('size') or 0) > app.config['MAX_UPLOAD_SIZE']:
+        return jsonify({'error': '文件过大'}), 413
+        
+    upload_id = uuid.uuid4().hex
+    session_path = upload_session_path(upload_id)
+    os.makedirs(os.path.dirname(session_path), exist_ok=True)
+    with open(f"{session_path}.json", 'w', encoding='utf-8') as f:
+        json.dump({'filename': secure_filename(filename)}, f)
+    open(f"{session_path}.part", 'wb').close()
+    storage.register(f"{session_path}.json", 'upload_part')
+    storage.register(f"{session_path}.part", 'upload_part')
     
-    if not filepath or not os.path.exists(filepath):
-        return jsonify({'error': '文件不存在'}), 400
+    return jsonify({
+        'upload_id': upload_id,
+        'chunk_size': app.config['UPLOAD_CHUNK_SIZE']
+    })
+
+@app.route('/uploads/<upload_id>', methods=['PUT'])
+@UPLOAD_SECONDS.time(kind='chunk')
+def upload_chunk(upload_id):
+    """追加一个分块；offset 必须等于已接收的字节数，失败的分块可以安全重发"""
+    session_path = upload_session_path(upload_id)
+    if session_path is None or not os.path.exists(f"{session_path}.part"):
+        return jsonify({'error': '上传不存在'}), 404
         
-    def generate():
-        try:
-            # 加载PO/MO文件
-            is_mo = filename.endswith('.mo')
-            po_file = polib.mofile(filepath) if is_mo else polib.pofile(filepath)
-            
-            entries = [entry for entry in po_file if entry.msgid and entry.msgid.strip()]
-            total_entries = len(entries)
-            processed_entries = 0
-            batch_size = 50  # 每批处理的条目数
-            failed_entries = []
+    part_path = f"{session_path}.part"
+    received = os.path.getsize(part_path)
+    if request.args.get('offset', type=int) != received:
+        return jsonify({'error': '分块顺序不正确', 'received': received}), 409
+        
+    # 直接把请求体写入文件，不在内存中缓存整个分块
+    with open(part_path, 'ab') as f:
+        shutil.copyfileobj(request.stream, f, 1024 * 1024)
+    UPLOAD_BYTES.inc(os.path.getsize(part_path) - received, kind='chunk')
+    received = os.path.getsize(part_path)
+    
+    if received > app.config['MAX_UPLOAD_SIZE']:
+        os.remove(part_path)
+        os.remove(f"{session_path}.json")
+        storage.forget(part_path)
+        storage.forget(f"{session_path}.json")
+        return jsonify({'error': '文件过大'}), 413
+    storage.register(part_path, 'upload_part')
+    return jsonify({'received': received})
+
+@app.route('/uploads/<upload_id>/complete', methods=['POST'])
+@UPLOAD_SECONDS.time(kind='complete')
+def complete_upload(upload_id):
+    """结束分块上传，返回与 /upload 相同的结果"""
+    session_path = upload_session_path(upload_id)
+    if session_path is None or not os.path.exists(f"{session_path}.json"):
+        return jsonify({'error': '上传不存在'}), 404
+        
+    with open(f"{session_path}.json", 'r', encoding='utf-8') as f:
+        filename = json.load(f)['filename']
+    # 分块到达的顺序和进程不固定，合并完成后再计算哈希
+    file_hash, stored_path = upload_store.add_file(f"{session_path}.part", filename)
+    os.remove(f"{session_path}.json")
+    storage.forget(f"{session_path}.part")
+    storage.forget(f"{session_path}.json")
+    storage.register(stored_path, 'upload')
+    
+    return jsonify({
+        'status': 'success',
+        'filepath': stored_path,
+        'filename': filename,
+        'file_hash': file_hash
+    })
+
+def engine_settings(params):
+    """影响翻译结果的设置，与输入哈希、目标语言一起作为结果索引的键"""
+    backend = app.config['TRANSLATION_BACKEND']
+    reference_filepath = params.get('reference_filepath')
+    return {
+        'backend': backend if isinstance(backend, str) else type(backend).__name__,
+        'src': SOURCE_LANG,
+        'incremental': bool(params.get('incremental')),
+        'reference': upload_store.digest_of(reference_filepath) if reference_filepath else None,
+        'filter': app.config['FILTER_UNTRANSLATABLE'],
+    }
+
+def preview_entries(groups, max_bytes):
+    """把新翻译的条目组转为进度事件中的条目列表，返回 (条目列表, 因超出大小上限而省略的条目组数)
+
+    条目以ID为键，同一原文的所有条目ID一起发送，编辑时一并修改。
+    """
+    entries = []
+    size = 0
+    for n, group in enumerate(groups):
+        entry = {
+            'ids': [entry_key(item) for item in group.entries],
+            'msgid': group.msgid,
+            'msgstr': group.msgstr or ''
+        }
+        size += len(json.dumps(entry, ensure_ascii=False).encode('utf-8'))
+        if size > max_bytes:
+            return entries, len(groups) - n
+        entries.append(entry)
+    return entries, 0
+
+def prepare_entries(entries, dest, incremental, reference, saved, checkpoint, stats):
+    """找出一块条目中真正需要在线翻译的部分，返回按原文合并后的条目组
+
+    条目依次经过增量筛选、本地过滤、检查点恢复和翻译记忆库查询，各环节的命中数累计到 stats。
+    """
+    stats['total_entries'] += len(entries)
+    candidates = entries
+    if incremental:
+        candidates, skipped, reused = select_entries(entries, reference)
+        stats['skipped_entries'] += skipped
+        stats['reference_hits'] += reused
+    
+    # 只有占位符、网址、数字等的条目译文与原文相同，无需请求翻译服务
+    if app.config['FILTER_UNTRANSLATABLE']:
+        candidates, filtered = filter_entries(candidates)
+        stats['filtered_entries'] += sum(filtered.values())
+        
+    # 恢复检查点中已完成的译文
+    pending = []
+    for entry in candidates:
+        key = entry_key(entry)
+        if key in saved:
+            entry.msgstr = saved[key]
+        else:
+            pending.append(entry)
+    stats['resumed_entries'] += len(candidates) - len(pending)
+    
+    # 再查询翻译记忆库，命中的条目无需再请求翻译服务
+    misses = translation_memory.lookup(pending, SOURCE_LANG, dest, translation_backend().name)
+    stats['cache_hits'] += len(pending) - len(misses)
+    stats['cache_misses'] += len(misses)
+    if len(misses) < len(pending):
+        untranslated = {id(entry) for entry in misses}
+        checkpoint.append(entry for entry in pending if id(entry) not in untranslated)
+    stats['processed'] += len(entries) - len(misses)
+    
+    # 合并原文相同的条目，每个原文只翻译一次
+    groups = group_entries(misses)
+    stats['unique_entries'] += len(groups)
+    return groups
+
+# 任务摘要中的统计项：摘要字段名 -> 统计计数器中的键
+SUMMARY_FIELDS = {
+    'total_processed': 'processed',
+    'total_entries': 'total_entries',
+    'failed_entries': 'failed',
+    'cache_hits': 'cache_hits',
+    'cache_misses': 'cache_misses',
+    'resumed_entries': 'resumed_entries',
+    'skipped_entries': 'skipped_entries',
+    'reference_hits': 'reference_hits',
+    'filtered_entries': 'filtered_entries',
+    'unique_entries': 'unique_entries',
+    'fallbacks': 'fallbacks',
+    'rebatched_entries': 'rebatched_entries'
+}
+
+def job_dests(params):
+    """任务的目标语言列表"""
+    return params.get('dests') or [TARGET_LANG]
+
+def output_suffix(dest):
+    """输出文件名中的语言后缀（默认目标语言沿用 _zh）"""
+    return 'zh' if dest == TARGET_LANG else dest
+
+def job_result(outputs, dests):
+    """任务结果：第一个目标语言的输出文件，以及各目标语言的输出文件"""
+    primary = outputs[dests[0]]
+    return {
+        'output_file': primary['output_file'],
+        'output_filename': primary['output_filename'],
+        'outputs': outputs
+    }
+
+def job_output(job, dest=None):
+    """任务在某一目标语言下的 (目标语言, 输出文件信息)，没有结果时输出文件信息为 None"""
+    dest = dest or job_dests(job.params)[0]
+    outputs = (job.result or {}).get('outputs') or {}
+    return dest, outputs.get(dest)
+
+def iter_catalog_chunks(catalogs, chunk_entries):
+    """依次读取各个目录文件，产出 (文件名, 块)
+
+    catalogs 为 [(压缩包中的相对路径, 文件路径, 是否为MO文件)]，单个文件时相对路径为 None。
+    """
+    for name, path, is_mo in catalogs:
+        if is_mo:
+            # MO为二进制格式，整体读取（内存映射后直接解析，保存时写出哈希表）
+            with PARSE_SECONDS.time(format='mo'), span('parse_mo', 'parse', file=name):
+                catalog = read_mofile(path)
+            yield name, catalog
+        else:
+            start = time.time()
+            chunk_start = time.perf_counter()
+            for chunk in read_po_chunks(path, chunk_entries):
+                PARSE_SECONDS.observe(time.time() - start, format='po')
+                tracer = current_tracer.get()
+                if tracer is not None:
+                    # 分块读取在生成器内进行，按块记录解析区间
+                    tracer.add('parse_po', 'parse', chunk_start, time.perf_counter(), {'file': name, 'entries': len(chunk)})
+                yield name, chunk
+                start = time.time()
+                chunk_start = time.perf_counter()
+
+def queued_chunks(chunk_queue):
+    """依次取出队列中的 (文件名, 块)，None 表示结束，异常表示读取源文件出错"""
+    while True:
+        item = chunk_queue.get()
+        if item is None:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+def distribute_chunks(job, chunks, pipelines):
+    """源文件只解析一次，每个块复制给各目标语言的流水线（在独立线程中运行）
+
+    队列容量很小，最慢的语言决定读取速度，内存中只保留少量块。
+    """
+    def put(pipeline, item):
+        with span('queue_put', 'wait', dest=pipeline['dest']):
+            put_item(pipeline, item)
             
-            if total_entries == 0:
-                yield f"data: {json.dumps({'error': '文件中没有需要翻译的内容'})}\n\n"
+    def put_item(pipeline, item):
+        while not pipeline['finished']:
+            try:
+                pipeline['queue'].put(item, timeout=1)
                 return
+            except queue.Full:
+                if job.cancelled:
+                    return
+                    
+    try:
+        for name, chunk in chunks:
+            if job.cancelled:
+                break
+            # 最后一个语言直接使用解析出的块，其余语言使用副本
+            for pipeline in pipelines[:-1]:
+                with span('copy_chunk', 'parse', entries=len(chunk)):
+                    chunk_copy = copy_catalog(chunk)
+                put(pipeline, (name, chunk_copy))
+            put(pipelines[-1], (name, chunk))
+        end = None
+    except Exception as e:
+        end = e
+    for pipeline in pipelines:
+        put(pipeline, end)
+
+def translate_language(job, pipeline, chunks):
+    """把源文件翻译为一个目标语言（在独立线程中运行）
+
+    统计写入 pipeline['stats']，新翻译的条目组追加到 pipeline['new_groups']；
+    完成后结果写入 pipeline['result'] 和 pipeline['summary']，出错时写入 pipeline['error']。
+    """
+    current_job.set(job.id)
+    dest = pipeline['dest']
+    source = pipeline['source']
+    stats = pipeline['stats']
+    checkpoint = None
+    writer = None
+    index = None
+    completed = False
+    # 按任务ID和目标语言命名，避免同名文件的任务互相覆盖
+    temp_output = os.path.join(app.config['RESULTS_FOLDER'], f"{job.id}_{dest}{source['ext']}")
+    # 压缩包中的文件先写入该目录，全部完成后再打包
+    output_folder = os.path.join(app.config['RESULTS_FOLDER'], f"{job.id}_{dest}")
+    
+    try:
+        checkpoint = Checkpoint.for_digest(
+            source['input_hash'], dest, app.config['CHECKPOINT_FOLDER'], source['settings']
+        )
+        # 检查点在任务运行期间受保护，任务中断后保留到过期，供重试时继续
+        storage.register(checkpoint.path, 'checkpoint', job.id)
+        saved = checkpoint.load()
+        if not source['archive']:
+            # 写出的块同时加入条目索引，翻译过程中即可分页浏览和搜索
+            index = EntryIndex(entry_index_path(job, dest))
+        failed_keys = set()
+        # 等待写出的块：(文件名, 块, 块依赖的最后一个条目组的序号)
+        unwritten = deque()
+        # 已分发但尚未完成的条目组（原文 -> 条目组），后续块（包括其他文件）中相同原文的条目并入该组，只翻译一次
+        in_flight = {}
+        # 条目组按分发顺序编号；批次按顺序完成，序号不大于 done_seq 的条目组都已完成
+        group_seq = {}
+        next_seq = 0
+        done_seq = -1
+        writer_name = None
+        
+        def iter_groups():
+            nonlocal next_seq
+            for name, chunk in chunks:
+                entries = [entry for entry in chunk if entry.msgid and entry.msgid.strip()]
+                with span('prepare_entries', 'prepare', entries=len(entries), dest=dest):
+                    groups = prepare_entries(
+                        entries, dest, source['incremental'], source['reference'], saved, checkpoint, stats
+                    )
+                new_groups = []
+                depends = -1
+                for group in groups:
+                    pending = in_flight.get(group.msgid)
+                    if pending is not None:
+                        pending.entries.extend(group.entries)
+                        stats['unique_entries'] -= 1
+                        depends = max(depends, group_seq[id(pending)])
+                        continue
+                    in_flight[group.msgid] = group
+                    group_seq[id(group)] = depends = next_seq
+                    next_seq += 1
+                    new_groups.append(group)
+                unwritten.append((name, chunk, depends))
+                # 没有待翻译条目的块（如增量模式下已翻译的部分）在读取下一块之前写出，不等待后续批次完成
+                write_finished_chunks()
+                yield from new_groups
                 
-            # 开始时间
-            start_time = time.time()
-            last_progress_time = start_time
-            speed_samples = []
-            initial_estimate = None
-            
-            # 分批翻译
-            for i in range(0, total_entries, batch_size):
-                current_batch_size = min(batch_size, total_entries - i)
-                success = translate_batch(entries, i, current_batch_size)
+        def write_chunk(name, chunk):
+            nonlocal writer, writer_name
+            if index is not None:
+                index.add(chunk, failed_keys)
+            path = temp_output if name is None else os.path.join(output_folder, *name.split('/'))
+            if (name is None and source['is_mo']) or (name is not None and name.lower().endswith('.mo')):
+                # MO文件只有一个块，整体写出
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with SAVE_SECONDS.time(format='mo'), span('save_mo', 'save', file=name):
+                    chunk.save(path)
+                return
+            if writer is None or writer_name != name:
+                # 块按文件顺序写出，开始写下一个文件时上一个文件已经完整
+                if writer is not None:
+                    writer.commit()
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # PO文件每块处理完后立即追加写出，内存占用与文件大小无关
+                writer = POStreamWriter(path, chunk.encoding)
+                writer_name = name
+            with SAVE_SECONDS.time(format='po'), span('save_po', 'save', file=name, entries=len(chunk)):
+                writer.write(chunk)
                 
+        def write_finished_chunks():
+            # 块依赖的条目组都已完成时即可写出
+            while unwritten and unwritten[0][2] <= done_seq:
+                name, chunk, _ = unwritten.popleft()
+                write_chunk(name, chunk)
+        
+        # 按字符预算自适应打包，分批并发翻译，结果按批次顺序返回
+        packer = pipeline['packer']
+        workers = max(1, app.config['TRANSLATE_WORKERS'])
+        batch_results = dispatch_batches(packer.pack(iter_groups()), workers, packer, dest)
+        for i, batch, success, batch_stats in batch_results:
+            stats.update(batch_stats)
+            for group in batch:
                 if success:
-                    processed_entries += current_batch_size
-                else:
-                    # 记录失败的条目
-                    failed_entries.extend(range(i, i + current_batch_size))
+                    # 翻译进行中并入的条目也写入译文
+                    group.sync()
+                if in_flight.get(group.msgid) is group:
+                    del in_flight[group.msgid]
+                done_seq = max(done_seq, group_seq.pop(id(group)))
+            # 进度按原始条目数统计
+            batch_entries = expand_groups(batch)
+            if success:
+                pipeline['new_groups'].extend(batch)
+                stats['processed'] += len(batch_entries)
+                with span('store_batch', 'save', entries=len(batch_entries)):
+                    translation_memory.store(batch_entries, SOURCE_LANG, dest, translation_backend().name)
+                    checkpoint.append(batch_entries)
+            else:
+                # 记录失败的条目
+                stats['failed'] += len(batch_entries)
+                failed_keys.update(entry_key(entry) for entry in batch_entries)
+            write_finished_chunks()
+            
+            # 任务被取消时停止分发，尚未开始的批次随之取消（已完成的批次已写入检查点）
+            if job.cancelled:
+                break
+        batch_results.close()
+        
+        if job.cancelled:
+            return
+            
+        # 剩余的块中已没有待翻译的条目
+        done_seq = next_seq
+        write_finished_chunks()
+        if stats['total_entries'] == 0:
+            pipeline['error'] = '文件中没有需要翻译的内容'
+            return
+            
+        # 保存翻译后的文件
+        if writer is not None:
+            writer.commit()
+            writer = None
+        if source['archive']:
+            # 按原来的目录结构打包
+            with SAVE_SECONDS.time(format='archive'), span('write_archive', 'save'):
+                write_archive(output_folder, source['names'], temp_output, source['archive'])
+        # 结果已写出，检查点不再需要
+        checkpoint.remove()
+        storage.forget(checkpoint.path)
+        completed = True
+        
+        summary = {field: stats[key] for field, key in SUMMARY_FIELDS.items()}
+        output_file = temp_output
+        if not stats['failed']:
+            # 完整的结果存入结果索引，相同文件再次提交时直接复用
+            output_file = upload_store.store_result(
+                source['input_hash'], dest, source['settings'],
+                temp_output, pipeline['output_filename'], summary
+            )
+        storage.register(output_file, 'output', job.id)
+        pipeline['summary'] = summary
+        pipeline['result'] = {'output_file': output_file, 'output_filename': pipeline['output_filename']}
+        
+    except Exception as e:
+        pipeline['error'] = f"翻译过程中发生错误: {str(e)}"
+        log_event('language_failed', pipeline['error'], logging.ERROR, dest=dest, exc_info=True)
+        
+    finally:
+        pipeline['finished'] = True
+        # 按处理方式统计条目数（发送给翻译服务的条目按去重前的数量统计）
+        for source_name, count in (
+            ('translated', stats['cache_misses'] - stats['failed']), ('cache_hit', stats['cache_hits']),
+            ('resumed', stats['resumed_entries']), ('filtered', stats['filtered_entries']),
+            ('skipped', stats['skipped_entries']), ('reference', stats['reference_hits']),
+            ('failed', stats['failed'])
+        ):
+            if count > 0:
+                ENTRIES.inc(count, source=source_name)
+        if checkpoint is not None:
+            checkpoint.close()
+            if not completed:
+                storage.register(checkpoint.path, 'checkpoint', job.id)
+        if index is not None:
+            if completed:
+                index.close()
+                storage.register(index.path, 'index', job.id)
+            else:
+                index.remove()
+        if writer is not None:
+            # 未完成的任务不留下不完整的结果
+            writer.discard()
+        if not completed and os.path.exists(temp_output):
+            os.remove(temp_output)
+        if os.path.isdir(output_folder):
+            shutil.rmtree(output_folder, ignore_errors=True)
+
+def run_translation_job(job):
+    """执行翻译任务（在后台工作线程中运行），进度通过 job.emit 发布
+
+    源文件只解析一次，每个目标语言在独立线程中翻译，共用全局限流额度。
+    上传的是压缩包时，其中所有PO/MO文件作为一个整体翻译，结果按原来的目录结构打包。
+    """
+    current_job.set(job.id)
+    filepath = job.params['filepath']
+    filename = job.params['filename']
+    reference_filepath = job.params.get('reference_filepath')
+    dests = job_dests(job.params)
+    archive = archive_format(filename)
+    source_folder = os.path.join(app.config['RESULTS_FOLDER'], f"{job.id}_src")
+    
+    try:
+        is_mo = filename.endswith('.mo')
+        base_name, ext = split_archive_name(filename) if archive else os.path.splitext(filename)
+        input_hash = job.params.get('input_hash') or upload_store.digest_of(filepath)
+        settings = engine_settings(job.params)
+        
+        # 已有结果的目标语言直接复用（如重试时已完成的语言）
+        outputs = {}
+        summaries = {}
+        pending = []
+        for dest in dests:
+            cached = upload_store.find_result(input_hash, dest, settings)
+            if cached is None:
+                pending.append(dest)
+            else:
+                storage.touch(cached['output_file'])
+                outputs[dest] = {'output_file': cached['output_file'], 'output_filename': cached['output_filename']}
+                summaries[dest] = cached['summary']
+        
+        # 要翻译的目录文件：(压缩包中的相对路径, 文件路径, 是否为MO文件)
+        catalogs = []
+        if archive and pending:
+            with PARSE_SECONDS.time(format='archive'), span('extract_archive', 'parse'):
+                names = extract_catalogs(filepath, source_folder, archive, app.config['MAX_ARCHIVE_EXTRACT_SIZE'])
+            if not names:
+                raise ArchiveError("压缩包中没有PO/MO文件")
+            catalogs = [
+                (name, os.path.join(source_folder, *name.split('/')), name.lower().endswith('.mo'))
+                for name in names
+            ]
+        elif pending:
+            catalogs = [(None, filepath, is_mo)]
+        # PO文件分块读取，MO文件整体读取
+        chunks = iter_catalog_chunks(catalogs, app.config['STREAM_CHUNK_ENTRIES'])
+        estimated_total = sum(estimate_entries(path) for _, path, _ in catalogs)
+        
+        incremental = job.params.get('incremental')
+        reference = None
+        if pending and incremental and reference_filepath:
+            with span('load_reference', 'parse'):
+                reference = load_reference(reference_filepath)
+        source = {
+            'is_mo': is_mo,
+            'ext': ext,
+            'archive': archive,
+            'names': [name for name, _, _ in catalogs],
+            'input_hash': input_hash,
+            'settings': settings,
+            'incremental': incremental,
+            'reference': reference
+        }
+        pipelines = [
+            {
+                'dest': dest,
+                'source': source,
+                'output_filename': f"{base_name}_{output_suffix(dest)}{ext}",
+                'stats': Counter(),
+                # 上次发送进度后新翻译完成的条目组
+                'new_groups': deque(),
+                'packer': BatchPacker(app.config['BATCH_CHAR_BUDGET']),
+                'queue': queue.Queue(maxsize=2),
+                'finished': False,
+                'result': None,
+                'summary': None,
+                'error': None
+            }
+            for dest in pending
+        ]
+        # 各线程在当前上下文的副本中运行，日志和跟踪记录归属当前任务
+        threads = [
+            threading.Thread(
+                target=copy_context().run,
+                args=(translate_language, job, pipeline, queued_chunks(pipeline['queue'])),
+                name=f"translate-{pipeline['dest']}", daemon=True
+            )
+            for pipeline in pipelines
+        ]
+        if pipelines:
+            threads.append(threading.Thread(
+                target=copy_context().run, args=(distribute_chunks, job, chunks, pipelines),
+                name='read-source', daemon=True
+            ))
+        for thread in threads:
+            thread.start()
+        
+        # 开始时间
+        start_time = time.time()
+        last_progress_time = start_time
+        speed_samples = []
+        initial_estimate = None
+        
+        while True:
+            alive = [thread for thread in threads if thread.is_alive()]
+            if not alive:
+                break
+            alive[0].join(app.config['SSE_MIN_INTERVAL'])
+            
+            # 每秒最多更新一次进度
+            current_time = time.time()
+            if current_time - last_progress_time < app.config['SSE_MIN_INTERVAL']:
+                continue
+            progress_start = time.perf_counter()
                 
-                # 每秒最多更新一次进度
-                current_time = time.time()
-                if current_time - last_progress_time >= 1.0:
-                    # 计算进度和预计剩余时间
-                    progress = (processed_entries / total_entries) * 100
-                    elapsed_time = current_time - start_time
+            # 汇总各目标语言的进度（只读取固定的键，不遍历其他线程正在更新的计数器）
+            languages = {}
+            totals = Counter()
+            for pipeline in pipelines:
+                stats = pipeline['stats']
+                language = {
+                    'processed': stats['processed'],
+                    'total': max(estimated_total, stats['total_entries'], 1),
+                    'failed': stats['failed']
+                }
+                language['progress'] = language['processed'] / language['total'] * 100
+                languages[pipeline['dest']] = language
+                for key in ('cache_hits', 'cache_misses', 'resumed_entries', 'skipped_entries', 'reference_hits',
+                            'filtered_entries', 'unique_entries', 'fallbacks', 'rebatched_entries', 'throttle_wait', 'circuit_wait'):
+                    totals[key] += stats[key]
+            processed_entries = sum(language['processed'] for language in languages.values())
+            total_entries = max(sum(language['total'] for language in languages.values()), 1)
+            
+            # 计算进度和预计剩余时间
+            progress = (processed_entries / total_entries) * 100
+            elapsed_time = current_time - start_time
+            
+            if processed_entries > 0 and elapsed_time > 0:
+                # 计算当前速度（每秒处理的条目数）
+                current_speed = processed_entries / elapsed_time
+                
+                # 添加新的速度样本
+                speed_samples.append(current_speed)
+                # 只保留最近的5个样本
+                if len(speed_samples) > 5:
+                    speed_samples = speed_samples[-5:]
+                
+                # 使用加权移动平均速度，最近的样本权重更大
+                weights = [0.1, 0.15, 0.2, 0.25, 0.3][-len(speed_samples):]
+                avg_speed = sum(s * w for s, w in zip(speed_samples, weights))
+                
+                if avg_speed > 0:
+                    # 如果还没有初始预估，计算初始预估
+                    if initial_estimate is None and progress > 10:
+                        # 使用当前进度估算总时间
+                        initial_estimate = elapsed_time / (progress / 100)
                     
-                    if processed_entries > 0 and elapsed_time > 0:
-                        # 计算当前速度（每秒处理的条目数）
-                        current_speed = processed_entries / elapsed_time
+                    # 结合初始预估和实时速度计算剩余时间
+                    if initial_estimate is not None:
+                        remaining_entries = total_entries - processed_entries
+                        
+                        # 使用加权平均，随着进度增加，实时速度的权重增加
+                        weight_realtime = min(0.8, progress/100 + 0.2)
+                        weight_initial = 1 - weight_realtime
+                        
+                        # 基于初始预估的剩余时间
+                        initial_remaining = (initial_estimate * (1 - progress/100))
+                        # 基于当前速度的剩余时间
+                        realtime_remaining = remaining_entries / avg_speed if avg_speed > 0 else 0
                         
-                        # 添加新的速度样本
-                        speed_samples.append(current_speed)
-                        # 只保留最近的5个样本
-                        if len(speed_samples) > 5:
-                            speed_samples = speed_samples[-5:]
+                        # 加权平均
+                        estimated_seconds = (
+                            initial_remaining * weight_initial +
+                            realtime_remaining * weight_realtime
+                        )
                         
-                        # 使用加权移动平均速度，最近的样本权重更大
-                        weights = [0.1, 0.15, 0.2, 0.25, 0.3][-len(speed_samples):]
-                        avg_speed = sum(s * w for s, w in zip(speed_samples, weights))
+                        # 添加缓冲时间（根据进度调整缓冲比例）
+                        buffer_factor = 1.2 - ((progress/100) * 0.2)  # 从1.2逐渐减少到1.0
+                        estimated_seconds *= buffer_factor
                         
-                        if avg_speed > 0:
-                            # 如果还没有初始预估，计算初始预估
-                            if initial_estimate is None and progress > 10:
-                                # 使用当前进度估算总时间
-                                initial_estimate = elapsed_time / (progress / 100)
-                            
-                            # 结合初始预估和实时速度计算剩余时间
-                            if initial_estimate is not None:
-                                remaining_entries = total_entries - processed_entries
-                                
-                                # 使用加权平均，随着进度增加，实时速度的权重增加
-                                weight_realtime = min(0.8, progress/100 + 0.2)
-                                weight_initial = 1 - weight_realtime
-                                
-                                # 基于初始预估的剩余时间
-                                initial_remaining = (initial_estimate * (1 - progress/100))
-                                # 基于当前速度的剩余时间
-                                realtime_remaining = remaining_entries / avg_speed if avg_speed > 0 else 0
-                                
-                                # 加权平均
-                                estimated_seconds = (
-                                    initial_remaining * weight_initial +
-                                    realtime_remaining * weight_realtime
-                                )
-                                
-                                # 添加缓冲时间（根据进度调整缓冲比例）
-                                buffer_factor = 1.2 - ((progress/100) * 0.2)  # 从1.2逐渐减少到1.0
-                                estimated_seconds *= buffer_factor
-                                
-                                # 转换为分钟和秒
-                                minutes = int(estimated_seconds // 60)
-                                seconds = int(estimated_seconds % 60)
-                                
-                                time_remaining = f"{minutes:02d}:{seconds:02d}"
-                            else:
-                                time_remaining = "计算中..."
-                        else:
-                            time_remaining = "计算中..."
+                        # 转换为分钟和秒
+                        minutes = int(estimated_seconds // 60)
+                        seconds = int(estimated_seconds % 60)
+                        
+                        time_remaining = f"{minutes:02d}:{seconds:02d}"
                     else:
                         time_remaining = "计算中..."
-                        
-                    # 获取当前批次的预览数据
-                    preview_entries = entries[max(0, i-5):i+current_batch_size]
-                    preview_data = [
-                        {
-                            'msgid': entry.msgid,
-                            'msgstr': entry.msgstr if entry.msgstr else ''
-                        }
-                        for entry in preview_entries
-                    ]
-                    
-                    # 发送进度更新
-                    yield f"data: {json.dumps({
-                        'progress': progress,
-                        'time_remaining': time_remaining,
-                        'processed': processed_entries,
-                        'total': total_entries,
-                        'failed': len(failed_entries),
-                        'preview': preview_data
-                    })}\n\n"
-                    
-                    last_progress_time = current_time
-                
-            # 保存翻译后的文件
-            base_name, ext = os.path.splitext(filename)
-            output_filename = f"{base_name}_zh{ext}"
-            temp_output = os.path.join(app.config['UPLOAD_FOLDER'], output_filename)
-            
-            if is_mo:
-                po_file.save_as_mofile(temp_output)
+                else:
+                    time_remaining = "计算中..."
             else:
-                po_file.save(temp_output)
+                time_remaining = "计算中..."
                 
-            # 发送完成消息
-            completion_message = {
-                'status': 'complete',
-                'output_file': temp_output,
-                'output_filename': output_filename,
-                'total_processed': processed_entries,
-                'total_entries': total_entries,
-                'failed_entries': len(failed_entries)
+            # 只发送第一个目标语言在上次进度之后新翻译的条目（预览表按条目ID编辑该语言的译文）
+            new_groups = []
+            if pipelines:
+                primary_groups = pipelines[0]['new_groups']
+                while primary_groups:
+                    new_groups.append(primary_groups.popleft())
+            for pipeline in pipelines[1:]:
+                pipeline['new_groups'].clear()
+            with span('preview_entries', 'progress', groups=len(new_groups)):
+                preview_data, omitted = preview_entries(new_groups, app.config['SSE_MAX_EVENT_BYTES'])
+            
+            # 发送进度更新
+            progress_message = {
+                'progress': progress,
+                'time_remaining': time_remaining,
+                'processed': processed_entries,
+                'total': total_entries,
+                'failed': sum(language['failed'] for language in languages.values()),
+                'cache_hits': totals['cache_hits'],
+                'cache_misses': totals['cache_misses'],
+                'resumed_entries': totals['resumed_entries'],
+                'skipped_entries': totals['skipped_entries'],
+                'reference_hits': totals['reference_hits'],
+                'filtered_entries': totals['filtered_entries'],
+                'unique_entries': totals['unique_entries'],
+                'batch_budget': pipelines[0]['packer'].budget if pipelines else 0,
+                'fallbacks': totals['fallbacks'],
+                'rebatched_entries': totals['rebatched_entries'],
+                'throttle_wait': round(totals['throttle_wait'], 1),
+                'circuit_wait': round(totals['circuit_wait'], 1),
+                'limiter': limiter_state(),
+                'languages': languages,
+                'files': len(catalogs),
+                'entries': preview_data,
+                'omitted': omitted
             }
+            if omitted:
+                # 超出事件大小上限的新译文不随事件发送，客户端通过条目接口读取
+                progress_message['entries_url'] = f'/jobs/{job.id}/entries'
+            job.emit(progress_message)
+            tracer = current_tracer.get()
+            if tracer is not None:
+                tracer.add('progress_event', 'progress', progress_start, time.perf_counter(), {'entries': len(preview_data)})
             
-            if failed_entries:
-                completion_message['warning'] = f'有 {len(failed_entries)} 个条目翻译失败'
-                
-            yield f"data: {json.dumps(completion_message)}\n\n"
+            last_progress_time = current_time
+        
+        if job.cancelled:
+            job.emit({
+                'status': 'cancelled',
+                'total_processed': sum(pipeline['stats']['processed'] for pipeline in pipelines),
+                'total_entries': sum(max(estimated_total, pipeline['stats']['total_entries']) for pipeline in pipelines)
+            })
+            return
             
-        except Exception as e:
-            error_message = f"翻译过程中发生错误: {str(e)}"
-            print(error_message)
-            yield f"data: {json.dumps({'error': error_message})}\n\n"
+        errors = [pipeline for pipeline in pipelines if pipeline['error']]
+        if errors:
+            # 已完成的语言已存入结果索引，重试时直接复用
+            if len(dests) == 1:
+                error_message = errors[0]['error']
+            else:
+                error_message = '；'.join(f"{pipeline['dest']}: {pipeline['error']}" for pipeline in errors)
+            job.emit({'error': error_message})
+            job.finish(FAILED)
+            return
             
-        finally:
-            # 清理临时文件
-            try:
-                if os.path.exists(filepath):
-                    os.remove(filepath)
-            except Exception as e:
-                print(f"清理临时文件时出错: {str(e)}")
+        for pipeline in pipelines:
+            outputs[pipeline['dest']] = pipeline['result']
+            summaries[pipeline['dest']] = pipeline['summary']
+        
+        # 各语言的统计之和
+        summary = {field: sum(summaries[dest][field] for dest in dests) for field in SUMMARY_FIELDS}
+        job.result = job_result(outputs, dests)
+            
+        # 发送完成消息
+        completion_message = dict(summary, status='complete', languages=summaries, **job.result)
+        if archive:
+            completion_message.update(archive=True, files=len(catalogs))
+        if summary['failed_entries']:
+            completion_message['warning'] = f"有 {summary['failed_entries']} 个条目翻译失败"
+            
+        job.emit(completion_message)
+        
+    except ArchiveError as e:
+        job.emit({'error': str(e)})
+        job.finish(FAILED)
+        
+    except Exception as e:
+        error_message = f"翻译过程中发生错误: {str(e)}"
+        log_event('job_error', error_message, logging.ERROR, exc_info=True)
+        job.emit({'error': error_message})
+        job.finish(FAILED)
+        
+    finally:
+        # 清理临时文件；上传文件按内容共用，由存储清理按配额和有效期删除
+        try:
+            if os.path.isdir(source_folder):
+                shutil.rmtree(source_folder, ignore_errors=True)
+        except Exception as e:
+            log_event('cleanup_error', f"清理临时文件时出错: {str(e)}", logging.WARNING)
+
+def run_job(job):
+    """执行翻译任务，记录任务数、耗时指标和开始、结束日志；开启跟踪时记录任务各阶段的耗时"""
+    current_job.set(job.id)
+    # 工作线程依次执行多个任务，每个任务重新设置跟踪记录
+    job.trace = Tracer(f"job {job.id}") if job.params.get('trace') else None
+    current_tracer.set(job.trace)
+    log_event('job_started', "开始执行翻译任务", filename=job.params.get('filename'), dests=job_dests(job.params))
+    JOBS_IN_FLIGHT.inc()
+    start = time.time()
+    status = FAILED
+    try:
+        with span('job', 'job', filename=job.params.get('filename'), dests=job_dests(job.params)) as job_span:
+            run_translation_job(job)
+            # 任务管理器在返回后才标记状态，此处按相同规则判断
+            status = job.status if job.finished else (CANCELLED if job.cancelled else COMPLETE)
+            job_span.set(status=status)
+    finally:
+        duration = time.time() - start
+        JOBS_IN_FLIGHT.dec()
+        JOBS.inc(status=status)
+        JOB_SECONDS.observe(duration, status=status)
+        log_event('job_finished', "翻译任务结束", status=status, duration=round(duration, 3))
+        # 任务结束后其文件不再受保护，按配额和有效期清理
+        storage.release(job.id)
+
+def configured_workers(environ=None, argv=None):
+    """gunicorn 的 worker 进程数（命令行参数优先，其次 GUNICORN_CMD_ARGS 和 WEB_CONCURRENCY），不使用 gunicorn 时为 1"""
+    environ = os.environ if environ is None else environ
+    argv = sys.argv if argv is None else argv
+    args = shlex.split(environ.get('GUNICORN_CMD_ARGS', ''))
+    # gunicorn 命令行（包括 python -m gunicorn）的参数覆盖环境变量中的设置
+    if argv and 'gunicorn' in argv[0]:
+        args += argv[1:]
+    workers = environ.get('WEB_CONCURRENCY', '1')
+    for i, arg in enumerate(args):
+        if arg in ('-w', '--workers') and i + 1 < len(args):
+            workers = args[i + 1]
+        elif arg.startswith('--workers='):
+            workers = arg.split('=', 1)[1]
+        elif arg.startswith('-w') and not arg.startswith('--'):
+            workers = arg[2:]
+    try:
+        return int(workers)
+    except ValueError:
+        return 1
+
+# 多个 worker 各自保存一份任务，进度、下载和取消请求会落到不知道该任务的进程，启动时直接失败
+if configured_workers() > 1 and not app.config['ALLOW_MULTIPLE_WORKERS']:
+    raise RuntimeError(
+        "任务保存在进程内存中，不能以多个 worker 进程运行，请使用单个 worker 配合多线程"
+        "（如 gunicorn -w 1 --threads 16 app:app）；负载均衡能保证同一任务的请求路由到同一 worker 时可设置 ALLOW_MULTIPLE_WORKERS=1"
+    )
+
+# 后台任务调度器，/translate 提交的任务由其工作线程执行
+job_manager = JobManager(
+    run_job,
+    workers=app.config['JOB_WORKERS'],
+    max_queued=app.config['JOB_QUEUE_LIMIT'],
+    event_tail=app.config['JOB_EVENT_TAIL']
+)
+
+def submit_job(owner, params):
+    """提交任务，并在任务结束前保护其输入文件和生成的文件"""
+    job = job_manager.submit(owner, params)
+    storage.lease(job.id, [params['filepath'], params.get('reference_filepath')])
+    return job
+
+@app.route('/translate', methods=['POST'])
+def translate():
+    """提交翻译任务，立即返回任务ID"""
+    data = request.get_json()
+    filepath = data.get('filepath')
+    filename = data.get('filename')
+    reference_filepath = data.get('reference_filepath')
+    
+    if not filename or not allowed_file(filename):
+        return jsonify({'error': '不支持的文件类型'}), 400
+    # 源文件同样只能是已上传到存储中的文件（上传返回的路径或哈希），不接受任意服务器路径
+    filepath = upload_store.resolve(filepath, UPLOAD_EXTENSIONS)
+    if filepath is None:
+        return jsonify({'error': '文件不存在，请先上传'}), 400
+    if reference_filepath:
+        # 参考译文只能是已上传到存储中的文件（上传返回的路径或哈希），不接受任意服务器路径
+        reference_filepath = upload_store.resolve(reference_filepath)
+        if reference_filepath is None:
+            return jsonify({'error': '参考译文文件不存在，请先上传'}), 400
+        
+    # 一个任务可以同时翻译为多个目标语言，源文件只解析一次
+    dests = data.get('dests') or [data.get('dest') or TARGET_LANG]
+    if isinstance(dests, str):
+        dests = [dests]
+    dests = list(dict.fromkeys(dest.strip() for dest in dests if isinstance(dest, str)))
+    if not dests or not all(LANG_PATTERN.fullmatch(dest) for dest in dests):
+        return jsonify({'error': '目标语言无效'}), 400
+        
+    params = {
+        'filepath': filepath,
+        'filename': filename,
+        'input_hash': upload_store.digest_of(filepath),
+        # 增量模式只翻译新增、未翻译或模糊的条目
+        'incremental': bool(data.get('incremental')),
+        'reference_filepath': reference_filepath,
+        'dests': dests,
+        # 记录任务各阶段和每次请求的耗时，不影响翻译结果
+        'trace': bool(data.get('trace')) or app.config['TRACE_JOBS']
+    }
     
-    return Response(stream_with_context(generate()), mimetype='text/event-stream')
+    # 相同内容、相同设置的文件已经翻译为所有目标语言时直接返回已有结果
+    settings = engine_settings(params)
+    cached = {dest: upload_store.find_result(params['input_hash'], dest, settings) for dest in dests}
+    if all(cached.values()):
+        outputs = {
+            dest: {'output_file': result['output_file'], 'output_filename': result['output_filename']}
+            for dest, result in cached.items()
+        }
+        summaries = {dest: result['summary'] for dest, result in cached.items()}
+        summary = {field: sum(summaries[dest][field] for dest in dests) for field in SUMMARY_FIELDS}
+        for output in outputs.values():
+            storage.touch(output['output_file'])
+        result = job_result(outputs, dests)
+        event = dict(summary, status='complete', cached=True, languages=summaries, **result)
+        job = job_manager.add_completed(request_owner(), params, result, event)
+        return jsonify({
+            'status': 'complete',
+            'job_id': job.id,
+            'events_url': f'/jobs/{job.id}/events'
+        })
+        
+    try:
+        job = submit_job(request_owner(), params)
+    except QueueFullError as e:
+        return jsonify({'error': str(e)}), 429
+        
+    return jsonify({
+        'status': 'queued',
+        'job_id': job.id,
+        'events_url': f'/jobs/{job.id}/events'
+    })
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """查询任务状态"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': '任务不存在'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    """以SSE流推送任务进度，客户端断开后可随时重新连接"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': '任务不存在'}), 404
+        
+    # 事件ID为事件序号，重新连接时从 Last-Event-ID 之后继续推送
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        position = int(last_event_id) + 1 if last_event_id is not None else 0
+    except ValueError:
+        position = 0
+        
+    def generate(position):
+        while True:
+            start, events, finished = job.wait_events(position, timeout=15)
+            if start > position:
+                # 请求的事件已不在保留范围内，其中的新译文通过条目接口重新读取
+                resync = {'resync': True, 'missed_events': start - position, 'entries_url': f'/jobs/{job.id}/entries'}
+                yield f"id: {start - 1}\ndata: {json.dumps(resync, ensure_ascii=False, separators=(',', ':'))}\n\n"
+            # 请求线程不属于任务，直接写入任务的跟踪记录
+            with job.trace.span('sse_serialize', 'progress', events=len(events)) if job.trace else NULL_SPAN:
+                messages = [
+                    f"id: {start + offset}\ndata: {json.dumps(event, ensure_ascii=False, separators=(',', ':'))}\n\n"
+                    for offset, event in enumerate(events)
+                ]
+            yield from messages
+            position = start + len(events)
+            
+            if finished and position >= job.event_count:
+                return
+            if not events:
+                # 保持连接，避免被代理断开
+                yield ": keepalive\n\n"
+                
+    return Response(stream_with_context(generate(position)), mimetype='text/event-stream')
+
+@app.route('/jobs/<job_id>/trace')
+def job_trace(job_id):
+    """下载任务的性能跟踪（Chrome/Perfetto 跟踪格式），任务运行中下载时包含已记录的部分"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': '任务不存在'}), 404
+    if job.trace is None:
+        return jsonify({'error': '任务未开启性能跟踪'}), 404
+    return Response(
+        job.trace.to_json(),
+        mimetype='application/json',
+        headers={'Content-Disposition': f'attachment; filename="trace_{job.id}.json"'}
+    )
+
+@app.route('/jobs/<job_id>/retry', methods=['POST'])
+def retry_job(job_id):
+    """重新提交已结束的任务，从检查点继续翻译"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': '任务不存在'}), 404
+    if not job.finished:
+        return jsonify({'error': '任务尚未结束'}), 409
+    if not os.path.exists(job.params['filepath']):
+        return jsonify({'error': '文件不存在'}), 400
+        
+    try:
+        new_job = submit_job(job.owner, dict(job.params))
+    except QueueFullError as e:
+        return jsonify({'error': str(e)}), 429
+        
+    return jsonify({
+        'status': 'queued',
+        'job_id': new_job.id,
+        'events_url': f'/jobs/{new_job.id}/events'
+    })
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """取消任务"""
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return jsonify({'error': '任务不存在'}), 404
+    return jsonify(job.to_dict())
+
+def entry_index_path(job, dest):
+    """任务在目标语言 dest 下的条目索引路径"""
+    return os.path.join(app.config['UPLOAD_FOLDER'], 'mopo-index', f"{job.id}_{dest}.sqlite3")
+
+def edit_journal(job, dest):
+    """任务在目标语言 dest 下的编辑日志"""
+    return EditJournal(os.path.join(app.config['UPLOAD_FOLDER'], 'mopo-journals', f"{job.id}_{dest}.jsonl"))
 
 @app.route('/save_edits', methods=['POST'])
 def save_edits():
-    """保存编辑后的翻译"""
+    """保存编辑后的翻译：只把修改过的条目追加到任务的编辑日志，下载时再合并"""
     try:
         data = request.get_json()
-        filename = data.get('filename')
+        job_id = data.get('job_id')
         edits = data.get('edits', [])
         
-        if not filename or not edits:
+        if not job_id or not edits:
             return jsonify({"error": "Missing required data"}), 400
+        if any('id' not in edit or 'msgstr' not in edit for edit in edits):
+            return jsonify({"error": "Invalid edits"}), 400
             
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        if not os.path.exists(filepath):
-            return jsonify({"error": "Original file not found"}), 404
+        job = job_manager.get(job_id)
+        if job is None:
+            return jsonify({"error": "Translated file not found"}), 404
+        if archive_format(job.params['filename']):
+            return jsonify({"error": "压缩包任务不支持在线编辑"}), 400
+        dest, output = job_output(job, data.get('lang'))
+        if output is None:
+            return jsonify({"error": "Translated file not found"}), 404
             
-        # 读取PO文件
-        po = polib.pofile(filepath)
-        
-        # 应用编辑
-        edit_map = {item['msgid']: item['msgstr'] for item in edits}
-        for entry in po:
-            if entry.msgid in edit_map:
-                entry.msgstr = edit_map[entry.msgid]
-        
-        # 保存为新文件
-        edited_filename = f"edited_{filename}"
-        edited_filepath = os.path.join(app.config['UPLOAD_FOLDER'], edited_filename)
-        po.save(edited_filepath)
+        journal = edit_journal(job, dest)
+        saved = journal.append(edits)
+        storage.register(journal.path, 'journal', job.id)
+        if os.path.exists(entry_index_path(job, dest)):
+            index = EntryIndex(entry_index_path(job, dest))
+            try:
+                index.update(edits)
+            finally:
+                index.close()
         
         return jsonify({
             "message": "Changes saved successfully",
-            "filename": edited_filename
+            "saved": saved
         })
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/jobs/<job_id>/entries')
+def job_entries(job_id):
+    """分页浏览任务的翻译结果，支持子串搜索和按状态筛选"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': '任务不存在'}), 404
+        
+    try:
+        offset = int(request.args.get('offset', 0))
+        limit = int(request.args.get('limit', 50))
+    except ValueError:
+        return jsonify({'error': 'offset 和 limit 必须是整数'}), 400
+    search = request.args.get('q', '').strip()
+    status = request.args.get('filter') or None
+    if status and status not in ENTRY_FILTERS:
+        return jsonify({'error': f"filter 只能是 {', '.join(ENTRY_FILTERS)}"}), 400
+    if archive_format(job.params['filename']):
+        return jsonify({'error': '压缩包任务不支持在线浏览'}), 400
+    dest, output = job_output(job, request.args.get('lang'))
+    if dest not in job_dests(job.params):
+        return jsonify({'error': '任务不包含该目标语言'}), 404
+        
+    path = entry_index_path(job, dest)
+    if os.path.exists(path):
+        index = EntryIndex(path)
+    elif output is not None and os.path.exists(output['output_file']):
+        # 直接复用的结果没有在翻译时建立索引，首次浏览时建立
+        index = EntryIndex.build(path, output['output_file'], edit_journal(job, dest).load())
+        storage.register(path, 'index', job.id)
+    else:
+        return jsonify({'error': '翻译结果尚不可用'}), 409
+    storage.touch(path)
+        
+    try:
+        total, entries = index.query(offset, limit, search, status)
+    finally:
+        index.close()
+        
+    return jsonify({
+        'lang': dest,
+        'total': total,
+        'offset': offset,
+        'entries': entries,
+        'finished': job.finished
+    })
+
+@app.route('/jobs/<job_id>/download')
+@DOWNLOAD_SECONDS.time(kind='job')
+def download_job_result(job_id):
+    """下载任务的翻译结果（合并编辑日志中的修改），lang 参数指定目标语言"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "File not found"}), 404
+    dest, output = job_output(job, request.args.get('lang'))
+    if output is None or not os.path.exists(output['output_file']):
+        return jsonify({"error": "File not found"}), 404
+        
+    output_file = output['output_file']
+    output_filename = output['output_filename']
+    journal = edit_journal(job, dest)
+    storage.touch(output_file)
+    if os.path.exists(journal.path):
+        # 编辑日志比上次合并的结果新时才重新合并
+        edited_filename = f"edited_{output_filename}"
+        edited_file = f"{os.path.splitext(journal.path)[0]}{os.path.splitext(output_filename)[1]}"
+        if not os.path.exists(edited_file) or os.path.getmtime(edited_file) < os.path.getmtime(journal.path):
+            journal.apply(output_file, edited_file)
+            storage.register(edited_file, 'edited', job.id)
+        storage.touch(journal.path)
+        storage.touch(edited_file)
+        output_file, output_filename = edited_file, edited_filename
+        
+    DOWNLOAD_BYTES.inc(os.path.getsize(output_file), kind='job')
+    return send_file(output_file, as_attachment=True, download_name=output_filename)
+
 @app.route('/download/<path:filename>')
+@DOWNLOAD_SECONDS.time(kind='file')
 def download_file(filename):
     """下载翻译文件"""
     try:
-        # 清理旧文件
-        cleanup_old_files()
-        
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+        filepath = os.path.join(app.config['RESULTS_FOLDER'], filename)
         if not os.path.exists(filepath):
             return jsonify({"error": "File not found"}), 404
+        storage.touch(filepath)
             
+        DOWNLOAD_BYTES.inc(os.path.getsize(filepath), kind='file')
         return send_file(
             filepath,
             as_attachment=True,
@@ -358,5 +1666,10 @@ def download_file(filename):
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus 格式的指标（所有 worker 进程汇总）"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,107 @@
+import os
+import posixpath
+import shutil
+import tarfile
+import zipfile
+
+# 支持的压缩包扩展名及对应格式（长的扩展名在前）
+ARCHIVE_EXTENSIONS = (
+    ('.tar.gz', 'gztar'),
+    ('.tgz', 'gztar'),
+    ('.tar', 'tar'),
+    ('.zip', 'zip'),
+)
+CATALOG_EXTENSIONS = ('.po', '.mo')
+# 解压后的文件总大小上限，防止压缩炸弹
+DEFAULT_MAX_EXTRACT_SIZE = int(os.environ.get('MAX_ARCHIVE_EXTRACT_SIZE', 4 * 1024 * 1024 * 1024))
+
+
+class ArchiveError(Exception):
+    """压缩包无法处理（格式错误、路径不安全或解压后过大）"""
+
+
+def archive_format(filename):
+    """压缩包格式（zip、tar、gztar），不是压缩包时返回 None"""
+    name = filename.lower()
+    for ext, fmt in ARCHIVE_EXTENSIONS:
+        if name.endswith(ext):
+            return fmt
+    return None
+
+
+def split_archive_name(filename):
+    """拆分压缩包文件名，返回 (主文件名, 扩展名)，如 locale.tar.gz -> (locale, .tar.gz)"""
+    name = filename.lower()
+    for ext, _ in ARCHIVE_EXTENSIONS:
+        if name.endswith(ext):
+            return filename[:-len(ext)], filename[-len(ext):]
+    return os.path.splitext(filename)
+
+
+def _catalog_name(name):
+    """压缩包成员的规范化相对路径；不是PO/MO文件或路径不安全时返回 None"""
+    name = posixpath.normpath(name.replace('\\', '/'))
+    if not name.lower().endswith(CATALOG_EXTENSIONS):
+        return None
+    if name.startswith('/') or name == '..' or name.startswith('../') or ':' in name.split('/')[0]:
+        return None
+    return name
+
+
+def extract_catalogs(path, folder, fmt, max_size=DEFAULT_MAX_EXTRACT_SIZE):
+    """把压缩包中的PO/MO文件解压到 folder，保持目录结构，返回按路径排序的相对路径列表
+
+    其余文件、目录、链接和路径不安全的成员被忽略。
+    """
+    os.makedirs(folder, exist_ok=True)
+    names = []
+    total = 0
+    try:
+        if fmt == 'zip':
+            with zipfile.ZipFile(path) as archive:
+                for info in archive.infolist():
+                    name = None if info.is_dir() else _catalog_name(info.filename)
+                    if name is None:
+                        continue
+                    total += info.file_size
+                    if total > max_size:
+                        raise ArchiveError("压缩包解压后过大")
+                    target = os.path.join(folder, *name.split('/'))
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    with archive.open(info) as src, open(target, 'wb') as dst:
+                        shutil.copyfileobj(src, dst, 1024 * 1024)
+                    names.append(name)
+        else:
+            with tarfile.open(path, 'r:*') as archive:
+                # 按顺序读取成员，gzip 压缩的 tar 无需随机访问
+                for member in archive:
+                    name = _catalog_name(member.name) if member.isfile() else None
+                    if name is None:
+                        continue
+                    total += member.size
+                    if total > max_size:
+                        raise ArchiveError("压缩包解压后过大")
+                    target = os.path.join(folder, *name.split('/'))
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    with archive.extractfile(member) as src, open(target, 'wb') as dst:
+                        shutil.copyfileobj(src, dst, 1024 * 1024)
+                    names.append(name)
+    except (zipfile.BadZipFile, tarfile.TarError) as e:
+        raise ArchiveError(f"无法读取压缩包: {str(e)}")
+
+    # 同一路径在压缩包中出现多次时以最后一个为准
+    return sorted(set(names))
+
+
+def write_archive(folder, names, path, fmt):
+    """把 folder 中的文件按相对路径 names 写入压缩包 path"""
+    if fmt == 'zip':
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for name in names:
+                archive.write(os.path.join(folder, *name.split('/')), name)
+        return
+
+    mode = 'w:gz' if fmt == 'gztar' else 'w'
+    with tarfile.open(path, mode) as archive:
+        for name in names:
+            archive.add(os.path.join(folder, *name.split('/')), name)
@@ -0,0 +1,412 @@
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+import httpcore
+import httpx
+import googletrans
+from googletrans import Translator
+from googletrans.constants import DEFAULT_CLIENT_SERVICE_URLS, DEFAULT_USER_AGENT, LANGCODES, LANGUAGES, SPECIAL_CASES
+
+# 异步请求复用 googletrans 的内部实现（RPC 请求的编码和响应解析），只在验证过的版本上启用
+ASYNC_RPC_VERSIONS = ('4.0.0-rc.1',)
+try:
+    from googletrans.client import RPC_ID
+    from googletrans.urls import TRANSLATE_RPC
+except ImportError:
+    RPC_ID = TRANSLATE_RPC = None
+ASYNC_RPC_SUPPORTED = (
+    getattr(googletrans, '__version__', None) in ASYNC_RPC_VERSIONS
+    and RPC_ID is not None
+    and all(hasattr(Translator, name) for name in ('_translate', '_build_rpc_request'))
+)
+
+from structured_log import log_event
+
+# 批量翻译时拼接多个条目所用的分隔符
+DEFAULT_SEPARATOR = "\n=+=+=+=+=\n"
+
+# 连接池保留的空闲客户端数，以及客户端空闲或使用多久后重建（秒）
+DEFAULT_POOL_SIZE = int(os.environ.get('BACKEND_POOL_SIZE', 8))
+DEFAULT_MAX_IDLE = float(os.environ.get('BACKEND_MAX_IDLE', 60))
+DEFAULT_MAX_AGE = float(os.environ.get('BACKEND_MAX_AGE', 600))
+# 同一客户端连续失败多少次后重建
+DEFAULT_MAX_FAILURES = int(os.environ.get('BACKEND_MAX_FAILURES', 3))
+
+# 连接层面的错误：连接可能已损坏，出错的客户端立即重建
+CONNECTION_ERRORS = (httpcore.NetworkError, httpcore.ProtocolError, httpcore.TimeoutException, httpcore.ProxyError)
+
+# 与 googletrans 相同的请求参数
+RPC_PARAMS = {
+    'rpcids': RPC_ID,
+    'bl': 'boq_translate-webserver_20201207.13_p0',
+    'soc-app': 1,
+    'soc-platform': 1,
+    'soc-device': 1,
+    'rt': 'c',
+}
+
+
+class BackendError(Exception):
+    """翻译后端返回的错误"""
+
+
+class TranslationBackend:
+    """翻译后端接口
+
+    子类实现 translate()，返回译文字符串；出错时抛出异常，由调用方负责重试。
+    """
+
+    name = 'base'
+
+    def translate(self, text, dest, src='auto'):
+        """将 text 从 src 翻译为 dest，返回译文"""
+        raise NotImplementedError
+
+    async def translate_async(self, text, dest, src='auto'):
+        """translate() 的异步版本；默认在线程池中执行 translate()"""
+        return await asyncio.to_thread(self.translate, text, dest, src)
+
+
+class _PooledClient:
+    """连接池中的一个客户端及其健康状态"""
+
+    __slots__ = ('client', 'created', 'last_used', 'failures', 'in_flight', 'retired')
+
+    def __init__(self, client):
+        self.client = client
+        self.created = self.last_used = time.monotonic()
+        self.failures = 0
+        # 异步客户端上正在进行的请求数，以及是否已被替换（请求全部结束后关闭）
+        self.in_flight = 0
+        self.retired = False
+
+
+class ClientPool:
+    """长期复用的HTTP客户端池（保持连接，避免每个批次重新建立连接和TLS握手）
+
+    每个线程借出一个客户端独占使用，用完归还；没有空闲客户端时新建，空闲客户端最多保留 size 个。
+    借出时检查健康状态：空闲超过 max_idle 秒（服务端可能已关闭连接）或使用超过 max_age 秒的客户端重建。
+    请求出现连接错误时立即重建该客户端，其他错误连续出现 max_failures 次后重建，不影响其余客户端。
+    """
+
+    def __init__(self, factory, close=None, size=DEFAULT_POOL_SIZE, max_idle=DEFAULT_MAX_IDLE,
+                 max_age=DEFAULT_MAX_AGE, max_failures=DEFAULT_MAX_FAILURES, name='client'):
+        self._factory = factory
+        self._close = close
+        self.size = size
+        self.max_idle = max_idle
+        self.max_age = max_age
+        self.max_failures = max_failures
+        self.name = name
+        self.stats = Counter()
+        self._idle = []
+        self._lock = threading.Lock()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        """fork 出的子进程不使用父进程的连接"""
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def expired(self, pooled, now):
+        """客户端需要重建的原因（idle 或 age），仍可使用时返回 None"""
+        if now - pooled.last_used > self.max_idle:
+            return 'idle'
+        if now - pooled.created > self.max_age:
+            return 'age'
+        return None
+
+    def _acquire(self):
+        now = time.monotonic()
+        while True:
+            with self._lock:
+                pooled = self._idle.pop() if self._idle else None
+            if pooled is None:
+                self.stats['created'] += 1
+                return _PooledClient(self._factory())
+            reason = self.expired(pooled, now)
+            if reason is None:
+                self.stats['reused'] += 1
+                return pooled
+            self._discard(pooled, reason)
+
+    def _release(self, pooled):
+        pooled.last_used = time.monotonic()
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(pooled)
+                return
+        self._discard(pooled, 'surplus')
+
+    def _discard(self, pooled, reason):
+        self.stats[f'recycled_{reason}'] += 1
+        if reason in ('error', 'failures'):
+            log_event(
+                'backend_client_recycled', f"重建{self.name}客户端（{reason}）", logging.WARNING,
+                reason=reason, failures=pooled.failures
+            )
+        if self._close is not None:
+            try:
+                self._close(pooled.client)
+            except Exception:
+                pass
+
+    @contextmanager
+    def client(self):
+        """借出一个客户端，with 块结束后归还；块内的异常决定是否重建该客户端"""
+        pooled = self._acquire()
+        try:
+            yield pooled.client
+        except CONNECTION_ERRORS:
+            self._discard(pooled, 'error')
+            raise
+        except Exception:
+            pooled.failures += 1
+            if pooled.failures >= self.max_failures:
+                self._discard(pooled, 'failures')
+            else:
+                self._release(pooled)
+            raise
+        else:
+            pooled.failures = 0
+            self._release(pooled)
+
+    def close(self):
+        """关闭所有空闲客户端"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for pooled in idle:
+            self._discard(pooled, 'closed')
+
+
+def _language_code(code, allow_auto=False):
+    """与 googletrans 相同的语言代码规范化"""
+    code = code.lower().split('_', 1)[0]
+    if (allow_auto and code == 'auto') or code in LANGUAGES:
+        return code
+    if code in SPECIAL_CASES:
+        return SPECIAL_CASES[code]
+    if code in LANGCODES:
+        return LANGCODES[code]
+    raise ValueError(f"无效的语言代码: {code}")
+
+
+class _ReplyParser(Translator):
+    """用 googletrans 解析已取得的响应（不创建HTTP客户端），供异步请求使用"""
+
+    def __init__(self, reply):
+        self._reply = reply
+
+    def _translate(self, text, dest, src):
+        return self._reply, None
+
+
+class GoogleBackend(TranslationBackend):
+    """基于 googletrans 的 Google 翻译后端
+
+    同步请求使用客户端池（每个 googletrans 客户端保持 HTTP/2 长连接），所有批次和任务共用；
+    异步请求在每个事件循环中共用一个 HTTP/2 客户端，多个请求在同一连接上并发。
+    异步请求依赖 googletrans 的内部实现，版本不在 ASYNC_RPC_VERSIONS 中时退回线程池中的同步请求。
+    """
+
+    name = 'google'
+
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, max_idle=DEFAULT_MAX_IDLE, max_age=DEFAULT_MAX_AGE,
+                 max_failures=DEFAULT_MAX_FAILURES, timeout=None):
+        self.timeout = timeout
+        self.pool = ClientPool(
+            self._create_translator, lambda translator: translator.client.close(),
+            size=pool_size, max_idle=max_idle, max_age=max_age, max_failures=max_failures, name='翻译'
+        )
+        # 事件循环 -> 该循环中共用的异步客户端
+        self._async_clients = {}
+        self._async_lock = threading.Lock()
+        if not ASYNC_RPC_SUPPORTED:
+            log_event(
+                'backend_async_fallback',
+                f"googletrans {getattr(googletrans, '__version__', '未知版本')} 未经验证，异步请求改用线程池中的同步客户端",
+                logging.WARNING
+            )
+
+    def _create_translator(self):
+        return Translator(timeout=self.timeout)
+
+    def translate(self, text, dest, src='auto'):
+        with self.pool.client() as translator:
+            result = translator.translate(text, dest=dest, src=src)
+        return result.text if result else ''
+
+    def _async_client(self):
+        """当前事件循环的异步客户端，按与客户端池相同的规则检查健康状态"""
+        loop = asyncio.get_running_loop()
+        now = time.monotonic()
+        with self._async_lock:
+            # 清理已关闭的事件循环留下的客户端
+            for other in [other for other in self._async_clients if other.is_closed()]:
+                del self._async_clients[other]
+            pooled = self._async_clients.get(loop)
+            if pooled is not None and self.pool.expired(pooled, now) is not None:
+                self._retire_async(loop, pooled)
+                pooled = None
+            if pooled is None:
+                client = httpx.AsyncClient(http2=True)
+                client.headers.update({'User-Agent': DEFAULT_USER_AGENT, 'Referer': 'https://translate.google.com'})
+                if self.timeout is not None:
+                    client.timeout = self.timeout
+                pooled = self._async_clients[loop] = _PooledClient(client)
+            pooled.last_used = now
+            return pooled
+
+    def _retire_async(self, loop, pooled, reason=None):
+        """替换事件循环的异步客户端；旧客户端上的请求全部结束后再关闭（调用方需持有 _async_lock）"""
+        if self._async_clients.get(loop) is pooled:
+            del self._async_clients[loop]
+        if reason is not None:
+            log_event('backend_client_recycled', f"重建异步翻译客户端（{reason}）", logging.WARNING, reason=reason)
+        if not pooled.retired:
+            pooled.retired = True
+            if not pooled.in_flight:
+                loop.create_task(pooled.client.aclose())
+
+    async def translate_async(self, text, dest, src='auto'):
+        if not ASYNC_RPC_SUPPORTED:
+            # 未验证的 googletrans 版本：在线程池中使用同步客户端
+            return await super().translate_async(text, dest, src)
+        dest = _language_code(dest)
+        src = _language_code(src, allow_auto=True)
+        pooled = self._async_client()
+        pooled.in_flight += 1
+        try:
+            response = await pooled.client.post(
+                TRANSLATE_RPC.format(host=random.choice(DEFAULT_CLIENT_SERVICE_URLS)), params=RPC_PARAMS,
+                data={'f.req': _ReplyParser(None)._build_rpc_request(text, dest, src)}
+            )
+            if response.status_code != 200:
+                raise BackendError(f"翻译服务返回状态码 {response.status_code}")
+            result = _ReplyParser(response.text).translate(text, dest=dest, src=src)
+        except CONNECTION_ERRORS:
+            # 连接出错时只重建当前事件循环的客户端
+            with self._async_lock:
+                self._retire_async(asyncio.get_running_loop(), pooled, 'error')
+            raise
+        except Exception:
+            pooled.failures += 1
+            if pooled.failures >= self.pool.max_failures:
+                with self._async_lock:
+                    self._retire_async(asyncio.get_running_loop(), pooled, 'failures')
+            raise
+        finally:
+            pooled.in_flight -= 1
+            if pooled.retired and not pooled.in_flight:
+                await pooled.client.aclose()
+        pooled.failures = 0
+        return result.text if result else ''
+
+
+class FakeBackend(TranslationBackend):
+    """离线的确定性模拟后端，用于开发和性能测试
+
+    "译文"为原文的大写形式（保留索引标记和分隔符），可以模拟：
+    - latency / latency_per_char：每次请求的固定延迟和按字符数增加的延迟（秒）
+    - max_chars：单次请求的最大字符数，超出时报错
+    - failure_rate：请求随机失败的概率
+    - mangle_rate：译文中分隔符被破坏的概率
+    """
+
+    name = 'fake'
+
+    def __init__(self, latency=0.0, latency_per_char=0.0, max_chars=None,
+                 failure_rate=0.0, mangle_rate=0.0, seed=0, separator=DEFAULT_SEPARATOR):
+        self.latency = latency
+        self.latency_per_char = latency_per_char
+        self.max_chars = max_chars
+        self.failure_rate = failure_rate
+        self.mangle_rate = mangle_rate
+        self.separator = separator
+        self.stats = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _begin(self, text):
+        """记录一次请求，返回 (延迟秒数, 是否失败, 是否破坏分隔符)"""
+        with self._lock:
+            self.stats['requests'] += 1
+            self.stats['chars'] += len(text)
+            fail = self._random.random() < self.failure_rate
+            mangle = self._random.random() < self.mangle_rate
+        return self.latency + self.latency_per_char * len(text), fail, mangle
+
+    def translate(self, text, dest, src='auto'):
+        delay, fail, mangle = self._begin(text)
+        if delay > 0:
+            time.sleep(delay)
+        return self._finish(text, fail, mangle)
+
+    async def translate_async(self, text, dest, src='auto'):
+        delay, fail, mangle = self._begin(text)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return self._finish(text, fail, mangle)
+
+    def _finish(self, text, fail, mangle):
+        if self.max_chars is not None and len(text) > self.max_chars:
+            with self._lock:
+                self.stats['failures'] += 1
+            raise BackendError(f"请求过大（{len(text)} 字符，上限 {self.max_chars}）")
+
+        if fail:
+            with self._lock:
+                self.stats['failures'] += 1
+            raise BackendError("模拟的翻译服务错误")
+
+        translated = text.upper()
+        if mangle and self.separator in translated:
+            # 模拟翻译服务改写分隔符：把其中一个分隔符合并成空格
+            with self._lock:
+                self.stats['mangled'] += 1
+            translated = translated.replace(self.separator, ' ', 1)
+        return translated
+
+
+_shared_backends = {}
+_shared_lock = threading.Lock()
+
+
+def shared_backend(backend=None):
+    """按名称取得进程内共用的翻译后端（首次使用时创建），所有批次和任务共用其连接池；传入后端实例时直接返回"""
+    if isinstance(backend, TranslationBackend):
+        return backend
+    name = backend or os.environ.get('TRANSLATION_BACKEND', 'google')
+    with _shared_lock:
+        if name not in _shared_backends:
+            _shared_backends[name] = create_backend(name)
+        return _shared_backends[name]
+
+
+def create_backend(backend=None):
+    """按名称创建翻译后端；传入后端实例时直接返回
+
+    未指定名称时读取环境变量 TRANSLATION_BACKEND（默认 google）。
+    fake 后端的参数从 FAKE_BACKEND_* 环境变量读取。
+    """
+    if isinstance(backend, TranslationBackend):
+        return backend
+
+    name = backend or os.environ.get('TRANSLATION_BACKEND', 'google')
+    if name == 'google':
+        return GoogleBackend()
+    if name == 'fake':
+        max_chars = os.environ.get('FAKE_BACKEND_MAX_CHARS')
+        return FakeBackend(
+            latency=float(os.environ.get('FAKE_BACKEND_LATENCY', 0)),
+            max_chars=int(max_chars) if max_chars else None,
+            failure_rate=float(os.environ.get('FAKE_BACKEND_FAILURE_RATE', 0)),
+            mangle_rate=float(os.environ.get('FAKE_BACKEND_MANGLE_RATE', 0)),
+        )
+    raise ValueError(f"未知的翻译后端: {name}")
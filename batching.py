@@ -0,0 +1,158 @@
+import re
+import threading
+
+from backends import DEFAULT_SEPARATOR
+
+# 字符预算的默认值（Google翻译单次请求上限约为5000字符）
+DEFAULT_BUDGET = 2000
+MIN_BUDGET = 200
+MAX_BUDGET = 4500
+
+# 批量请求中每个条目前的索引标记，翻译服务可能在括号内外插入空格
+MARKER_PATTERN = re.compile(r'\[\s*(\d+)\s*\]')
+# 被翻译服务改写（插入空格、删除换行等）后的分隔符
+MANGLED_SEPARATOR_PATTERN = re.compile(r'(?:\s*[=+]){5,}\s*')
+# 以（可能被改写的）分隔符结尾的文本
+SEPARATOR_END_PATTERN = re.compile(r'[=+](?:\s*[=+]){4}\s*\Z')
+
+
+def _at_boundary(text, start):
+    """位置 start 是否处于段落开头：全文开头、换行或分隔符之后（允许中间有空格）"""
+    i = start
+    while i > 0 and text[i - 1] in ' \t':
+        i -= 1
+    if i == 0 or text[i - 1] == '\n':
+        return True
+    return SEPARATOR_END_PATTERN.search(text, max(0, i - 40), i) is not None
+
+
+def item_size(item):
+    """条目在批量请求中占用的字符数（含索引标记和分隔符）"""
+    return len(item.msgid) + len(DEFAULT_SEPARATOR) + 6
+
+
+def build_batch_text(texts, separator=DEFAULT_SEPARATOR):
+    """将各条原文加上索引标记后拼接为一次请求的文本"""
+    return separator.join(f"[{i}]{text}" for i, text in enumerate(texts))
+
+
+def parse_batch_reply(text, count, separator=DEFAULT_SEPARATOR):
+    """按索引标记解析批量译文，返回 {索引: 译文}
+
+    分隔符完好时直接按分隔符切分；否则在全文中查找索引标记，
+    只接受位于段落开头（全文开头、换行或分隔符之后）且严格递增的标记作为段落边界。
+    段落中间出现的其他标记可能是原文中的 "[n]"，也可能是丢失了分隔符的边界，
+    无法确定时该段落按不匹配处理。无法匹配的索引不会出现在返回结果中。
+    """
+    parts = text.split(separator)
+    if len(parts) == count:
+        result = {}
+        for i, part in enumerate(parts):
+            cleaned = part.strip()
+            match = MARKER_PATTERN.match(cleaned)
+            if match and int(match.group(1)) == i:
+                cleaned = cleaned[match.end():].strip()
+            if cleaned:
+                result[i] = cleaned
+        if len(result) == count:
+            return result
+
+    # 查找递增的索引标记作为段落边界
+    boundaries = []
+    # 含有位置不正确的标记的段落（boundaries 中的序号）
+    ambiguous = set()
+    last_index = -1
+    for match in MARKER_PATTERN.finditer(text):
+        index = int(match.group(1))
+        if index >= count:
+            continue
+        if index > last_index and _at_boundary(text, match.start()):
+            boundaries.append((index, match.start(), match.end()))
+            last_index = index
+        elif boundaries:
+            ambiguous.add(len(boundaries) - 1)
+
+    result = {}
+    for n, (index, _, content_start) in enumerate(boundaries):
+        if n in ambiguous:
+            continue
+        content_end = boundaries[n + 1][1] if n + 1 < len(boundaries) else len(text)
+        # 段落中若还有分隔符，其后是丢失了索引标记的其他条目，只保留分隔符之前的部分
+        cleaned = MANGLED_SEPARATOR_PATTERN.split(text[content_start:content_end], 1)[0].strip()
+        if cleaned:
+            result[index] = cleaned
+    return result
+
+
+class BatchPacker:
+    """按字符预算打包翻译批次，并根据请求结果自适应调整预算
+
+    采用加性增、乘性减（AIMD）策略：
+    批次成功且延迟正常时预算增加 increase 个字符；
+    请求失败、延迟过高或译文分段数量不匹配时预算乘以 decrease。
+    """
+
+    def __init__(self, budget=DEFAULT_BUDGET, min_budget=MIN_BUDGET, max_budget=MAX_BUDGET,
+                 increase=250, decrease=0.5, target_latency=5.0):
+        self.min_budget = min_budget
+        self.max_budget = max_budget
+        self.increase = increase
+        self.decrease = decrease
+        self.target_latency = target_latency
+        self._budget = max(min_budget, min(budget, max_budget))
+        self._lock = threading.Lock()
+
+    @property
+    def budget(self):
+        """当前的字符预算"""
+        return self._budget
+
+    def pack(self, items):
+        """按当前预算依次产出批次
+
+        批次在被取用时才打包，因此后续批次会使用最新调整后的预算。
+        超出预算的超长条目单独成批。
+        """
+        batch = []
+        batch_chars = 0
+        for item in items:
+            size = item_size(item)
+            if size >= self._budget:
+                # 超长条目单独成批
+                if batch:
+                    yield batch
+                    batch, batch_chars = [], 0
+                yield [item]
+                continue
+
+            if batch and batch_chars + size > self._budget:
+                yield batch
+                batch, batch_chars = [], 0
+
+            batch.append(item)
+            batch_chars += size
+
+        if batch:
+            yield batch
+
+    def record_success(self, latency, chars):
+        """记录一次成功的请求"""
+        with self._lock:
+            if latency > self.target_latency:
+                self._shrink()
+            elif chars >= self._budget * 0.75:
+                # 只有批次接近装满时才说明预算是瓶颈
+                self._budget = min(self.max_budget, self._budget + self.increase)
+
+    def record_failure(self):
+        """记录一次失败的请求"""
+        with self._lock:
+            self._shrink()
+
+    def record_mismatch(self):
+        """记录一次译文分段数量不匹配"""
+        with self._lock:
+            self._shrink()
+
+    def _shrink(self):
+        self._budget = max(self.min_budget, int(self._budget * self.decrease))
@@ -0,0 +1,260 @@
+"""离线性能测试
+
+使用 FakeBackend 模拟翻译服务，在无网络的环境下测量：
+- batch：直接调用 app.translate_batch
+- sse：通过 /translate 提交任务，并读取任务的 SSE 进度流
+- gui：调用 TranslatorApp.translate_batch（需要 ttkbootstrap 和图形界面）
+
+用法示例：
+    python benchmark.py --sizes 1000,10000 --latency 0.05 --failure-rate 0.01
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from unittest import mock
+
+import polib
+
+# 使用独立的临时目录，避免污染真实的翻译记忆库和上传目录
+WORK_DIR = tempfile.mkdtemp(prefix='mopo-bench-')
+os.environ['TRANSLATION_MEMORY_PATH'] = os.path.join(WORK_DIR, 'translation_memory.sqlite3')
+os.environ['RATE_LIMIT_PATH'] = os.path.join(WORK_DIR, 'rate_limit.sqlite3')
+os.environ['UPLOAD_STORE_FOLDER'] = os.path.join(WORK_DIR, 'store')
+
+import app as web_app
+from backends import FakeBackend
+from rate_limit import RateLimiter
+from translation_memory import TranslationMemory
+
+WORDS = (
+    "save cancel settings open close file edit view help delete user account "
+    "password email name address update upload download select language theme "
+    "error warning success failed please enter your the a an of to for with "
+    "this that is are was will be not can cannot new old page item list search"
+).split()
+
+
+class BenchmarkSkipped(Exception):
+    """当前环境无法运行该测试"""
+
+
+def generate_catalog(size, seed=0, duplicate_rate=0.25, long_rate=0.01):
+    """生成确定性的合成PO目录"""
+    rng = random.Random(seed)
+    catalog = polib.POFile()
+    catalog.metadata = {'Content-Type': 'text/plain; charset=utf-8'}
+    msgids = []
+    for i in range(size):
+        if msgids and rng.random() < duplicate_rate:
+            # 重复的原文（不同上下文）
+            msgid = rng.choice(msgids)
+            msgctxt = f"ctx{i}"
+        else:
+            word_count = rng.randint(80, 200) if rng.random() < long_rate else rng.randint(1, 12)
+            msgid = ' '.join(rng.choice(WORDS) for _ in range(word_count)).capitalize() + f" #{i}"
+            msgctxt = None
+            msgids.append(msgid)
+        catalog.append(polib.POEntry(msgid=msgid, msgctxt=msgctxt, occurrences=[(f"src/file{i % 50}.py", str(i))]))
+    return catalog
+
+
+def make_backend(args):
+    """按命令行参数创建模拟后端"""
+    return FakeBackend(
+        latency=args.latency,
+        latency_per_char=args.latency_per_char,
+        max_chars=args.max_chars,
+        failure_rate=args.failure_rate,
+        mangle_rate=args.mangle_rate,
+        seed=args.seed,
+    )
+
+
+def reset_translation_memory(name):
+    """每次运行使用全新的翻译记忆库，避免缓存命中影响结果"""
+    path = os.path.join(WORK_DIR, f"tm-{name}.sqlite3")
+    if os.path.exists(path):
+        os.remove(path)
+    web_app.translation_memory = TranslationMemory(path)
+    return web_app.translation_memory
+
+
+def run_batch(catalog, backend, args):
+    """按自适应批次逐批调用 app.translate_batch"""
+    from batching import BatchPacker
+
+    web_app.app.config['TRANSLATION_BACKEND'] = backend
+    entries = [entry for entry in catalog if entry.msgid]
+    packer = BatchPacker(web_app.app.config['BATCH_CHAR_BUDGET'])
+    for batch in packer.pack(entries):
+        web_app.translate_batch(batch, packer)
+    return len(entries)
+
+
+def run_sse(catalog, backend, args):
+    """通过测试客户端提交翻译任务并读取 /jobs/<id>/events 进度流"""
+    web_app.app.config['TRANSLATION_BACKEND'] = backend
+    web_app.app.config['UPLOAD_FOLDER'] = WORK_DIR
+    web_app.app.config['RESULTS_FOLDER'] = os.path.join(WORK_DIR, 'results')
+    web_app.app.config['CHECKPOINT_FOLDER'] = os.path.join(WORK_DIR, 'checkpoints')
+    web_app.app.config['TRANSLATE_WORKERS'] = args.workers
+    reset_translation_memory('sse')
+
+    filepath = os.path.join(WORK_DIR, 'bench.po')
+    catalog.save(filepath)
+    if tracemalloc.is_tracing():
+        # 只统计翻译流程本身的内存，不含写出测试文件
+        tracemalloc.reset_peak()
+
+    client = web_app.app.test_client()
+    job = client.post('/translate', json={'filepath': filepath, 'filename': 'bench.po'}).get_json()
+    response = client.get(job['events_url'])
+    completed = None
+    for chunk in response.response:
+        message = chunk.decode('utf-8') if isinstance(chunk, bytes) else chunk
+        for line in message.splitlines():
+            if not line.startswith('data: '):
+                continue
+            data = json.loads(line[6:])
+            if data.get('error'):
+                raise RuntimeError(data['error'])
+            if data.get('status') == 'complete':
+                completed = data
+    if completed is None:
+        raise RuntimeError("翻译流程没有返回完成消息")
+    return completed['total_entries']
+
+
+def run_gui(catalog, backend, args):
+    """调用 TranslatorApp.translate_batch（隐藏主窗口）"""
+    try:
+        import tkinter
+        import ttkbootstrap as ttk
+        from translator_app import TranslatorApp
+    except ImportError as e:
+        raise BenchmarkSkipped(str(e))
+    from dedup import group_entries
+    from batching import BatchPacker
+
+    # 只在创建和运行桌面版期间使用模拟后端，不影响同一进程中随后运行的其他测试
+    with mock.patch.dict(os.environ, TRANSLATION_BACKEND='fake'):
+        try:
+            root = ttk.Window()
+        except tkinter.TclError as e:
+            raise BenchmarkSkipped(f"无法创建窗口: {e}")
+        root.withdraw()
+        try:
+            gui = TranslatorApp(root)
+            gui.translator = backend
+            gui.translation_memory = reset_translation_memory('gui')
+            gui.log_message = lambda message: None
+
+            filepath = os.path.join(WORK_DIR, 'bench.po')
+            catalog.save(filepath)
+            gui.current_file = filepath
+            gui.load_file()
+
+            entries = [entry for entry in gui.po_file if entry.msgid]
+            gui.packer = BatchPacker()
+            for batch in gui.packer.pack(group_entries(entries)):
+                gui.translate_batch(batch)
+            return len(entries)
+        finally:
+            root.destroy()
+
+
+TARGETS = {
+    'batch': run_batch,
+    'sse': run_sse,
+    'gui': run_gui,
+}
+
+
+def measure(target, size, args):
+    """运行一次测试并返回结果"""
+    catalog = generate_catalog(size, seed=args.seed)
+    backend = make_backend(args)
+
+    if args.memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        entries = TARGETS[target](catalog, backend, args)
+    except BenchmarkSkipped as e:
+        return {'target': target, 'size': size, 'skipped': str(e)}
+    finally:
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if args.memory else 0
+        if args.memory:
+            tracemalloc.stop()
+
+    return {
+        'target': target,
+        'size': size,
+        'seconds': round(elapsed, 3),
+        'entries_per_sec': round(entries / elapsed, 1) if elapsed > 0 else None,
+        'requests': backend.stats['requests'],
+        'requests_per_entry': round(backend.stats['requests'] / entries, 4) if entries else 0,
+        'retries': backend.stats['failures'],
+        'mangled': backend.stats['mangled'],
+        'peak_memory_mb': round(peak / 1024 / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PO/MO翻译器离线性能测试")
+    parser.add_argument('--sizes', default='1000,10000,50000,200000', help="目录条目数，逗号分隔")
+    parser.add_argument('--targets', default='batch,sse,gui', help="测试对象：batch,sse,gui")
+    parser.add_argument('--latency', type=float, default=0.0, help="每次请求的模拟延迟（秒）")
+    parser.add_argument('--latency-per-char', type=float, default=0.0, help="每字符增加的模拟延迟（秒）")
+    parser.add_argument('--max-chars', type=int, default=None, help="单次请求的最大字符数")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="请求随机失败的概率")
+    parser.add_argument('--mangle-rate', type=float, default=0.0, help="分隔符被破坏的概率")
+    parser.add_argument('--workers', type=int, default=web_app.app.config['TRANSLATE_WORKERS'], help="SSE流程的并发批次数")
+    parser.add_argument('--rate', type=float, default=0.0, help="全局限流（请求/秒），0 表示不限流")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', dest='memory', action='store_false', help="不统计峰值内存（tracemalloc会拖慢运行）")
+    parser.add_argument('--json', help="将结果以JSON格式写入文件")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    targets = [target for target in args.targets.split(',') if target]
+    for target in targets:
+        if target not in TARGETS:
+            parser.error(f"未知的测试对象: {target}")
+
+    web_app.rate_limiter = RateLimiter(os.environ['RATE_LIMIT_PATH'], rate=args.rate, burst=max(1.0, args.rate))
+
+    results = []
+    header = f"{'target':<8}{'size':>9}{'seconds':>10}{'entries/s':>12}{'req/entry':>11}{'retries':>9}{'peak MB':>9}"
+    print(header)
+    print('-' * len(header))
+    try:
+        for target in targets:
+            for size in sizes:
+                result = measure(target, size, args)
+                results.append(result)
+                if 'skipped' in result:
+                    print(f"{target:<8}{size:>9}  跳过: {result['skipped']}")
+                    continue
+                print(
+                    f"{target:<8}{size:>9}{result['seconds']:>10.2f}{result['entries_per_sec']:>12.1f}"
+                    f"{result['requests_per_entry']:>11.4f}{result['retries']:>9}{result['peak_memory_mb']:>9.1f}"
+                )
+                sys.stdout.flush()
+    finally:
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
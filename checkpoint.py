@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+
+
+def entry_key(entry):
+    """条目的唯一键（与 gettext 相同，用 \\x04 连接 msgctxt 和 msgid）"""
+    if entry.msgctxt:
+        return f"{entry.msgctxt}\x04{entry.msgid}"
+    return entry.msgid
+
+
+def settings_key(settings):
+    """引擎设置的规范化表示，用作结果索引和检查点的键的一部分"""
+    return json.dumps(settings, sort_keys=True, ensure_ascii=False)
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """计算文件内容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Checkpoint:
+    """翻译任务的检查点
+
+    每完成一个批次就把译文以 JSON Lines 的形式追加到检查点文件，
+    不需要重新序列化整个目录。同一输入文件、同一目标语言的任务共用一个检查点，
+    任务重试或服务重启后重新提交时可以跳过已翻译的条目。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    @classmethod
+    def for_digest(cls, digest, dest, folder, settings=None):
+        """按输入文件的哈希、目标语言和引擎设置定位检查点
+
+        设置（增量模式、参考译文、本地过滤等）不同的任务使用不同的检查点，不会复用按其他设置得到的译文。
+        """
+        os.makedirs(folder, exist_ok=True)
+        if settings is not None:
+            digest = hashlib.sha256(f"{digest}\n{settings_key(settings)}".encode('utf-8')).hexdigest()
+        return cls(os.path.join(folder, f"{digest}_{dest}.jsonl"))
+
+    def load(self):
+        """读取已完成的译文，返回 {条目键: 译文}"""
+        completed = {}
+        if not os.path.exists(self.path):
+            return completed
+
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 进程中断时最后一行可能不完整
+                    continue
+                completed[record['key']] = record['msgstr']
+        return completed
+
+    def append(self, entries):
+        """追加已翻译条目的译文"""
+        lines = [
+            json.dumps({'key': entry_key(entry), 'msgstr': entry.msgstr}, ensure_ascii=False) + '\n'
+            for entry in entries
+            if entry.msgstr
+        ]
+        if not lines:
+            return
+
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.writelines(lines)
+        self._file.flush()
+
+    def close(self):
+        """关闭检查点文件"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def remove(self):
+        """任务完成后删除检查点"""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
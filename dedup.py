@@ -0,0 +1,42 @@
+class EntryGroup:
+    """原文相同的一组条目
+
+    对外表现得像单个条目（具有 msgid / msgstr 属性），
+    写入译文时会同步到组内的所有条目。
+    """
+
+    def __init__(self, msgid):
+        self.msgid = msgid
+        self.entries = []
+
+    @property
+    def msgstr(self):
+        return self.entries[0].msgstr if self.entries else ''
+
+    @msgstr.setter
+    def msgstr(self, value):
+        for entry in self.entries:
+            entry.msgstr = value
+
+    def sync(self):
+        """把第一个条目的译文写入组内其他条目（翻译过程中并入组的条目尚未收到译文）"""
+        self.msgstr = self.msgstr
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def group_entries(entries):
+    """按原文合并重复条目，按首次出现的顺序返回条目组列表"""
+    groups = {}
+    for entry in entries:
+        group = groups.get(entry.msgid)
+        if group is None:
+            group = groups[entry.msgid] = EntryGroup(entry.msgid)
+        group.entries.append(entry)
+    return list(groups.values())
+
+
+def expand_groups(groups):
+    """将条目组展开为原始条目列表"""
+    return [entry for group in groups for entry in group.entries]
@@ -0,0 +1,107 @@
+import json
+import os
+import threading
+
+from checkpoint import entry_key
+from mo_file import read_mofile
+from streaming import POStreamWriter, detect_encoding, read_po_chunks
+
+# 日志文件小于该大小时不压缩
+MIN_COMPACT_SIZE = 64 * 1024
+
+
+class EditJournal:
+    """翻译结果的编辑日志
+
+    每次保存只把修改过的条目（以条目键为ID）追加到日志末尾，耗时只与修改数量有关；
+    下载时再把日志合并到翻译结果中。同一条目的多次修改以最后一次为准，
+    日志超过上次压缩后大小的两倍时重写为每个条目只保留一行。
+    """
+
+    _lock = threading.Lock()
+    # 每个日志上次压缩后的大小，用于判断何时需要再次压缩
+    _compacted_sizes = {}
+
+    def __init__(self, path):
+        self.path = path
+
+    def append(self, edits):
+        """追加修改，edits 为 [{'id': 条目键, 'msgstr': 译文}, ...]"""
+        lines = [
+            json.dumps({'id': edit['id'], 'msgstr': edit['msgstr']}, ensure_ascii=False) + '\n'
+            for edit in edits
+        ]
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.writelines(lines)
+
+            size = os.path.getsize(self.path)
+            threshold = max(MIN_COMPACT_SIZE, 2 * self._compacted_sizes.get(self.path, 0))
+            if size > threshold:
+                self._compact()
+        return len(lines)
+
+    def load(self):
+        """读取全部修改，返回 {条目键: 译文}"""
+        edits = {}
+        if not os.path.exists(self.path):
+            return edits
+
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                edits[record['id']] = record['msgstr']
+        return edits
+
+    def compact(self):
+        """重写日志，每个条目只保留最后一次修改"""
+        with self._lock:
+            self._compact()
+
+    def _compact(self):
+        edits = self.load()
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            for key, msgstr in edits.items():
+                f.write(json.dumps({'id': key, 'msgstr': msgstr}, ensure_ascii=False) + '\n')
+        os.replace(temp_path, self.path)
+        self._compacted_sizes[self.path] = os.path.getsize(self.path)
+
+    def apply(self, catalog_path, output_path):
+        """把修改合并到 catalog_path，写出到 output_path，返回应用的修改数"""
+        with self._lock:
+            # 合并前顺便压缩，下次合并时读取的日志更短
+            self._compact()
+            edits = self.load()
+
+        applied = 0
+        if catalog_path.endswith('.mo'):
+            catalog = read_mofile(catalog_path)
+            for entry in catalog:
+                key = entry_key(entry)
+                if key in edits:
+                    entry.msgstr = edits[key]
+                    applied += 1
+            catalog.save(output_path)
+            return applied
+
+        writer = POStreamWriter(output_path, detect_encoding(catalog_path))
+        try:
+            for chunk in read_po_chunks(catalog_path):
+                for entry in chunk:
+                    key = entry_key(entry)
+                    if key in edits:
+                        entry.msgstr = edits[key]
+                        applied += 1
+                writer.write(chunk)
+        except Exception:
+            writer.discard()
+            raise
+        writer.commit()
+        return applied
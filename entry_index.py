@@ -0,0 +1,204 @@
+import os
+import sqlite3
+import threading
+import uuid
+
+from checkpoint import entry_key
+from incremental import is_translated
+from mo_file import read_mofile
+from streaming import read_po_chunks
+
+# 可用的筛选条件
+FILTERS = ('untranslated', 'fuzzy', 'failed')
+# 单页最多返回的条目数
+MAX_PAGE_SIZE = 500
+# 三元组全文索引只能匹配至少3个字符的查询，更短的查询退回 LIKE
+MIN_FTS_QUERY = 3
+
+
+def _like_pattern(text):
+    return '%' + text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+class EntryIndex:
+    """翻译结果的条目索引，用于分页浏览、搜索和筛选
+
+    条目按在文件中的顺序存入SQLite，msgctxt、msgid 和 msgstr 建立
+    FTS5 三元组全文索引，支持任意子串搜索；SQLite 不支持 FTS5 时退回 LIKE 扫描。
+    """
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self._lock = threading.Lock()
+        # 翻译任务在工作线程中写入，请求线程中查询
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                position INTEGER PRIMARY KEY,
+                id TEXT NOT NULL,
+                msgctxt TEXT NOT NULL,
+                msgid TEXT NOT NULL,
+                msgstr TEXT NOT NULL,
+                flags TEXT NOT NULL,
+                untranslated INTEGER NOT NULL,
+                fuzzy INTEGER NOT NULL,
+                failed INTEGER NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_id ON entries (id)")
+        self.full_text = self._create_fts()
+        self._conn.commit()
+
+    def _create_fts(self):
+        try:
+            self._conn.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(
+                    msgctxt, msgid, msgstr,
+                    content='entries', content_rowid='position', tokenize='trigram'
+                )
+            """)
+        except sqlite3.OperationalError:
+            # SQLite 未编译 FTS5 或版本过旧（三元组分词需要 3.34+）
+            return False
+
+        self._conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS entries_fts_insert AFTER INSERT ON entries BEGIN
+                INSERT INTO entries_fts (rowid, msgctxt, msgid, msgstr)
+                VALUES (new.position, new.msgctxt, new.msgid, new.msgstr);
+            END
+        """)
+        self._conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS entries_fts_update AFTER UPDATE OF msgstr ON entries BEGIN
+                INSERT INTO entries_fts (entries_fts, rowid, msgctxt, msgid, msgstr)
+                VALUES ('delete', old.position, old.msgctxt, old.msgid, old.msgstr);
+                INSERT INTO entries_fts (rowid, msgctxt, msgid, msgstr)
+                VALUES (new.position, new.msgctxt, new.msgid, new.msgstr);
+            END
+        """)
+        return True
+
+    @classmethod
+    def build(cls, path, catalog_path, edits=None):
+        """从翻译结果文件建立索引（如直接复用的结果），edits 为编辑日志中的修改"""
+        # 并发请求各自建立，最后一个替换时生效
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        index = cls(temp_path)
+        try:
+            if catalog_path.endswith('.mo'):
+                index.add(read_mofile(catalog_path))
+            else:
+                for chunk in read_po_chunks(catalog_path):
+                    index.add(chunk)
+            if edits:
+                index.update(edits)
+        except Exception:
+            index.remove()
+            raise
+        index.close()
+        os.replace(temp_path, path)
+        return cls(path)
+
+    def add(self, entries, failed=()):
+        """按顺序追加条目（跳过文件头和废弃条目），failed 为翻译失败的条目键集合"""
+        rows = []
+        for entry in entries:
+            if not entry.msgid or getattr(entry, 'obsolete', False):
+                continue
+            key = entry_key(entry)
+            flags = list(getattr(entry, 'flags', []))
+            msgstr = entry.msgstr or (entry.msgstr_plural or {}).get(0, '')
+            rows.append((
+                key, entry.msgctxt or '', entry.msgid, msgstr, ','.join(flags),
+                int(not is_translated(entry) and 'fuzzy' not in flags),
+                int('fuzzy' in flags), int(key in failed)
+            ))
+        if not rows:
+            return
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO entries (id, msgctxt, msgid, msgstr, flags, untranslated, fuzzy, failed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+    def update(self, edits):
+        """应用编辑，edits 为 {条目键: 译文} 或 [{'id', 'msgstr'}, ...]"""
+        if isinstance(edits, dict):
+            edits = [{'id': key, 'msgstr': msgstr} for key, msgstr in edits.items()]
+        rows = [
+            (edit['msgstr'], int(not edit['msgstr']), int(not edit['msgstr']), edit['id'])
+            for edit in edits
+        ]
+        with self._lock:
+            # 手动填写译文后不再算作未翻译或翻译失败
+            self._conn.executemany(
+                "UPDATE entries SET msgstr = ?, untranslated = ?, failed = failed AND ? WHERE id = ?",
+                rows
+            )
+            self._conn.commit()
+
+    def query(self, offset=0, limit=50, search=None, status=None):
+        """分页查询，返回 (符合条件的总数, 条目列表)
+
+        search 匹配 msgctxt、msgid 或 msgstr 中的任意子串，
+        status 为 FILTERS 之一，只返回未翻译、模糊或翻译失败的条目。
+        """
+        conditions = []
+        params = []
+        if search:
+            if self.full_text and len(search) >= MIN_FTS_QUERY:
+                conditions.append("position IN (SELECT rowid FROM entries_fts WHERE entries_fts MATCH ?)")
+                params.append('"' + search.replace('"', '""') + '"')
+            else:
+                conditions.append(
+                    "(msgctxt LIKE ? ESCAPE '\\' OR msgid LIKE ? ESCAPE '\\' OR msgstr LIKE ? ESCAPE '\\')"
+                )
+                params.extend([_like_pattern(search)] * 3)
+        if status:
+            if status not in FILTERS:
+                raise ValueError(f"未知的筛选条件: {status}")
+            conditions.append(f"{status} = 1")
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        limit = max(0, min(limit, MAX_PAGE_SIZE))
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM entries {where}", params).fetchone()[0]
+            rows = self._conn.execute(
+                "SELECT position, id, msgctxt, msgid, msgstr, flags, untranslated, fuzzy, failed "
+                f"FROM entries {where} ORDER BY position LIMIT ? OFFSET ?",
+                params + [limit, max(0, offset)]
+            ).fetchall()
+
+        return total, [
+            {
+                'position': row[0],
+                'id': row[1],
+                'msgctxt': row[2],
+                'msgid': row[3],
+                'msgstr': row[4],
+                'flags': row[5].split(',') if row[5] else [],
+                'untranslated': bool(row[6]),
+                'fuzzy': bool(row[7]),
+                'failed': bool(row[8])
+            }
+            for row in rows
+        ]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def remove(self):
+        """关闭并删除索引文件"""
+        self.close()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
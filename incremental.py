@@ -0,0 +1,49 @@
+import polib
+
+from checkpoint import entry_key
+from mo_file import read_mofile
+
+
+def is_translated(entry):
+    """条目是否已有可用的译文（非模糊、非废弃）"""
+    if getattr(entry, 'obsolete', False) or 'fuzzy' in getattr(entry, 'flags', []):
+        return False
+    if entry.msgid_plural:
+        return bool(entry.msgstr_plural) and all(entry.msgstr_plural.values())
+    return bool(entry.msgstr)
+
+
+def load_reference(filepath):
+    """读取参考译文目录，返回 {条目键: 译文}，只收录已翻译的条目"""
+    catalog = read_mofile(filepath) if filepath.endswith('.mo') else polib.pofile(filepath)
+    return {
+        entry_key(entry): entry.msgstr
+        for entry in catalog
+        if entry.msgid and not entry.msgid_plural and is_translated(entry)
+    }
+
+
+def select_entries(entries, reference=None):
+    """增量模式：筛选出需要翻译的条目，返回 (待翻译条目, 跳过数, 参考译文复用数)
+
+    已翻译且非模糊的条目直接跳过；其余条目若在参考译文中有相同
+    msgctxt 和 msgid 的译文则直接复用（与 msgmerge 相同，复用后清除 fuzzy 标记）。
+    """
+    pending = []
+    skipped = 0
+    reused = 0
+    for entry in entries:
+        if is_translated(entry):
+            skipped += 1
+            continue
+
+        msgstr = reference.get(entry_key(entry)) if reference and not entry.msgid_plural else None
+        if msgstr:
+            entry.msgstr = msgstr
+            if 'fuzzy' in getattr(entry, 'flags', []):
+                entry.flags.remove('fuzzy')
+            reused += 1
+            continue
+
+        pending.append(entry)
+    return pending, skipped, reused
@@ -0,0 +1,252 @@
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+
+from structured_log import log_event
+
+DEFAULT_QUOTA = int(os.environ.get('STORAGE_QUOTA', 10 * 1024 * 1024 * 1024))
+DEFAULT_TTL = float(os.environ.get('STORAGE_TTL', 24 * 3600))
+DEFAULT_SWEEP_INTERVAL = float(os.environ.get('STORAGE_SWEEP_INTERVAL', 300))
+# SQLite 文件附带的日志文件，随主文件一起删除
+SIDE_FILES = ('-wal', '-shm', '-journal')
+# 由任务生成、文件名以任务ID开头的文件
+JOB_FILE_PATTERN = re.compile(r'([0-9a-f]{32})_')
+
+
+def _file_size(path):
+    size = 0
+    for suffix in ('',) + SIDE_FILES:
+        try:
+            size += os.path.getsize(path + suffix)
+        except OSError:
+            pass
+    return size
+
+
+class StorageJanitor:
+    """存储文件清单和后台清理
+
+    上传文件、翻译结果、条目索引、编辑日志等在写入时登记到清单（SQLite，各进程共享），
+    被使用时更新访问时间。后台线程每隔 sweep_interval 秒按清单清理：删除超过 ttl 秒未访问的文件，
+    总大小超过 quota 时按最近最少使用的顺序删除，直到低于配额。清理只查询清单，不扫描目录。
+
+    未结束的任务通过租约保护：租约有效期内，任务登记的文件和任务使用的输入文件不会被删除。
+    每个进程的清理线程定期为本进程的任务续约，进程退出后租约自动过期。
+    """
+
+    def __init__(self, path, quota=DEFAULT_QUOTA, ttl=DEFAULT_TTL, sweep_interval=DEFAULT_SWEEP_INTERVAL,
+                 active_jobs=None, on_evict=None, adopt_folders=()):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.quota = quota
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        # 返回本进程未结束任务的 [(任务ID, [使用的文件路径])]
+        self._active_jobs = active_jobs
+        # 每删除一个文件调用 on_evict(类别, 大小, 原因)
+        self._on_evict = on_evict
+        # 清理线程启动时接管的目录：[(目录, 类别, 文件名正则表达式或 None)]
+        self.adopt_folders = list(adopt_folders)
+        # 租约有效期：清理线程每轮续约，错过两轮仍然有效
+        self.lease_time = max(60.0, sweep_interval * 3)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS artifacts (
+                path TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL,
+                job_id TEXT
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS artifacts_accessed ON artifacts (accessed)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS artifacts_job ON artifacts (job_id)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS leases (
+                job_id TEXT NOT NULL,
+                path TEXT NOT NULL,
+                expires REAL NOT NULL,
+                PRIMARY KEY (job_id, path)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS leases_path ON leases (path)")
+        self._thread = None
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # 子进程重新连接，并在首次登记文件时启动自己的清理线程
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._thread = None
+
+    def _transaction(self, func):
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                result = func(cursor)
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+            cursor.execute("COMMIT")
+            return result
+
+    def start(self):
+        """启动后台清理线程（首次登记文件时自动启动，避免在 gunicorn fork 之前创建线程）"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._sweep_loop, name='storage-janitor', daemon=True)
+                self._thread.start()
+
+    def register(self, path, kind, job_id=None):
+        """登记（或更新）一个存储文件的大小和访问时间；job_id 为生成该文件的任务"""
+        size = _file_size(path)
+        now = time.time()
+        self._transaction(lambda cursor: cursor.execute("""
+            INSERT INTO artifacts (path, kind, size, created, accessed, job_id) VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (path) DO UPDATE SET
+                size = excluded.size, accessed = excluded.accessed,
+                job_id = COALESCE(excluded.job_id, artifacts.job_id)
+        """, (path, kind, size, now, now, job_id)))
+        self.start()
+
+    def touch(self, path):
+        """更新文件的访问时间（下载、复用时调用），未登记的文件忽略"""
+        self._transaction(lambda cursor: cursor.execute(
+            "UPDATE artifacts SET accessed = ? WHERE path = ?", (time.time(), path)
+        ))
+
+    def forget(self, path):
+        """文件已被删除或移走，从清单中移除"""
+        self._transaction(lambda cursor: cursor.execute("DELETE FROM artifacts WHERE path = ?", (path,)))
+
+    def lease(self, job_id, paths=()):
+        """保护任务登记的文件和任务使用的文件（如输入文件），直到租约过期或释放"""
+        expires = time.time() + self.lease_time
+
+        def renew(cursor):
+            cursor.executemany(
+                "INSERT OR REPLACE INTO leases (job_id, path, expires) VALUES (?, ?, ?)",
+                [(job_id, '', expires)] + [(job_id, path, expires) for path in paths if path]
+            )
+
+        self._transaction(renew)
+
+    def release(self, job_id):
+        """任务结束，释放租约"""
+        self._transaction(lambda cursor: cursor.execute("DELETE FROM leases WHERE job_id = ?", (job_id,)))
+
+    def usage(self):
+        """清单中文件的总大小和数量"""
+        with self._lock:
+            size, count = self._conn.execute("SELECT COALESCE(SUM(size), 0), COUNT(*) FROM artifacts").fetchone()
+        return {'bytes': size, 'files': count, 'quota': self.quota}
+
+    def _sweep_loop(self):
+        for folder, kind, pattern in self.adopt_folders:
+            try:
+                self.adopt(folder, kind, pattern)
+            except Exception as e:
+                log_event('storage_adopt_error', f"登记已有文件时出错: {str(e)}", logging.WARNING, folder=folder)
+        while True:
+            try:
+                self.sweep()
+            except Exception as e:
+                log_event('storage_sweep_error', f"清理存储文件时出错: {str(e)}", logging.WARNING)
+            time.sleep(self.sweep_interval)
+
+    def _candidates(self, cursor, now):
+        """可以删除的文件（不受租约保护），按访问时间从早到晚排列"""
+        return cursor.execute("""
+            SELECT path, kind, size, accessed FROM artifacts
+            WHERE NOT EXISTS (
+                SELECT 1 FROM leases WHERE leases.expires > :now
+                AND (leases.path = artifacts.path OR (leases.path = '' AND leases.job_id = artifacts.job_id))
+            )
+            ORDER BY accessed
+        """, {'now': now})
+
+    def sweep(self):
+        """续约本进程的任务，然后删除过期的文件，并按最近最少使用的顺序清理到配额以内；返回删除的文件数"""
+        if self._active_jobs is not None:
+            for job_id, paths in self._active_jobs():
+                self.lease(job_id, paths)
+        now = time.time()
+
+        def select(cursor):
+            cursor.execute("DELETE FROM leases WHERE expires <= ?", (now,))
+            total = cursor.execute("SELECT COALESCE(SUM(size), 0) FROM artifacts").fetchone()[0]
+            victims = []
+            for path, kind, size, accessed in self._candidates(cursor, now).fetchall():
+                if accessed < now - self.ttl:
+                    reason = 'expired'
+                elif total > self.quota:
+                    reason = 'quota'
+                else:
+                    break
+                victims.append((path, kind, size, reason))
+                total -= size
+            cursor.executemany("DELETE FROM artifacts WHERE path = ?", [(path,) for path, *_ in victims])
+            return victims
+
+        victims = self._transaction(select)
+        freed = 0
+        for path, kind, size, reason in victims:
+            for suffix in ('',) + SIDE_FILES:
+                target = path + suffix
+                try:
+                    if os.path.isdir(target):
+                        shutil.rmtree(target, ignore_errors=True)
+                    elif os.path.exists(target):
+                        os.remove(target)
+                except OSError as e:
+                    log_event('storage_remove_error', f"删除文件失败: {str(e)}", logging.WARNING, path=target)
+            freed += size
+            if self._on_evict is not None:
+                self._on_evict(kind, size, reason)
+        if victims:
+            log_event(
+                'storage_swept', f"清理了 {len(victims)} 个存储文件，释放 {freed} 字节",
+                files=len(victims), bytes=freed,
+                expired=sum(1 for victim in victims if victim[3] == 'expired'),
+                quota=sum(1 for victim in victims if victim[3] == 'quota')
+            )
+        return len(victims)
+
+    def adopt(self, folder, kind, pattern=None):
+        """把目录中尚未登记的文件加入清单（访问时间取修改时间），用于接管启用清单之前留下的文件
+
+        只在后台调用一次，不在请求中扫描目录。pattern 为文件名需要匹配的正则表达式。
+        """
+        if not os.path.isdir(folder):
+            return 0
+        rows = []
+        for name in os.listdir(folder):
+            path = os.path.join(folder, name)
+            if name.startswith('.') or name.endswith(SIDE_FILES) or not os.path.isfile(path):
+                continue
+            if pattern is not None and not pattern.match(name):
+                continue
+            match = JOB_FILE_PATTERN.match(name)
+            mtime = os.path.getmtime(path)
+            rows.append((path, kind, _file_size(path), mtime, mtime, match.group(1) if match else None))
+        self._transaction(lambda cursor: cursor.executemany(
+            "INSERT OR IGNORE INTO artifacts (path, kind, size, created, accessed, job_id) VALUES (?, ?, ?, ?, ?, ?)",
+            rows
+        ))
+        return len(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,218 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+# 任务状态
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETE = 'complete'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+FINISHED_STATES = {COMPLETE, FAILED, CANCELLED}
+
+# 每个任务在内存中保留的最近进度事件数，更早的事件丢弃，重新连接时从条目接口重新读取
+DEFAULT_EVENT_TAIL = int(os.environ.get('JOB_EVENT_TAIL', 32))
+
+
+class QueueFullError(Exception):
+    """任务队列已满"""
+
+
+class Job:
+    """后台翻译任务
+
+    进度事件按产生顺序编号，events 中只保留最近 event_tail 个（结束事件总是最后一个，不会被丢弃），
+    内存占用不随任务时长增长。客户端可以随时（重新）连接并从保留的事件中继续读取。
+    """
+
+    def __init__(self, owner, params, event_tail=DEFAULT_EVENT_TAIL):
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.params = params
+        self.status = QUEUED
+        self.events = deque(maxlen=max(1, event_tail))
+        self.event_count = 0  # 产生过的事件总数，即下一个事件的序号
+        self.result = None  # 任务完成后的输出文件信息
+        self.trace = None  # 开启性能跟踪时为任务的 Tracer
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._cond = threading.Condition()
+        self._cancel_event = threading.Event()
+
+    @property
+    def cancelled(self):
+        """是否已请求取消"""
+        return self._cancel_event.is_set()
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATES
+
+    def emit(self, event):
+        """追加一条进度事件并唤醒等待中的客户端"""
+        with self._cond:
+            self.events.append(event)
+            self.event_count += 1
+            self._cond.notify_all()
+
+    def finish(self, status):
+        """标记任务结束（只有第一次调用生效）"""
+        with self._cond:
+            if self.finished:
+                return
+            self.status = status
+            self.finished_at = time.time()
+            self._cond.notify_all()
+
+    def cancel(self):
+        """请求取消任务，正在运行的任务会在当前批次结束后停止"""
+        self._cancel_event.set()
+        with self._cond:
+            self._cond.notify_all()
+
+    def wait_events(self, position, timeout=None):
+        """等待序号不小于 position 的新事件，返回 (第一个事件的序号, 新事件列表, 任务是否已结束)
+
+        序号早于保留范围的事件已被丢弃，此时第一个事件的序号大于 position。
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self.event_count > position or self.finished, timeout)
+            first = self.event_count - len(self.events)
+            start = max(position, first)
+            return start, list(self.events)[start - first:], self.finished
+
+    def to_dict(self):
+        """任务的状态摘要"""
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'filename': self.params.get('filename'),
+            'events': self.event_count,
+            'result': self.result,
+            'traced': self.trace is not None,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class JobManager:
+    """后台任务调度器
+
+    使用固定数量的工作线程执行任务；每个用户有独立的等待队列，
+    工作线程按用户轮询取任务，避免单个用户提交大量任务时阻塞其他用户。
+    """
+
+    def __init__(self, runner, workers=2, max_queued=100, retention=3600, event_tail=DEFAULT_EVENT_TAIL):
+        self._runner = runner
+        self._event_tail = event_tail
+        self._workers = workers
+        self._max_queued = max_queued
+        self._retention = retention  # 已结束任务的保留时间（秒）
+        self._jobs = {}
+        self._queues = OrderedDict()  # owner -> deque[Job]
+        self._queued = 0
+        self._cond = threading.Condition()
+        self._threads = []
+
+    def submit(self, owner, params):
+        """提交任务，返回 Job"""
+        job = Job(owner, params, self._event_tail)
+        with self._cond:
+            self._purge_finished()
+            if self._queued >= self._max_queued:
+                raise QueueFullError("任务队列已满，请稍后再试")
+            self._jobs[job.id] = job
+            self._queues.setdefault(owner, deque()).append(job)
+            self._queued += 1
+            # 工作线程在首次提交时启动，避免在 gunicorn fork 之前创建线程
+            self._ensure_workers()
+            self._cond.notify()
+        return job
+
+    def add_completed(self, owner, params, result, event):
+        """登记一个无需执行的已完成任务（例如直接复用已有的翻译结果）"""
+        job = Job(owner, params, self._event_tail)
+        job.result = result
+        job.started_at = job.created_at
+        job.emit(event)
+        job.finish(COMPLETE)
+        with self._cond:
+            self._purge_finished()
+            self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id):
+        """按ID查找任务"""
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """取消任务；排队中的任务直接结束，运行中的任务在当前批次后停止"""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job.cancel()
+        with self._cond:
+            queue = self._queues.get(job.owner)
+            if queue and job in queue:
+                queue.remove(job)
+                self._queued -= 1
+                if not queue:
+                    del self._queues[job.owner]
+                job.emit({'status': CANCELLED})
+                job.finish(CANCELLED)
+        return job
+
+    def active_jobs(self):
+        """排队中和运行中的任务"""
+        with self._cond:
+            return [job for job in self._jobs.values() if not job.finished]
+
+    def _ensure_workers(self):
+        self._threads = [thread for thread in self._threads if thread.is_alive()]
+        while len(self._threads) < self._workers:
+            thread = threading.Thread(target=self._work, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _next_job(self):
+        """按用户轮询取出下一个任务（调用方需持有锁）"""
+        owner, queue = next(iter(self._queues.items()))
+        job = queue.popleft()
+        self._queued -= 1
+        del self._queues[owner]
+        if queue:
+            # 该用户还有任务，排到队尾
+            self._queues[owner] = queue
+        return job
+
+    def _purge_finished(self):
+        """清理超过保留时间的已结束任务（调用方需持有锁）"""
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished and now - job.finished_at > self._retention
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _work(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queued > 0)
+                job = self._next_job()
+                job.status = RUNNING
+                job.started_at = time.time()
+
+            try:
+                self._runner(job)
+            except Exception as e:
+                job.emit({'error': f"翻译过程中发生错误: {str(e)}"})
+                job.finish(FAILED)
+            else:
+                job.finish(CANCELLED if job.cancelled else COMPLETE)
@@ -0,0 +1,293 @@
+import bisect
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from structured_log import log_event
+
+# 各进程的指标汇总到本地SQLite中，/metrics 返回所有进程（gunicorn worker）之和
+DEFAULT_PATH = os.environ.get(
+    'METRICS_PATH',
+    os.path.join(os.path.expanduser('~'), '.mopo-translator', 'metrics.sqlite3')
+)
+DEFAULT_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 5))
+# 延迟直方图的默认分桶上限（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# 已退出进程的计数并入此进程名下，仪表值直接丢弃
+RETIRED_PROCESS = ''
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(int(value)) if float(value).is_integer() else repr(value)
+
+
+class _Metric:
+    """一个指标族（同名、不同标签的一组时间序列）"""
+
+    kind = None
+
+    def __init__(self, registry, name, help_text, labels):
+        self._registry = registry
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+
+    def _label_pairs(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(f"指标 {self.name} 的标签应为 {self.labels}，实际为 {tuple(labels)}")
+        return tuple((name, labels[name]) for name in self.labels)
+
+
+class Counter(_Metric):
+    """只增不减的计数"""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        self._registry._add(self.name, _format_labels(self._label_pairs(labels)), amount)
+
+
+class Gauge(_Metric):
+    """可增可减的当前值（如运行中的任务数），只汇总仍在运行的进程"""
+
+    kind = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        self._registry._add(self.name, _format_labels(self._label_pairs(labels)), amount, gauge=True)
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """按分桶统计的观测值分布（如耗时），同时记录总和与次数"""
+
+    kind = 'histogram'
+
+    def __init__(self, registry, name, help_text, labels, buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, help_text, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        label_text = _format_labels(self._label_pairs(labels))
+        # 分桶保存累计计数，值落入的桶及其后所有的桶都加一
+        first = bisect.bisect_left(self.buckets, value)
+        updates = [(f"{self.name}_bucket", label_text, i, 1) for i in range(first, len(self.buckets))]
+        updates.append((f"{self.name}_sum", label_text, -1, value))
+        updates.append((f"{self.name}_count", label_text, -1, 1))
+        self._registry._add_many(updates)
+
+    @contextmanager
+    def time(self, **labels):
+        """记录 with 块的执行耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+
+class MetricsRegistry:
+    """进程内的指标，定期写入跨进程共享的SQLite并在导出时汇总
+
+    记录指标只修改内存中的值；后台线程每隔 flush_interval 秒把变化的值
+    （每个进程的累计值）写入SQLite，导出时按时间序列求和。
+    超过 stale_after 秒没有写入的进程视为已退出：其计数并入公共记录，仪表值丢弃。
+    """
+
+    def __init__(self, path=DEFAULT_PATH, flush_interval=DEFAULT_FLUSH_INTERVAL, stale_after=None):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.flush_interval = flush_interval
+        self.stale_after = stale_after if stale_after is not None else max(60.0, flush_interval * 6)
+        self._metrics = {}
+        self._conn = None
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        """初始化进程内的状态（fork 出的子进程从零开始计数）"""
+        self._process = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._values = {}
+        self._gauges = set()
+        self._dirty = set()
+        self._flusher = None
+        # 子进程不能继续使用父进程的连接
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS samples (
+                    process TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    labels TEXT NOT NULL,
+                    bucket INTEGER NOT NULL,
+                    value REAL NOT NULL,
+                    gauge INTEGER NOT NULL,
+                    PRIMARY KEY (process, name, labels, bucket)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS processes (
+                    process TEXT PRIMARY KEY,
+                    updated REAL NOT NULL
+                )
+            """)
+            self._conn = conn
+        return self._conn
+
+    def _register(self, metric):
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self._register(Counter(self, name, help_text, labels))
+
+    def gauge(self, name, help_text, labels=()):
+        return self._register(Gauge(self, name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(self, name, help_text, labels, buckets))
+
+    def _add(self, name, labels, amount, gauge=False):
+        self._add_many([(name, labels, -1, amount)], gauge)
+
+    def _add_many(self, updates, gauge=False):
+        """累加 [(名称, 标签, 分桶序号, 增量)]，分桶序号只用于直方图的分桶，其余为 -1"""
+        with self._lock:
+            for name, labels, bucket, amount in updates:
+                key = (name, labels, bucket)
+                self._values[key] = self._values.get(key, 0) + amount
+                self._dirty.add(key)
+                if gauge:
+                    self._gauges.add(key)
+            # 后台写入线程在首次记录时启动，避免在 gunicorn fork 之前创建线程
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+                self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                log_event('metrics_flush_error', f"写入指标时出错: {str(e)}", logging.WARNING)
+
+    def flush(self):
+        """把本进程变化的指标值写入SQLite，并更新本进程的心跳时间"""
+        # 写入期间只持有数据库锁，不阻塞指标记录；快照在数据库锁内取得，保证按顺序写入
+        with self._db_lock:
+            with self._lock:
+                dirty = self._dirty
+                self._dirty = set()
+                rows = [(self._process, *key, self._values[key], int(key in self._gauges)) for key in dirty]
+            try:
+                conn = self._connection()
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO samples (process, name, labels, bucket, value, gauge) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        rows
+                    )
+                    conn.execute(
+                        "INSERT OR REPLACE INTO processes (process, updated) VALUES (?, ?)",
+                        (self._process, time.time())
+                    )
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+                conn.execute("COMMIT")
+            except BaseException:
+                # 写入失败时下次重新写入
+                with self._lock:
+                    self._dirty |= dirty
+                raise
+
+    def _collect(self):
+        """汇总所有进程的指标，返回 [(名称, 标签, 分桶序号, 值)]"""
+        self.flush()
+        with self._db_lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                stale = [
+                    row[0] for row in conn.execute(
+                        "SELECT process FROM processes WHERE updated < ?", (time.time() - self.stale_after,)
+                    )
+                ]
+                for process in stale:
+                    # 已退出进程的计数并入公共记录，保证汇总值单调递增
+                    conn.execute("""
+                        INSERT INTO samples (process, name, labels, bucket, value, gauge)
+                        SELECT ?, name, labels, bucket, value, 0 FROM samples WHERE process = ? AND gauge = 0
+                        ON CONFLICT (process, name, labels, bucket) DO UPDATE SET value = value + excluded.value
+                    """, (RETIRED_PROCESS, process))
+                    conn.execute("DELETE FROM samples WHERE process = ?", (process,))
+                    conn.execute("DELETE FROM processes WHERE process = ?", (process,))
+                rows = conn.execute(
+                    "SELECT name, labels, bucket, SUM(value) FROM samples GROUP BY name, labels, bucket"
+                ).fetchall()
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        return rows
+
+    def render(self):
+        """以 Prometheus 文本格式导出所有进程汇总后的指标"""
+        families = {}
+        for name, labels, bucket, value in self._collect():
+            family = name
+            if name not in self._metrics:
+                family = name.rsplit('_', 1)[0]
+            families.setdefault(family, []).append((name, labels, bucket, value))
+
+        lines = []
+        for name, metric in self._metrics.items():
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            if metric.kind != 'histogram':
+                for _, labels, _, value in sorted(families.get(name, [])):
+                    lines.append(f"{name}{labels} {_format_value(value)}")
+                continue
+
+            # 同一组标签的分桶按上限排列，随后是总和与次数
+            order = {f"{name}_bucket": 0, f"{name}_sum": 1, f"{name}_count": 2}
+            samples = sorted(families.get(name, []), key=lambda sample: (sample[1], order[sample[0]], sample[2]))
+            for sample_name, labels, bucket, value in samples:
+                if bucket >= 0:
+                    le = f'le="{_format_value(metric.buckets[bucket])}"'
+                    labels = f"{labels[:-1]},{le}}}" if labels else f"{{{le}}}"
+                lines.append(f"{sample_name}{labels} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,332 @@
+import mmap
+import os
+import re
+import struct
+import uuid
+from array import array
+
+import polib
+
+# MO文件的魔数（按小端序读取时），按大端序写出的文件读取结果为 MAGIC_SWAPPED
+MAGIC = 0x950412de
+MAGIC_SWAPPED = 0xde120495
+HEADER_SIZE = 28
+# msgctxt 与 msgid 之间、msgid 与复数形式之间的分隔符
+CONTEXT_SEPARATOR = b'\x04'
+PLURAL_SEPARATOR = b'\x00'
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+CHARSET_PATTERN = re.compile(r'charset=\s*([\w.:-]+)', re.IGNORECASE)
+
+
+class MOError(Exception):
+    """MO文件格式错误"""
+
+
+def hash_string(data):
+    """GNU gettext 的字符串哈希函数（hashpjw，32位）"""
+    hval = 0
+    for byte in data:
+        hval = ((hval << 4) + byte) & 0xffffffff
+        g = hval & 0xf0000000
+        if g:
+            hval ^= g >> 24
+            hval ^= g
+    return hval
+
+
+def _is_prime(n):
+    if n < 4:
+        return n > 1
+    if n % 2 == 0:
+        return False
+    divisor = 3
+    while divisor * divisor <= n:
+        if n % divisor == 0:
+            return False
+        divisor += 2
+    return True
+
+
+def hash_table_size(count):
+    """哈希表大小：不小于条目数的 4/3 的最小质数（与 msgfmt 相同），至少为 3"""
+    size = max(3, count * 4 // 3)
+    while not _is_prime(size):
+        size += 1
+    return size
+
+
+def _probe(hval, size):
+    """依次产出哈希值 hval 在表中的探测位置（双重哈希，与 gettext 的查找顺序相同）"""
+    index = hval % size
+    increment = 1 + hval % (size - 2)
+    while True:
+        yield index
+        index = index - (size - increment) if index >= size - increment else index + increment
+
+
+def catalog_charset(catalog):
+    """目录的字符集：优先取文件头 Content-Type 中的 charset，否则为目录的编码（默认 utf-8）"""
+    match = CHARSET_PATTERN.search(catalog.metadata.get('Content-Type', ''))
+    charset = match.group(1) if match else getattr(catalog, 'encoding', None) or 'utf-8'
+    return 'utf-8' if charset.upper() == 'CHARSET' else charset
+
+
+def compiled(entry):
+    """条目是否写入MO文件：与 msgfmt 相同，跳过文件头、废弃、模糊和未翻译的条目"""
+    if not entry.msgid or getattr(entry, 'obsolete', False) or 'fuzzy' in getattr(entry, 'flags', ()):
+        return False
+    if entry.msgid_plural:
+        return bool(entry.msgstr_plural) and all(entry.msgstr_plural.values())
+    return bool(entry.msgstr)
+
+
+def _format_metadata(metadata):
+    return ''.join(f"{key}: {value}\n" for key, value in metadata.items())
+
+
+def _parse_metadata(text):
+    metadata = {}
+    for line in text.split('\n'):
+        key, sep, value = line.partition(':')
+        if sep and key.strip():
+            metadata[key.strip()] = value.strip()
+    return metadata
+
+
+def write_mofile(catalog, path):
+    """把目录写出为带 GNU 哈希表的MO文件
+
+    只写出已翻译、非模糊、非废弃的条目（与 msgfmt 相同），msgctxt 和复数形式按
+    gettext 的格式编码。先写入临时文件，完成后替换为目标文件。
+    """
+    charset = catalog_charset(catalog)
+    messages = {}
+    if catalog.metadata:
+        messages[b''] = (b'', _format_metadata(catalog.metadata).encode(charset))
+    for entry in catalog:
+        if not compiled(entry):
+            continue
+        key = entry.msgid.encode(charset)
+        if entry.msgctxt is not None:
+            key = entry.msgctxt.encode(charset) + CONTEXT_SEPARATOR + key
+        if entry.msgid_plural:
+            original = key + PLURAL_SEPARATOR + entry.msgid_plural.encode(charset)
+            forms = [entry.msgstr_plural[n] for n in sorted(entry.msgstr_plural)]
+            translation = PLURAL_SEPARATOR.join(form.encode(charset) for form in forms)
+        else:
+            original = key
+            translation = entry.msgstr.encode(charset)
+        # 同一键重复出现时以最后一个为准
+        messages[key] = (original, translation)
+
+    # 原文按字节序排列，运行时没有哈希表也可以二分查找
+    keys = sorted(messages)
+    count = len(keys)
+    size = hash_table_size(count)
+    orig_offset = HEADER_SIZE
+    trans_offset = orig_offset + count * 8
+    hash_offset = trans_offset + count * 8
+    offset = hash_offset + size * 4
+
+    orig_table = array('I')
+    trans_table = array('I')
+    hash_table = array('I', bytes(size * 4))
+    for i, key in enumerate(keys):
+        original = messages[key][0]
+        orig_table.extend((len(original), offset))
+        offset += len(original) + 1
+        for index in _probe(hash_string(key), size):
+            if not hash_table[index]:
+                hash_table[index] = i + 1
+                break
+    for key in keys:
+        translation = messages[key][1]
+        trans_table.extend((len(translation), offset))
+        offset += len(translation) + 1
+
+    # 以小端序写出，一次顺序写完整个文件
+    if struct.pack('=I', 1) != struct.pack('<I', 1):
+        for table in (orig_table, trans_table, hash_table):
+            table.byteswap()
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(temp_path, 'wb', buffering=WRITE_BUFFER_SIZE) as f:
+            f.write(struct.pack('<7I', MAGIC, 0, count, orig_offset, trans_offset, size, hash_offset))
+            f.write(orig_table.tobytes())
+            f.write(trans_table.tobytes())
+            f.write(hash_table.tobytes())
+            for key in keys:
+                f.write(messages[key][0] + b'\x00')
+            for key in keys:
+                f.write(messages[key][1] + b'\x00')
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class MOMessage:
+    """MO文件中的一个条目，属性与 polib 的条目相同"""
+
+    __slots__ = ('msgid', 'msgstr', 'msgctxt', 'msgid_plural', 'msgstr_plural', 'flags')
+    obsolete = False
+
+    def __init__(self, msgid, msgstr='', msgctxt=None, msgid_plural='', msgstr_plural=None):
+        self.msgid = msgid
+        self.msgstr = msgstr
+        self.msgctxt = msgctxt
+        self.msgid_plural = msgid_plural
+        self.msgstr_plural = msgstr_plural if msgstr_plural is not None else {}
+        # MO文件中没有标记，共用一个空元组
+        self.flags = ()
+
+    def __repr__(self):
+        return f"<MOMessage {self.msgid!r}>"
+
+
+class MOCatalog(list):
+    """从MO文件读取的条目列表（不含文件头），接口与 polib.MOFile 的常用部分相同"""
+
+    def __init__(self, entries=(), metadata=None, encoding='utf-8'):
+        super().__init__(entries)
+        self.metadata = metadata if metadata is not None else {}
+        self.encoding = encoding
+
+    def save(self, fpath):
+        """写出为MO文件"""
+        write_mofile(self, fpath)
+
+    def save_as_pofile(self, fpath):
+        """写出为PO文件"""
+        catalog = polib.POFile(encoding=self.encoding)
+        catalog.metadata = dict(self.metadata)
+        for entry in self:
+            catalog.append(polib.POEntry(
+                msgid=entry.msgid, msgstr=entry.msgstr, msgctxt=entry.msgctxt,
+                msgid_plural=entry.msgid_plural, msgstr_plural=dict(entry.msgstr_plural)
+            ))
+        catalog.save(fpath)
+
+
+class MOReader:
+    """直接在内存映射的MO文件上读取和查找条目
+
+    查找时使用文件中的 GNU 哈希表，没有哈希表的文件退回对有序原文的二分查找。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < HEADER_SIZE:
+                raise MOError(f"不是有效的MO文件: {path}")
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            magic, = struct.unpack_from('<I', self._data)
+            if magic == MAGIC:
+                self._order = '<'
+            elif magic == MAGIC_SWAPPED:
+                self._order = '>'
+            else:
+                self.close()
+                raise MOError(f"不是有效的MO文件: {path}")
+            (_, self.count, orig_offset, trans_offset, self._hash_size,
+             hash_offset) = struct.unpack_from(f'{self._order}6I', self._data, 4)
+            self._orig = struct.unpack_from(f'{self._order}{self.count * 2}I', self._data, orig_offset)
+            self._trans = struct.unpack_from(f'{self._order}{self.count * 2}I', self._data, trans_offset)
+            self._hash = (
+                struct.unpack_from(f'{self._order}{self._hash_size}I', self._data, hash_offset)
+                if self._hash_size > 2 else ()
+            )
+        except struct.error:
+            self.close()
+            raise MOError(f"MO文件已损坏: {path}")
+
+        self.metadata = {}
+        self.encoding = 'utf-8'
+        if self.count and self._original(0) == b'':
+            self.metadata = _parse_metadata(self._translation(0).decode('utf-8', 'replace'))
+            match = CHARSET_PATTERN.search(self.metadata.get('Content-Type', ''))
+            if match and match.group(1).upper() != 'CHARSET':
+                self.encoding = match.group(1)
+
+    def _original(self, i):
+        length, offset = self._orig[i * 2], self._orig[i * 2 + 1]
+        return self._data[offset:offset + length]
+
+    def _translation(self, i):
+        length, offset = self._trans[i * 2], self._trans[i * 2 + 1]
+        return self._data[offset:offset + length]
+
+    def _message(self, i):
+        encoding = self.encoding
+        original = self._original(i)
+        translation = self._translation(i)
+        msgctxt = None
+        if CONTEXT_SEPARATOR in original:
+            context, original = original.split(CONTEXT_SEPARATOR, 1)
+            msgctxt = context.decode(encoding)
+        if PLURAL_SEPARATOR in original:
+            msgid, msgid_plural = original.split(PLURAL_SEPARATOR, 1)
+            forms = translation.split(PLURAL_SEPARATOR)
+            return MOMessage(
+                msgid.decode(encoding), msgctxt=msgctxt, msgid_plural=msgid_plural.decode(encoding),
+                msgstr_plural={n: form.decode(encoding) for n, form in enumerate(forms)}
+            )
+        return MOMessage(original.decode(encoding), translation.decode(encoding), msgctxt)
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        """按文件中的顺序产出条目（跳过文件头）"""
+        for i in range(self.count):
+            if self._orig[i * 2] == 0:
+                continue
+            yield self._message(i)
+
+    def _index_of(self, key):
+        if self._hash:
+            for index in _probe(hash_string(key), self._hash_size):
+                n = self._hash[index]
+                if not n:
+                    return None
+                # 原文中复数形式在 NUL 之后，只比较 NUL 之前的部分
+                if self._original(n - 1).split(PLURAL_SEPARATOR, 1)[0] == key:
+                    return n - 1
+        low, high = 0, self.count
+        while low < high:
+            mid = (low + high) // 2
+            original = self._original(mid).split(PLURAL_SEPARATOR, 1)[0]
+            if original == key:
+                return mid
+            if original < key:
+                low = mid + 1
+            else:
+                high = mid
+        return None
+
+    def find(self, msgid, msgctxt=None):
+        """查找原文为 msgid（上下文为 msgctxt）的条目，找不到时返回 None"""
+        key = msgid.encode(self.encoding)
+        if msgctxt is not None:
+            key = msgctxt.encode(self.encoding) + CONTEXT_SEPARATOR + key
+        i = self._index_of(key)
+        return self._message(i) if i is not None else None
+
+    def close(self):
+        self._data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_mofile(path):
+    """读取MO文件，返回 MOCatalog（比 polib.mofile 快得多，不建立完整的 polib 对象）"""
+    with MOReader(path) as reader:
+        return MOCatalog(reader, reader.metadata, reader.encoding)
@@ -0,0 +1,249 @@
+import asyncio
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from structured_log import log_event
+
+# 限流状态保存在本地SQLite中，同一台机器上的所有进程（gunicorn worker、GUI）共享
+DEFAULT_PATH = os.environ.get(
+    'RATE_LIMIT_PATH',
+    os.path.join(os.path.expanduser('~'), '.mopo-translator', 'rate_limit.sqlite3')
+)
+DEFAULT_RATE = float(os.environ.get('RATE_LIMIT_PER_SECOND', 5))
+DEFAULT_BURST = float(os.environ.get('RATE_LIMIT_BURST', 10))
+DEFAULT_FAILURE_THRESHOLD = int(os.environ.get('CIRCUIT_FAILURE_THRESHOLD', 5))
+DEFAULT_RESET_TIMEOUT = float(os.environ.get('CIRCUIT_RESET_TIMEOUT', 30))
+
+# 熔断器状态
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+def backoff_delay(attempt, base=1.0, cap=30.0):
+    """第 attempt 次重试前的等待时间（指数退避 + 完全随机抖动）"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class _SharedState:
+    """跨进程共享的SQLite状态存储"""
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self._lock = threading.Lock()
+        # 手动管理事务，用 BEGIN IMMEDIATE 保证读-改-写在进程间互斥
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS buckets (
+                name TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS circuits (
+                name TEXT PRIMARY KEY,
+                failures INTEGER NOT NULL,
+                opened_until REAL NOT NULL
+            )
+        """)
+
+    def transaction(self, func):
+        """在写事务中执行 func(cursor)，返回其结果"""
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                result = func(cursor)
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+            cursor.execute("COMMIT")
+            return result
+
+    def query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class RateLimiter:
+    """令牌桶限流器
+
+    令牌以 rate 个/秒的速度补充，最多积累 burst 个。
+    acquire 会预先扣除令牌（允许为负），然后等待到令牌补足为止，
+    因此并发的请求按到达顺序排队，不需要反复轮询。rate <= 0 时不限流。
+    """
+
+    def __init__(self, path=DEFAULT_PATH, rate=DEFAULT_RATE, burst=DEFAULT_BURST, name='translate'):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.name = name
+        self._store = _SharedState(path) if rate > 0 else None
+
+    def _refill(self, row, now):
+        if row is None:
+            return self.burst
+        tokens, updated = row
+        return min(self.burst, tokens + max(0.0, now - updated) * self.rate)
+
+    def acquire(self, tokens=1):
+        """取得令牌，必要时阻塞等待，返回等待的秒数"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, tokens=1):
+        """acquire() 的异步版本，等待期间不占用线程"""
+        # 扣除令牌需要SQLite写锁（可能等待其他进程），在线程中执行，不阻塞事件循环
+        wait = await asyncio.to_thread(self.reserve, tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def reserve(self, tokens=1):
+        """预先扣除令牌，返回需要等待多少秒后才能发送请求（不等待）"""
+        if self._store is None:
+            return 0.0
+
+        def reserve(cursor):
+            now = time.time()
+            row = cursor.execute(
+                "SELECT tokens, updated FROM buckets WHERE name = ?", (self.name,)
+            ).fetchone()
+            available = self._refill(row, now) - tokens
+            cursor.execute(
+                "INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                (self.name, available, now)
+            )
+            return max(0.0, -available / self.rate)
+
+        return self._store.transaction(reserve)
+
+    def state(self):
+        """当前限流状态"""
+        if self._store is None:
+            return {'rate': 0, 'burst': self.burst, 'tokens': None}
+        row = self._store.query("SELECT tokens, updated FROM buckets WHERE name = ?", (self.name,))
+        return {
+            'rate': self.rate,
+            'burst': self.burst,
+            'tokens': round(self._refill(row, time.time()), 2),
+        }
+
+
+class CircuitBreaker:
+    """熔断器
+
+    连续失败达到 failure_threshold 次后熔断，所有进程的请求暂停 reset_timeout 秒；
+    超时后只放行一个试探请求，成功则恢复，失败则再次熔断。
+    """
+
+    def __init__(self, path=DEFAULT_PATH, failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+                 reset_timeout=DEFAULT_RESET_TIMEOUT, name='translate'):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.name = name
+        self._store = _SharedState(path)
+
+    def _read(self, cursor):
+        row = cursor.execute(
+            "SELECT failures, opened_until FROM circuits WHERE name = ?", (self.name,)
+        ).fetchone()
+        return row or (0, 0.0)
+
+    def _write(self, cursor, failures, opened_until):
+        cursor.execute(
+            "INSERT OR REPLACE INTO circuits (name, failures, opened_until) VALUES (?, ?, ?)",
+            (self.name, failures, opened_until)
+        )
+
+    def wait(self):
+        """熔断期间阻塞，直到允许发送请求，返回等待的秒数"""
+        waited = 0.0
+        while True:
+            remaining = self.check()
+            if remaining <= 0:
+                return waited
+            time.sleep(remaining)
+            waited += remaining
+
+    async def wait_async(self):
+        """wait() 的异步版本，等待期间不占用线程"""
+        waited = 0.0
+        while True:
+            remaining = await asyncio.to_thread(self.check)
+            if remaining <= 0:
+                return waited
+            await asyncio.sleep(remaining)
+            waited += remaining
+
+    def check(self):
+        """是否允许发送请求：允许时返回 0，熔断期间返回还需等待的秒数（不等待）"""
+        def check(cursor):
+            failures, opened_until = self._read(cursor)
+            if failures < self.failure_threshold:
+                return 0.0
+            now = time.time()
+            if opened_until > now:
+                return opened_until - now
+            # 半开状态：当前请求作为试探，其他请求继续等待
+            self._write(cursor, failures, now + self.reset_timeout)
+            return 0.0
+
+        return self._store.transaction(check)
+
+    def record_success(self):
+        """请求成功，恢复正常"""
+        def reset(cursor):
+            failures, _ = self._read(cursor)
+            if failures:
+                if failures >= self.failure_threshold:
+                    log_event('circuit_closed', "翻译服务已恢复，熔断结束")
+                self._write(cursor, 0, 0.0)
+
+        self._store.transaction(reset)
+
+    def record_failure(self):
+        """请求失败，连续失败次数达到阈值时熔断"""
+        def increment(cursor):
+            failures, opened_until = self._read(cursor)
+            failures += 1
+            if failures >= self.failure_threshold:
+                opened_until = time.time() + self.reset_timeout
+                log_event(
+                    'circuit_opened', f"翻译服务连续失败 {failures} 次，暂停所有请求 {self.reset_timeout:.0f} 秒",
+                    logging.WARNING, failures=failures
+                )
+            self._write(cursor, failures, opened_until)
+
+        self._store.transaction(increment)
+
+    def state(self):
+        """当前熔断状态"""
+        row = self._store.query(
+            "SELECT failures, opened_until FROM circuits WHERE name = ?", (self.name,)
+        )
+        failures, opened_until = row or (0, 0.0)
+        remaining = max(0.0, opened_until - time.time())
+        if failures < self.failure_threshold:
+            status = CLOSED
+        elif remaining > 0:
+            status = OPEN
+        else:
+            status = HALF_OPEN
+        return {'circuit': status, 'failures': failures, 'retry_in': round(remaining, 1)}
@@ -0,0 +1,135 @@
+import copy
+import os
+import struct
+import uuid
+
+import polib
+
+# 每次解析的条目数，决定流式处理时驻留内存的条目规模
+DEFAULT_CHUNK_ENTRIES = int(os.environ.get('STREAM_CHUNK_ENTRIES', 2000))
+
+
+def detect_encoding(filepath):
+    """从文件头检测PO文件的编码（polib.detect_encoding 会读入整个文件）"""
+    header = []
+    with open(filepath, 'rb') as f:
+        for line in f:
+            if not line.strip():
+                if header:
+                    break
+                continue
+            header.append(line)
+    return polib.detect_encoding(b''.join(header))
+
+
+def estimate_entries(filepath):
+    """快速估算PO/MO文件中的条目数（不解析），用于显示进度
+
+    PO文件统计 msgid 行，MO文件读取文件头中的字符串数。
+    """
+    if filepath.endswith('.mo'):
+        with open(filepath, 'rb') as f:
+            header = f.read(12)
+        if len(header) < 12:
+            return 0
+        byte_order = '<' if header[:4] == b'\xde\x12\x04\x95' else '>'
+        # 第一个字符串通常是文件头（metadata）
+        return max(0, struct.unpack(f'{byte_order}I', header[8:12])[0] - 1)
+
+    count = 0
+    header = False
+    with open(filepath, 'rb') as f:
+        for line in f:
+            if line.startswith(b'msgid '):
+                if count == 0 and line.strip() == b'msgid ""':
+                    header = True
+                count += 1
+    # 第一个 msgid "" 多半是文件头
+    return max(0, count - 1) if header else count
+
+
+def read_po_chunks(filepath, chunk_entries=DEFAULT_CHUNK_ENTRIES):
+    """按块读取PO文件，每次产出一个包含至多 chunk_entries 个条目的 POFile
+
+    条目之间以空行分隔，只需按空行切分原文再交给 polib 解析，
+    因此无论文件多大，内存中只保留一个块。第一个块包含文件头（metadata）。
+    """
+    encoding = detect_encoding(filepath)
+    lines = []
+    blocks = 0
+    in_block = False
+    with open(filepath, 'r', encoding=encoding) as f:
+        for line in f:
+            if line.strip():
+                in_block = True
+                lines.append(line)
+                continue
+
+            if in_block:
+                in_block = False
+                blocks += 1
+                lines.append('\n')
+                if blocks >= chunk_entries:
+                    yield polib.pofile(''.join(lines), encoding=encoding)
+                    lines = []
+                    blocks = 0
+
+    if lines:
+        yield polib.pofile(''.join(lines), encoding=encoding)
+
+
+def copy_catalog(catalog):
+    """复制目录及其条目，供多个目标语言分别写入译文
+
+    只复制翻译过程中会修改的字段（msgstr、msgstr_plural、flags），
+    其余字段与原目录共用，比 copy.deepcopy 和重新解析都快得多。
+    """
+    clone = copy.copy(catalog)
+    clone.metadata = dict(catalog.metadata)
+    del clone[:]
+    for entry in catalog:
+        entry_copy = copy.copy(entry)
+        entry_copy.msgstr_plural = dict(entry.msgstr_plural)
+        if hasattr(entry, 'flags'):
+            entry_copy.flags = list(entry.flags)
+        clone.append(entry_copy)
+    return clone
+
+
+class POStreamWriter:
+    """把翻译完成的块依次追加写入PO文件
+
+    先写入临时文件，commit() 时再替换为目标文件，避免留下不完整的结果。
+    临时文件名唯一，同时写出同一目标文件（如并发下载时合并编辑）不会互相覆盖。
+    """
+
+    def __init__(self, path, encoding='utf-8'):
+        self.path = path
+        self._temp_path = f"{path}.{uuid.uuid4().hex}.part"
+        self._file = open(self._temp_path, 'w', encoding=encoding)
+        self._started = False
+
+    def write(self, chunk):
+        """写入一个块（第一个块连同文件头一起写出）"""
+        if not self._started:
+            self._file.write(str(chunk))
+            self._started = True
+            return
+
+        entries = [entry for entry in chunk if not entry.obsolete]
+        entries.extend(entry for entry in chunk if entry.obsolete)
+        if entries:
+            self._file.write('\n')
+            self._file.write('\n'.join(entry.__unicode__(chunk.wrapwidth) for entry in entries))
+
+    def commit(self):
+        """完成写入，用结果替换目标文件"""
+        self._file.close()
+        os.replace(self._temp_path, self.path)
+
+    def discard(self):
+        """放弃写入，删除临时文件"""
+        if not self._file.closed:
+            self._file.close()
+        if os.path.exists(self._temp_path):
+            os.remove(self._temp_path)
@@ -0,0 +1,44 @@
+import contextvars
+import json
+import logging
+import sys
+import time
+
+# 当前线程正在执行的任务ID，写入该线程输出的每条日志
+current_job = contextvars.ContextVar('current_job', default=None)
+
+logger = logging.getLogger('mopo')
+
+
+class JSONFormatter(logging.Formatter):
+    """每条日志输出为一行JSON：时间、级别、事件名、任务ID、消息和附加字段"""
+
+    def format(self, record):
+        data = {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            'level': record.levelname.lower(),
+            'event': getattr(record, 'event', None),
+            'job_id': getattr(record, 'job_id', None),
+            'message': record.getMessage(),
+        }
+        data.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+if not logger.handlers:
+    _handler = logging.StreamHandler(sys.stdout)
+    _handler.setFormatter(JSONFormatter())
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def log_event(event, message, level=logging.INFO, job_id=None, exc_info=False, **fields):
+    """输出一条结构化日志，未指定 job_id 时使用当前线程所属的任务；exc_info 为真时附带当前异常"""
+    logger.log(level, message, exc_info=exc_info, extra={
+        'event': event,
+        'job_id': job_id or current_job.get(),
+        'fields': fields
+    })
@@ -0,0 +1,19 @@
+import os
+import sys
+import tempfile
+
+# 测试使用独立的临时目录和离线模拟后端，不读写用户目录下的翻译记忆库、限流状态和指标
+BASE_DIR = tempfile.mkdtemp(prefix='mopo-tests-')
+tempfile.tempdir = BASE_DIR
+os.environ.update({
+    'TRANSLATION_BACKEND': 'fake',
+    'TRANSLATION_MEMORY_PATH': os.path.join(BASE_DIR, 'translation_memory.sqlite3'),
+    'RATE_LIMIT_PATH': os.path.join(BASE_DIR, 'rate_limit.sqlite3'),
+    'RATE_LIMIT_PER_SECOND': '0',
+    'METRICS_PATH': os.path.join(BASE_DIR, 'metrics.sqlite3'),
+    'UPLOAD_STORE_FOLDER': os.path.join(BASE_DIR, 'store'),
+    'CHECKPOINT_FOLDER': os.path.join(BASE_DIR, 'checkpoints'),
+    'RETRY_BASE_DELAY': '0',
+})
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
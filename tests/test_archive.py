@@ -0,0 +1,60 @@
+import os
+import zipfile
+
+import pytest
+
+from archive import ArchiveError, archive_format, extract_catalogs, split_archive_name, write_archive
+
+
+def make_zip(path, members):
+    with zipfile.ZipFile(path, 'w') as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+
+
+def test_archive_names():
+    assert archive_format('locale.TAR.GZ') == 'gztar'
+    assert archive_format('locale.zip') == 'zip'
+    assert archive_format('messages.po') is None
+    assert split_archive_name('locale.tar.gz') == ('locale', '.tar.gz')
+
+
+def test_extract_keeps_catalogs_and_skips_unsafe_paths(tmp_path):
+    path = str(tmp_path / 'locale.zip')
+    make_zip(path, {
+        'locale/ja/LC_MESSAGES/app.po': 'ja',
+        'locale/de/LC_MESSAGES/app.mo': 'de',
+        'locale/README.md': 'readme',
+        '../evil.po': 'evil',
+        '/abs/evil.po': 'evil',
+    })
+    folder = str(tmp_path / 'out')
+    names = extract_catalogs(path, folder, 'zip')
+    assert names == ['locale/de/LC_MESSAGES/app.mo', 'locale/ja/LC_MESSAGES/app.po']
+    assert not os.path.exists(tmp_path / 'evil.po')
+
+
+def test_extract_size_limit(tmp_path):
+    path = str(tmp_path / 'locale.zip')
+    make_zip(path, {'a.po': 'x' * 100, 'b.po': 'x' * 100})
+    with pytest.raises(ArchiveError):
+        extract_catalogs(path, str(tmp_path / 'out'), 'zip', max_size=150)
+
+
+def test_corrupt_archive(tmp_path):
+    path = tmp_path / 'broken.tar.gz'
+    path.write_bytes(b'not an archive')
+    with pytest.raises(ArchiveError):
+        extract_catalogs(str(path), str(tmp_path / 'out'), 'gztar')
+
+
+@pytest.mark.parametrize('fmt', ['zip', 'tar', 'gztar'])
+def test_write_then_extract_round_trip(tmp_path, fmt):
+    source = tmp_path / 'src'
+    (source / 'ja').mkdir(parents=True)
+    (source / 'ja' / 'app.po').write_text('ja')
+    (source / 'de.po').write_text('de')
+    path = str(tmp_path / 'out.archive')
+    write_archive(str(source), ['de.po', 'ja/app.po'], path, fmt)
+    assert extract_catalogs(path, str(tmp_path / 'out'), fmt) == ['de.po', 'ja/app.po']
+    assert (tmp_path / 'out' / 'ja' / 'app.po').read_text() == 'ja'
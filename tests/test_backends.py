@@ -0,0 +1,84 @@
+import asyncio
+
+import httpcore
+import pytest
+
+import backends
+from backends import DEFAULT_SEPARATOR, BackendError, ClientPool, FakeBackend, GoogleBackend, create_backend
+
+
+def test_fake_backend_is_deterministic():
+    backend = FakeBackend()
+    assert backend.translate('[0]save' + DEFAULT_SEPARATOR + '[1]open', dest='zh-cn') == \
+        '[0]SAVE' + DEFAULT_SEPARATOR + '[1]OPEN'
+    assert backend.stats['requests'] == 1
+
+
+def test_fake_backend_rejects_oversized_requests():
+    backend = FakeBackend(max_chars=5)
+    with pytest.raises(BackendError):
+        backend.translate('too long', dest='zh-cn')
+    assert backend.stats['failures'] == 1
+
+
+def test_create_backend(monkeypatch):
+    backend = FakeBackend()
+    assert create_backend(backend) is backend
+    monkeypatch.setenv('FAKE_BACKEND_MAX_CHARS', '10')
+    assert create_backend().max_chars == 10
+    with pytest.raises(ValueError):
+        create_backend('unknown')
+
+
+def test_google_async_falls_back_on_unverified_googletrans(monkeypatch):
+    monkeypatch.setattr(backends, 'ASYNC_RPC_SUPPORTED', False)
+    backend = GoogleBackend()
+    monkeypatch.setattr(backend, 'translate', lambda text, dest, src='auto': f'{src}>{dest}:{text}')
+    # 不依赖 googletrans 内部实现，改用同步客户端
+    assert asyncio.run(backend.translate_async('save', 'zh-cn')) == 'auto>zh-cn:save'
+    assert not backend._async_clients
+
+
+class Client:
+    def __init__(self):
+        self.closed = False
+
+
+def make_pool(**kwargs):
+    closed = []
+    pool = ClientPool(Client, close=closed.append, **kwargs)
+    return pool, closed
+
+
+def test_pool_reuses_idle_clients():
+    pool, closed = make_pool(size=1)
+    with pool.client() as first:
+        with pool.client() as second:
+            assert first is not second
+    # 空闲客户端超过 size 个时关闭多余的
+    assert closed == [first]
+    with pool.client() as third:
+        assert third is second
+    assert pool.stats['created'] == 2 and pool.stats['reused'] == 1
+
+
+def test_pool_recycles_broken_and_expired_clients():
+    pool, closed = make_pool(max_failures=2, max_idle=60)
+    with pytest.raises(httpcore.NetworkError):
+        with pool.client() as broken:
+            raise httpcore.NetworkError('reset')
+    assert closed == [broken]
+
+    # 其他错误连续出现 max_failures 次后才重建
+    for _ in range(2):
+        with pytest.raises(BackendError):
+            with pool.client() as failing:
+                raise BackendError('bad reply')
+    assert closed == [broken, failing]
+
+    with pool.client() as idle:
+        pass
+    pool.max_idle = -1
+    with pool.client() as fresh:
+        assert fresh is not idle
+    assert pool.stats['recycled_idle'] == 1
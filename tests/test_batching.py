@@ -0,0 +1,74 @@
+from backends import DEFAULT_SEPARATOR, FakeBackend
+from batching import BatchPacker, build_batch_text, parse_batch_reply
+
+
+class Item:
+    def __init__(self, msgid):
+        self.msgid = msgid
+
+
+def test_packer_respects_budget_and_isolates_long_items():
+    packer = BatchPacker(budget=300, min_budget=100)
+    items = [Item('x' * 50) for _ in range(10)] + [Item('y' * 500)]
+    batches = list(packer.pack(items))
+    assert [len(batch) for batch in batches][-1] == 1
+    assert all(sum(len(item.msgid) for item in batch) <= 300 for batch in batches[:-1])
+    assert sum(len(batch) for batch in batches) == len(items)
+
+
+def test_budget_grows_additively_and_shrinks_multiplicatively():
+    packer = BatchPacker(budget=1000, min_budget=200, max_budget=1200, increase=250, target_latency=1.0)
+    # 批次未装满时不增加预算
+    packer.record_success(latency=0.1, chars=100)
+    assert packer.budget == 1000
+    packer.record_success(latency=0.1, chars=900)
+    assert packer.budget == 1200
+    packer.record_success(latency=5.0, chars=900)
+    assert packer.budget == 600
+    packer.record_failure()
+    packer.record_mismatch()
+    assert packer.budget == 200
+
+
+def test_later_batches_use_the_adjusted_budget():
+    packer = BatchPacker(budget=400, min_budget=100)
+    batches = packer.pack([Item('x' * 50) for _ in range(20)])
+    first = next(batches)
+    packer.record_failure()
+    second = next(batches)
+    assert len(second) < len(first)
+
+
+def test_intact_separators():
+    texts = ['Hello', 'Save file', 'See [3] below']
+    reply = FakeBackend().translate(build_batch_text(texts), dest='zh-cn')
+    assert parse_batch_reply(reply, len(texts)) == {0: 'HELLO', 1: 'SAVE FILE', 2: 'SEE [3] BELOW'}
+
+
+def test_lost_separator_is_a_mismatch():
+    # 模拟后端把一个分隔符合并成空格：[1] 不在段落开头，无法确定边界，前两条按不匹配处理后重新翻译
+    texts = ['one', 'two', 'three']
+    backend = FakeBackend(mangle_rate=1.0)
+    reply = backend.translate(build_batch_text(texts), dest='zh-cn')
+    assert backend.stats['mangled'] == 1
+    assert parse_batch_reply(reply, len(texts)) == {2: 'THREE'}
+
+
+def test_markers_after_newlines_and_rewritten_separators():
+    reply = "[0] a\n[1] b = + = + = + = + = [2] c"
+    assert parse_batch_reply(reply, 3) == {0: 'a', 1: 'b', 2: 'c'}
+
+
+def test_literal_marker_does_not_move_boundary():
+    # 分隔符被改写，第 1 条译文中的 "[3]" 是原文内容而不是边界
+    reply = "[0] 你好 = + = + = + = + = [1] 参见 [3] 部分 =+=+=+=+= [2] 再见 = + = + = + = + = [3] 结束"
+    assert parse_batch_reply(reply, 4) == {0: '你好', 2: '再见', 3: '结束'}
+
+
+def test_unparseable_reply_matches_nothing():
+    assert parse_batch_reply('garbled text', 3) == {}
+
+
+def test_missing_segments_are_left_out():
+    reply = DEFAULT_SEPARATOR.join(['[0]A', '[1]B'])
+    assert parse_batch_reply(reply, 3) == {0: 'A', 1: 'B'}
@@ -0,0 +1,66 @@
+import os
+
+import polib
+
+import app as web_app
+from checkpoint import Checkpoint
+from jobs import Job
+
+
+def test_load_skips_truncated_last_line(tmp_path):
+    checkpoint = Checkpoint(str(tmp_path / 'job.jsonl'))
+    checkpoint.append([polib.POEntry(msgid='Open', msgstr='打开'), polib.POEntry(msgid='Empty', msgstr='')])
+    checkpoint.append([polib.POEntry(msgid='Open', msgctxt='menu', msgstr='开启')])
+    checkpoint.close()
+    with open(checkpoint.path, 'a', encoding='utf-8') as f:
+        f.write('{"key": "Clo')
+    assert checkpoint.load() == {'Open': '打开', 'menu\x04Open': '开启'}
+    checkpoint.remove()
+    assert not os.path.exists(checkpoint.path)
+
+
+def write_source(tmp_path, name):
+    source = str(tmp_path / name)
+    catalog = polib.POFile()
+    # 内容各不相同，不会复用其他测试已完成的结果
+    catalog.metadata = {'X-Source': name}
+    for i in range(20):
+        catalog.append(polib.POEntry(msgid=f'Resume entry {i}'))
+    catalog.save(source)
+    return source
+
+
+def save_checkpoint(source, params):
+    """模拟上次运行中断前完成的批次"""
+    checkpoint = Checkpoint.for_digest(
+        web_app.upload_store.digest_of(source), web_app.TARGET_LANG,
+        web_app.app.config['CHECKPOINT_FOLDER'], web_app.engine_settings(params)
+    )
+    checkpoint.append([polib.POEntry(msgid=f'Resume entry {i}', msgstr=f'已保存 {i}') for i in range(5)])
+    checkpoint.close()
+    return checkpoint
+
+
+def test_job_resumes_from_checkpoint(tmp_path):
+    source = write_source(tmp_path, 'resume.po')
+    params = {'filepath': source, 'filename': 'resume.po'}
+    checkpoint = save_checkpoint(source, params)
+
+    job = Job('alice', params)
+    web_app.run_translation_job(job)
+    result = job.events[-1]
+    assert result['status'] == 'complete' and result['resumed_entries'] == 5
+
+    translated = {entry.msgid: entry.msgstr for entry in polib.pofile(result['output_file'])}
+    assert translated['Resume entry 3'] == '已保存 3'
+    assert translated['Resume entry 12'] == 'RESUME ENTRY 12'
+    assert not os.path.exists(checkpoint.path)
+
+
+def test_checkpoint_is_keyed_by_settings(tmp_path):
+    source = write_source(tmp_path, 'settings.po')
+    # 增量模式下保存的检查点不用于普通模式的任务
+    save_checkpoint(source, {'filepath': source, 'filename': 'settings.po', 'incremental': True})
+    job = Job('alice', {'filepath': source, 'filename': 'settings.po'})
+    web_app.run_translation_job(job)
+    assert job.events[-1]['resumed_entries'] == 0
@@ -0,0 +1,28 @@
+import polib
+
+from dedup import expand_groups, group_entries
+
+
+def test_groups_keep_first_occurrence_order():
+    entries = [polib.POEntry(msgid=msgid) for msgid in ['Open', 'Close', 'Open', 'Save', 'Close']]
+    groups = group_entries(entries)
+    assert [(group.msgid, len(group)) for group in groups] == [('Open', 2), ('Close', 2), ('Save', 1)]
+    assert sorted(map(id, expand_groups(groups))) == sorted(map(id, entries))
+
+
+def test_translation_reaches_every_duplicate():
+    entries = [polib.POEntry(msgid='Open'), polib.POEntry(msgid='Open', msgctxt='menu')]
+    group, = group_entries(entries)
+    group.msgstr = '打开'
+    assert [entry.msgstr for entry in entries] == ['打开', '打开']
+
+
+def test_sync_copies_translation_to_late_entries():
+    first = polib.POEntry(msgid='Open')
+    group, = group_entries([first])
+    group.msgstr = '打开'
+    # 翻译过程中并入组的条目
+    late = polib.POEntry(msgid='Open')
+    group.entries.append(late)
+    group.sync()
+    assert late.msgstr == '打开'
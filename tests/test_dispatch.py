@@ -0,0 +1,72 @@
+import threading
+import time
+
+import polib
+
+import app as web_app
+
+
+def test_results_follow_submission_order(monkeypatch):
+    # 前面的批次更慢，结果仍按提交顺序产出
+    def translate_batch(batch, *args):
+        time.sleep(0.02 * (50 - batch[0]) / 10)
+        return batch[0] != 20
+
+    monkeypatch.setattr(web_app, 'translate_batch', translate_batch)
+    batches = [list(range(start, min(start + 10, 45))) for start in range(0, 45, 10)]
+    results = [(start, len(batch), ok) for start, batch, ok, *_ in web_app.dispatch_batches(batches, workers=3)]
+    assert results == [(0, 10, True), (10, 10, True), (20, 10, False), (30, 10, True), (40, 5, True)]
+
+
+def test_in_flight_batches_are_bounded(monkeypatch):
+    lock = threading.Lock()
+    submitted = []
+
+    def translate_batch(batch, *args):
+        with lock:
+            submitted.append(batch[0])
+        return True
+
+    monkeypatch.setattr(web_app, 'translate_batch', translate_batch)
+    # 批次按需取出，消费方尚未取走结果时最多取出工作线程数两倍的批次
+    pulled = []
+
+    def batches():
+        for i in range(100):
+            pulled.append(i)
+            yield [i]
+
+    results = web_app.dispatch_batches(batches(), workers=2)
+    next(results)
+    time.sleep(0.1)
+    assert len(pulled) <= 5 and len(submitted) <= 5
+    results.close()
+
+
+class UnparseableBackend:
+    """批量请求的译文无法解析，单独请求时按 reply 返回"""
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.requests = []
+
+    def translate(self, text, dest, src='auto'):
+        self.requests.append(text)
+        return '???' if len(self.requests) == 1 else self.reply(text)
+
+
+def test_single_fallback_keeps_placeholders_masked(monkeypatch):
+    backend = UnparseableBackend(lambda text: text.replace('Open', '打开'))
+    monkeypatch.setattr(web_app, 'translation_backend', lambda: backend)
+    entry = polib.POEntry(msgid='Open %s')
+    assert web_app.translate_batch([entry])
+    assert backend.requests[1] == 'Open {0}'
+    assert entry.msgstr == '打开 %s'
+
+
+def test_single_fallback_rejects_broken_placeholders(monkeypatch):
+    backend = UnparseableBackend(lambda text: '打开')
+    monkeypatch.setattr(web_app, 'translation_backend', lambda: backend)
+    entry = polib.POEntry(msgid='Open %s')
+    assert not web_app.translate_batch([entry])
+    assert entry.msgstr == ''
@@ -0,0 +1,56 @@
+import os
+
+import polib
+
+import edit_journal
+from edit_journal import EditJournal
+from mo_file import read_mofile, write_mofile
+
+
+def make_catalog():
+    catalog = polib.POFile()
+    catalog.metadata = {'Content-Type': 'text/plain; charset=UTF-8'}
+    catalog.append(polib.POEntry(msgid='Hello', msgstr='你好'))
+    catalog.append(polib.POEntry(msgid='Open', msgstr='打开', msgctxt='menu'))
+    catalog.append(polib.POEntry(msgid='Close', msgstr='关闭'))
+    return catalog
+
+
+def test_last_edit_wins(tmp_path):
+    journal = EditJournal(str(tmp_path / 'journal.jsonl'))
+    journal.append([{'id': 'Hello', 'msgstr': '嗨'}])
+    journal.append([{'id': 'Hello', 'msgstr': '您好'}, {'id': 'menu\x04Open', 'msgstr': '开启'}])
+    assert journal.load() == {'Hello': '您好', 'menu\x04Open': '开启'}
+
+
+def test_apply_to_po(tmp_path):
+    source = str(tmp_path / 'in.po')
+    make_catalog().save(source)
+    journal = EditJournal(str(tmp_path / 'journal.jsonl'))
+    journal.append([{'id': 'Hello', 'msgstr': '嗨'}, {'id': 'menu\x04Open', 'msgstr': '开启'}])
+    target = str(tmp_path / 'edited.po')
+    assert journal.apply(source, target) == 2
+    result = {(entry.msgctxt, entry.msgid): entry.msgstr for entry in polib.pofile(target)}
+    assert result == {(None, 'Hello'): '嗨', ('menu', 'Open'): '开启', (None, 'Close'): '关闭'}
+
+
+def test_apply_to_mo(tmp_path):
+    source = str(tmp_path / 'in.mo')
+    write_mofile(make_catalog(), source)
+    journal = EditJournal(str(tmp_path / 'journal.jsonl'))
+    journal.append([{'id': 'Close', 'msgstr': '关上'}])
+    target = str(tmp_path / 'edited.mo')
+    assert journal.apply(source, target) == 1
+    assert {entry.msgid: entry.msgstr for entry in read_mofile(target)}['Close'] == '关上'
+
+
+def test_compaction_keeps_latest(tmp_path, monkeypatch):
+    monkeypatch.setattr(edit_journal, 'MIN_COMPACT_SIZE', 0)
+    path = str(tmp_path / 'journal.jsonl')
+    journal = EditJournal(path)
+    for i in range(20):
+        journal.append([{'id': 'Hello', 'msgstr': f'v{i}'}])
+    with open(path, encoding='utf-8') as f:
+        assert len(f.readlines()) < 20
+    assert journal.load() == {'Hello': 'v19'}
+    assert not os.path.exists(f"{path}.tmp")
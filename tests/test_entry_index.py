@@ -0,0 +1,46 @@
+import polib
+import pytest
+
+from entry_index import EntryIndex
+
+
+def make_entries():
+    entries = [polib.POEntry(msgid=f'Message {i}', msgstr=f'消息 {i}') for i in range(30)]
+    entries.append(polib.POEntry(msgid='Open file', msgctxt='menu', msgstr=''))
+    fuzzy = polib.POEntry(msgid='100% done', msgstr='完成')
+    fuzzy.flags.append('fuzzy')
+    entries.append(fuzzy)
+    return entries
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = EntryIndex(str(tmp_path / 'entries.sqlite3'))
+    index.add(make_entries(), failed={'menu\x04Open file'})
+    yield index
+    index.close()
+
+
+def test_pages_follow_file_order(index):
+    total, rows = index.query(offset=10, limit=5)
+    assert total == 32
+    assert [row['msgid'] for row in rows] == [f'Message {i}' for i in range(10, 15)]
+
+
+def test_search_matches_any_substring(index):
+    # 三元组全文索引和短查询的 LIKE 退路结果一致
+    assert index.query(search='sage 2')[0] == 11
+    assert [row['msgid'] for row in index.query(search='消息 7')[1]] == ['Message 7']
+    assert [row['id'] for row in index.query(search='menu')[1]] == ['menu\x04Open file']
+    assert [row['msgid'] for row in index.query(search='%')[1]] == ['100% done']
+
+
+def test_filters_and_edits(index):
+    assert [row['msgid'] for row in index.query(status='failed')[1]] == ['Open file']
+    assert [row['msgid'] for row in index.query(status='fuzzy')[1]] == ['100% done']
+    index.update({'menu\x04Open file': '打开文件'})
+    assert index.query(status='untranslated') == (0, [])
+    assert index.query(status='failed') == (0, [])
+    assert index.query(search='打开文件')[1][0]['msgid'] == 'Open file'
+    with pytest.raises(ValueError):
+        index.query(status='unknown')
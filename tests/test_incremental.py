@@ -0,0 +1,34 @@
+import polib
+
+from incremental import is_translated, load_reference, select_entries
+
+
+def entry(msgid, msgstr='', msgctxt=None, fuzzy=False):
+    result = polib.POEntry(msgid=msgid, msgstr=msgstr, msgctxt=msgctxt)
+    if fuzzy:
+        result.flags.append('fuzzy')
+    return result
+
+
+def test_is_translated():
+    assert is_translated(entry('Open', '打开'))
+    assert not is_translated(entry('Open'))
+    assert not is_translated(entry('Open', '打开', fuzzy=True))
+    assert not is_translated(polib.POEntry(msgid='%d file', msgid_plural='%d files', msgstr_plural={0: '%d 个文件', 1: ''}))
+
+
+def test_select_skips_translated_and_reuses_reference(tmp_path):
+    reference = polib.POFile()
+    reference.append(entry('Close', '关闭'))
+    reference.append(entry('Open', '开启', msgctxt='menu'))
+    reference.append(entry('Save', '保存', fuzzy=True))
+    path = str(tmp_path / 'reference.po')
+    reference.save(path)
+
+    fuzzy = entry('Close', '关', fuzzy=True)
+    entries = [entry('Open', '打开'), fuzzy, entry('Open', msgctxt='menu'), entry('Save'), entry('Open')]
+    pending, skipped, reused = select_entries(entries, load_reference(path))
+    assert (skipped, reused) == (1, 2)
+    # 复用参考译文后清除 fuzzy 标记；模糊的参考译文和上下文不同的条目不复用
+    assert fuzzy.msgstr == '关闭' and 'fuzzy' not in fuzzy.flags
+    assert [(item.msgctxt, item.msgid) for item in pending] == [(None, 'Save'), (None, 'Open')]
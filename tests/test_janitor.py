@@ -0,0 +1,94 @@
+import os
+import re
+import tempfile
+import time
+
+import pytest
+
+from janitor import StorageJanitor
+
+
+@pytest.fixture
+def janitor(tmp_path):
+    evicted = []
+    janitor = StorageJanitor(
+        str(tmp_path / 'manifest.sqlite3'), quota=250, ttl=3600, sweep_interval=3600,
+        on_evict=lambda kind, size, reason: evicted.append((kind, size, reason))
+    )
+    # 测试中手动调用 sweep，不启动后台线程
+    janitor.start = lambda: None
+    janitor.evicted = evicted
+    yield janitor
+    janitor.close()
+
+
+def make_file(tmp_path, name, size=100):
+    path = tmp_path / name
+    path.write_bytes(b'x' * size)
+    return str(path)
+
+
+def test_quota_evicts_least_recently_used(janitor, tmp_path):
+    paths = [make_file(tmp_path, f'{name}.po') for name in 'abc']
+    for path in paths:
+        janitor.register(path, 'upload')
+        time.sleep(0.01)
+    janitor.touch(paths[0])
+    assert janitor.sweep() == 1
+    assert janitor.evicted == [('upload', 100, 'quota')]
+    assert [os.path.exists(path) for path in paths] == [True, False, True]
+    assert janitor.usage() == {'bytes': 200, 'files': 2, 'quota': 250}
+
+
+def test_ttl_expires_idle_files(janitor, tmp_path):
+    path = make_file(tmp_path, 'old.po', 10)
+    janitor.register(path, 'output')
+    janitor.ttl = 0
+    assert janitor.sweep() == 1
+    assert janitor.evicted == [('output', 10, 'expired')]
+    assert not os.path.exists(path)
+
+
+def test_leases_protect_job_files(janitor, tmp_path):
+    job_id = 'f' * 32
+    output = make_file(tmp_path, f'{job_id}_out.po', 10)
+    source = make_file(tmp_path, 'input.po', 10)
+    janitor.register(output, 'output', job_id)
+    janitor.register(source, 'upload')
+    janitor.lease(job_id, [source])
+    janitor.ttl = 0
+    assert janitor.sweep() == 0
+    janitor.release(job_id)
+    assert janitor.sweep() == 2
+
+
+def test_active_jobs_are_renewed_on_sweep(janitor, tmp_path):
+    source = make_file(tmp_path, 'input.po', 10)
+    janitor.register(source, 'upload')
+    janitor._active_jobs = lambda: [('a' * 32, [source])]
+    janitor.ttl = 0
+    assert janitor.sweep() == 0 and os.path.exists(source)
+
+
+def test_adopt_registers_matching_files(janitor, tmp_path):
+    folder = tmp_path / 'results'
+    folder.mkdir()
+    job_id = '0' * 32
+    (folder / f'{job_id}_a.po').write_text('x')
+    (folder / 'unrelated.txt').write_text('x')
+    (folder / '.hidden').write_text('x')
+    assert janitor.adopt(str(folder), 'output', re.compile(r'[0-9a-f]{32}_')) == 1
+    janitor.ttl = 0
+    janitor.lease(job_id)
+    assert janitor.sweep() == 0
+    janitor.release(job_id)
+    assert janitor.sweep() == 1
+    assert sorted(os.listdir(folder)) == ['.hidden', 'unrelated.txt']
+
+
+def test_app_adopts_only_its_own_folders():
+    import app as web_app
+    folders = [folder for folder, _, _ in web_app.storage.adopt_folders]
+    # 系统临时目录中的其他文件不归本应用管理
+    assert tempfile.gettempdir() not in folders
+    assert web_app.app.config['RESULTS_FOLDER'] in folders
@@ -0,0 +1,110 @@
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from jobs import COMPLETE, JobManager, QueueFullError
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def blocking_manager(**kwargs):
+    """只有一个工作线程、第一个任务等待 release 后才结束的任务管理器"""
+    started = threading.Event()
+    release = threading.Event()
+    order = []
+
+    def runner(job):
+        order.append(job.params['name'])
+        if len(order) == 1:
+            started.set()
+            release.wait(5)
+
+    manager = JobManager(runner, workers=1, **kwargs)
+    return manager, started, release, order
+
+
+def wait_finished(jobs):
+    for job in jobs:
+        with job._cond:
+            job._cond.wait_for(lambda: job.finished, 5)
+
+
+def test_round_robin_between_owners():
+    manager, started, release, order = blocking_manager()
+    first = manager.submit('alice', {'name': 'a1'})
+    assert started.wait(5)
+    jobs = [
+        manager.submit('alice', {'name': 'a2'}),
+        manager.submit('alice', {'name': 'a3'}),
+        manager.submit('bob', {'name': 'b1'}),
+    ]
+    release.set()
+    wait_finished([first] + jobs)
+    # 排队中的 alice 的第二个任务之后轮到 bob，而不是等 alice 的任务全部完成
+    assert order == ['a1', 'a2', 'b1', 'a3']
+    assert all(job.status == COMPLETE for job in jobs)
+
+
+def test_queue_limit():
+    manager, started, release, _ = blocking_manager(max_queued=2)
+    manager.submit('alice', {'name': 'running'})
+    assert started.wait(5)
+    manager.submit('alice', {'name': 'q1'})
+    manager.submit('bob', {'name': 'q2'})
+    with pytest.raises(QueueFullError):
+        manager.submit('carol', {'name': 'q3'})
+    release.set()
+
+
+def test_events_can_be_read_from_any_position():
+    manager = JobManager(lambda job: job.emit({'step': 1}) or job.emit({'step': 2}))
+    job = manager.submit('alice', {})
+    wait_finished([job])
+    assert job.wait_events(0, timeout=0) == (0, [{'step': 1}, {'step': 2}], True)
+    assert job.wait_events(1, timeout=0) == (1, [{'step': 2}], True)
+
+
+def test_cancel_queued_job():
+    manager, started, release, order = blocking_manager()
+    manager.submit('alice', {'name': 'running'})
+    assert started.wait(5)
+    queued = manager.submit('alice', {'name': 'queued'})
+    manager.cancel(queued.id)
+    assert queued.finished and queued.status == 'cancelled'
+    release.set()
+    assert 'queued' not in order
+
+
+def test_event_tail_is_bounded():
+    manager = JobManager(lambda job: None, event_tail=3)
+    job = manager.add_completed('alice', {}, None, {'status': 'complete'})
+    for i in range(10):
+        job.emit({'i': i})
+    start, events, _ = job.wait_events(0, timeout=0)
+    assert job.event_count == 11
+    assert start == 8 and events == [{'i': 7}, {'i': 8}, {'i': 9}]
+
+
+@pytest.mark.parametrize('environ, argv, workers', [
+    ({}, ['app.py'], 1),
+    ({'WEB_CONCURRENCY': '4'}, ['app.py'], 4),
+    ({'GUNICORN_CMD_ARGS': '--workers=3 --threads 8'}, ['app.py'], 3),
+    ({'WEB_CONCURRENCY': '4'}, ['/usr/bin/gunicorn', '-w', '1', 'app:app'], 1),
+    ({}, ['/usr/bin/gunicorn', '-w2', 'app:app'], 2),
+    # 只有 gunicorn 的命令行参数才计入
+    ({}, ['pytest', '-w', '2'], 1),
+])
+def test_configured_workers(environ, argv, workers):
+    import app as web_app
+    assert web_app.configured_workers(environ, argv) == workers
+
+
+def test_multiple_workers_fail_at_startup():
+    env = dict(os.environ, WEB_CONCURRENCY='2')
+    result = subprocess.run(
+        [sys.executable, '-c', 'import app'], cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    assert result.returncode != 0 and 'ALLOW_MULTIPLE_WORKERS' in result.stderr
@@ -0,0 +1,55 @@
+import time
+
+from metrics import MetricsRegistry
+
+
+def registry(path, **kwargs):
+    """模拟一个 worker 进程的指标，后台写入线程不会在测试期间触发"""
+    metrics = MetricsRegistry(path, flush_interval=3600, **kwargs)
+    metrics.requests = metrics.counter('requests_total', 'Requests.', ('status',))
+    metrics.active = metrics.gauge('active_jobs', 'Active jobs.')
+    metrics.latency = metrics.histogram('latency_seconds', 'Latency.', buckets=(0.1, 1))
+    return metrics
+
+
+def test_values_are_summed_across_processes(tmp_path):
+    path = str(tmp_path / 'metrics.sqlite3')
+    first, second = registry(path), registry(path)
+    first.requests.inc(status='ok')
+    first.requests.inc(2, status='error')
+    second.requests.inc(3, status='ok')
+    first.active.inc()
+    second.active.inc(2)
+    second.active.dec()
+    first.latency.observe(0.05)
+    second.latency.observe(0.5)
+    second.flush()
+
+    lines = first.render().splitlines()
+    assert 'requests_total{status="error"} 2' in lines
+    assert 'requests_total{status="ok"} 4' in lines
+    assert 'active_jobs 2' in lines
+    assert lines[lines.index('# TYPE latency_seconds histogram') + 1:] == [
+        'latency_seconds_bucket{le="0.1"} 1',
+        'latency_seconds_bucket{le="1"} 2',
+        'latency_seconds_bucket{le="+Inf"} 2',
+        'latency_seconds_sum 0.55',
+        'latency_seconds_count 2',
+    ]
+
+
+def test_exited_process_keeps_counters_and_drops_gauges(tmp_path):
+    path = str(tmp_path / 'metrics.sqlite3')
+    exited = registry(path)
+    exited.requests.inc(5, status='ok')
+    exited.active.inc(3)
+    exited.flush()
+    time.sleep(0.05)
+
+    current = registry(path, stale_after=0.01)
+    current.requests.inc(status='ok')
+    lines = current.render().splitlines()
+    assert 'requests_total{status="ok"} 6' in lines
+    assert not any(line.startswith('active_jobs ') for line in lines)
+    # 并入公共记录后再次汇总，计数保持单调
+    assert 'requests_total{status="ok"} 6' in current.render().splitlines()
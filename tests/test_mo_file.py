@@ -0,0 +1,52 @@
+import polib
+
+from mo_file import MOReader, read_mofile, write_mofile
+
+
+def make_catalog():
+    catalog = polib.POFile()
+    catalog.metadata = {'Content-Type': 'text/plain; charset=UTF-8', 'Plural-Forms': 'nplurals=2; plural=(n != 1);'}
+    catalog.append(polib.POEntry(msgid='Hello', msgstr='你好'))
+    catalog.append(polib.POEntry(msgid='Open', msgstr='打开（菜单）', msgctxt='menu'))
+    catalog.append(polib.POEntry(
+        msgid='%d file', msgid_plural='%d files', msgstr_plural={0: '%d 个文件', 1: '%d 个文件们'}
+    ))
+    catalog.append(polib.POEntry(msgid='Untranslated', msgstr=''))
+    fuzzy = polib.POEntry(msgid='Fuzzy', msgstr='模糊')
+    fuzzy.flags.append('fuzzy')
+    catalog.append(fuzzy)
+    for i in range(200):
+        catalog.append(polib.POEntry(msgid=f'Message {i}', msgstr=f'消息 {i}'))
+    return catalog
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / 'out.mo')
+    write_mofile(make_catalog(), path)
+    catalog = read_mofile(path)
+    messages = {(entry.msgctxt, entry.msgid): entry for entry in catalog}
+    assert messages[(None, 'Hello')].msgstr == '你好'
+    assert messages[('menu', 'Open')].msgstr == '打开（菜单）'
+    assert messages[(None, '%d file')].msgstr_plural == {0: '%d 个文件', 1: '%d 个文件们'}
+    # 与 msgfmt 相同，不写出未翻译和模糊的条目
+    assert (None, 'Untranslated') not in messages
+    assert (None, 'Fuzzy') not in messages
+    assert catalog.metadata['Plural-Forms'] == 'nplurals=2; plural=(n != 1);'
+
+
+def test_hash_lookup(tmp_path):
+    path = str(tmp_path / 'out.mo')
+    write_mofile(make_catalog(), path)
+    with MOReader(path) as reader:
+        assert reader.find('Message 123').msgstr == '消息 123'
+        assert reader.find('Open', 'menu').msgstr == '打开（菜单）'
+        assert reader.find('Open') is None
+        assert reader.find('Missing') is None
+
+
+def test_readable_by_polib(tmp_path):
+    path = str(tmp_path / 'out.mo')
+    write_mofile(make_catalog(), path)
+    entries = {entry.msgid: entry.msgstr for entry in polib.mofile(path) if not entry.msgid_plural}
+    assert entries['Hello'] == '你好'
+    assert entries['Message 0'] == '消息 0'
@@ -0,0 +1,30 @@
+import io
+import time
+
+import app as web_app
+from backends import FakeBackend
+
+
+def test_omitted_entries_point_to_the_entry_index(monkeypatch):
+    monkeypatch.setitem(web_app.app.config, 'SSE_MAX_EVENT_BYTES', 200)
+    monkeypatch.setitem(web_app.app.config, 'SSE_MIN_INTERVAL', 0.01)
+    monkeypatch.setitem(web_app.app.config, 'TRANSLATION_BACKEND', FakeBackend(latency=0.05))
+    http = web_app.app.test_client()
+    text = ''.join(f'msgid "Progress entry {i}"\nmsgstr ""\n\n' for i in range(200))
+    uploaded = http.post('/upload', data={'file': (io.BytesIO(text.encode('utf-8')), 'progress.po')}).get_json()
+
+    reply = http.post('/translate', json={'filepath': uploaded['filepath'], 'filename': 'progress.po'})
+    job = web_app.job_manager.get(reply.get_json()['job_id'])
+    deadline = time.time() + 30
+    while not job.finished and time.time() < deadline:
+        job.wait_events(job.event_count, timeout=1)
+    _, events, _ = job.wait_events(0, timeout=0)
+    progress = [event for event in events if 'progress' in event]
+
+    # 超出大小上限的新译文只计数，事件附带条目接口地址，客户端从中读取
+    omitted = [event for event in progress if event['omitted']]
+    assert omitted and all(event['entries_url'] == f'/jobs/{job.id}/entries' for event in omitted)
+    assert all('entries_url' not in event for event in progress if not event['omitted'])
+    page = http.get(omitted[0]['entries_url'], query_string={'limit': 500}).get_json()
+    assert page['total'] == 200
+    assert all(entry['msgstr'] == entry['msgid'].upper() for entry in page['entries'])
@@ -0,0 +1,68 @@
+import asyncio
+import threading
+import time
+
+from rate_limit import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, RateLimiter, backoff_delay
+
+
+def test_bucket_allows_burst_then_paces(tmp_path):
+    limiter = RateLimiter(str(tmp_path / 'limit.sqlite3'), rate=20, burst=3)
+    assert [limiter.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    # 令牌用完后按速率排队，并发请求各自预留一个令牌
+    started = time.time()
+    assert limiter.acquire() > 0
+    assert time.time() - started >= 0.03
+
+
+def test_bucket_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / 'limit.sqlite3')
+    RateLimiter(path, rate=1, burst=2).acquire(2)
+    assert RateLimiter(path, rate=1, burst=2).state()['tokens'] < 1
+
+
+def test_zero_rate_disables_limiting(tmp_path):
+    limiter = RateLimiter(str(tmp_path / 'limit.sqlite3'), rate=0)
+    assert limiter.acquire(100) == 0.0
+    assert not (tmp_path / 'limit.sqlite3').exists()
+
+
+def test_async_calls_run_off_the_event_loop(tmp_path):
+    limiter = RateLimiter(str(tmp_path / 'limit.sqlite3'), rate=100, burst=10)
+    breaker = CircuitBreaker(str(tmp_path / 'limit.sqlite3'))
+    threads = []
+    reserve, check = limiter.reserve, breaker.check
+    limiter.reserve = lambda tokens=1: threads.append(threading.current_thread()) or reserve(tokens)
+    breaker.check = lambda: threads.append(threading.current_thread()) or check()
+
+    async def acquire():
+        await breaker.wait_async()
+        await limiter.acquire_async()
+
+    asyncio.run(acquire())
+    # SQLite 事务可能等待其他进程的写锁，不能在事件循环线程中执行
+    assert len(threads) == 2 and threading.main_thread() not in threads
+
+
+def test_circuit_opens_after_consecutive_failures(tmp_path):
+    breaker = CircuitBreaker(str(tmp_path / 'limit.sqlite3'), failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state()['circuit'] == CLOSED
+    breaker.record_failure()
+    assert breaker.state()['circuit'] == OPEN
+    # 熔断期间等待到超时，之后放行一个试探请求
+    assert breaker.wait() > 0
+    breaker.record_success()
+    assert breaker.state() == {'circuit': CLOSED, 'failures': 0, 'retry_in': 0}
+
+
+def test_half_open_after_timeout(tmp_path):
+    breaker = CircuitBreaker(str(tmp_path / 'limit.sqlite3'), failure_threshold=1, reset_timeout=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    assert breaker.state()['circuit'] == HALF_OPEN
+
+
+def test_backoff_is_capped():
+    assert all(0 <= backoff_delay(attempt, base=1, cap=4) <= 4 for attempt in range(10))
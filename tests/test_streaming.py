@@ -0,0 +1,110 @@
+import polib
+
+from streaming import POStreamWriter, estimate_entries, read_po_chunks
+
+
+def write_catalog(path, size):
+    catalog = polib.POFile()
+    catalog.metadata = {'Content-Type': 'text/plain; charset=UTF-8'}
+    for i in range(size):
+        entry = polib.POEntry(msgid=f'Line {i}\nsecond "quoted"', msgstr='', msgctxt='ctx' if i % 3 == 0 else None)
+        entry.occurrences.append(('app.py', str(i)))
+        catalog.append(entry)
+    catalog.save(path)
+    return catalog
+
+
+def test_chunks_cover_all_entries(tmp_path):
+    path = str(tmp_path / 'in.po')
+    write_catalog(path, 250)
+    chunks = list(read_po_chunks(path, chunk_entries=100))
+    # 文件头也占一个条目块
+    assert all(len(chunk) <= 100 for chunk in chunks)
+    assert sum(len(chunk) for chunk in chunks) == 250
+    assert chunks[0].metadata['Content-Type'] == 'text/plain; charset=UTF-8'
+    assert 200 <= estimate_entries(path) <= 300
+
+
+def test_writer_round_trip(tmp_path):
+    source = str(tmp_path / 'in.po')
+    target = str(tmp_path / 'out.po')
+    original = write_catalog(source, 250)
+    writer = POStreamWriter(target)
+    for chunk in read_po_chunks(source, chunk_entries=64):
+        for entry in chunk:
+            entry.msgstr = entry.msgid.upper()
+        writer.write(chunk)
+    writer.commit()
+
+    result = polib.pofile(target)
+    assert result.metadata == original.metadata
+    assert [(entry.msgctxt, entry.msgid) for entry in result] == [(entry.msgctxt, entry.msgid) for entry in original]
+    assert all(entry.msgstr == entry.msgid.upper() for entry in result)
+    assert result[5].occurrences == [('app.py', '5')]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['in.po', 'out.po']
+
+
+def test_discard_leaves_no_files(tmp_path):
+    source = str(tmp_path / 'in.po')
+    write_catalog(source, 10)
+    writer = POStreamWriter(str(tmp_path / 'out.po'))
+    writer.write(next(read_po_chunks(source)))
+    writer.discard()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['in.po']
+
+
+def test_concurrent_writers_do_not_share_a_temp_file(tmp_path):
+    source = str(tmp_path / 'in.po')
+    write_catalog(source, 10)
+    target = str(tmp_path / 'out.po')
+    first, second = POStreamWriter(target), POStreamWriter(target)
+    for writer, suffix in ((first, 'A'), (second, 'B')):
+        chunk = next(read_po_chunks(source))
+        for entry in chunk:
+            entry.msgstr = suffix
+        writer.write(chunk)
+    second.discard()
+    first.commit()
+    # 后放弃的写入不会删除或混入另一个写入的内容
+    assert {entry.msgstr for entry in polib.pofile(target)} == {'A'}
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['in.po', 'out.po']
+
+
+def test_translated_chunks_are_written_while_reading(tmp_path, monkeypatch):
+    import app as web_app
+    from jobs import Job
+
+    source = str(tmp_path / 'done.po')
+    catalog = polib.POFile()
+    catalog.metadata = {'Content-Type': 'text/plain; charset=UTF-8'}
+    for i in range(300):
+        catalog.append(polib.POEntry(msgid=f'Finished {i}', msgstr=f'完成 {i}'))
+    catalog.save(source)
+
+    written = []
+    # 语言流水线每取出一块时记录已经写出的块数
+    written_before_read = []
+
+    class RecordingWriter(POStreamWriter):
+        def write(self, chunk):
+            written.append(len(chunk))
+            super().write(chunk)
+
+    queued_chunks = web_app.queued_chunks
+
+    def recording_chunks(chunk_queue):
+        for item in queued_chunks(chunk_queue):
+            written_before_read.append(len(written))
+            yield item
+
+    monkeypatch.setitem(web_app.app.config, 'STREAM_CHUNK_ENTRIES', 50)
+    monkeypatch.setattr(web_app, 'POStreamWriter', RecordingWriter)
+    monkeypatch.setattr(web_app, 'queued_chunks', recording_chunks)
+    job = Job('alice', {'filepath': source, 'filename': 'done.po', 'incremental': True})
+    web_app.run_translation_job(job)
+
+    assert job.events[-1]['status'] == 'complete'
+    # 已全部翻译的块不在内存中累积，取出下一块之前上一块已经写出
+    assert len(written_before_read) > 5
+    assert written_before_read == list(range(len(written_before_read)))
+    assert sum(written) == 300
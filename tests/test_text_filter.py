@@ -0,0 +1,49 @@
+import pytest
+
+from text_filter import classify, mask, unmask, unmask_parts
+
+
+def test_mask_round_trip():
+    text = 'Hello %(name)s, open <a href="https://example.com">%d files</a>'
+    masked, tokens = mask(text)
+    assert '%' not in masked and '<a' not in masked
+    assert unmask(masked, tokens) == text
+
+
+def test_unmask_rejects_missing_or_duplicated_tokens():
+    masked, tokens = mask('%s of %s')
+    assert unmask('{0}', tokens) is None
+    assert unmask('{0} {0} {1}', tokens) is None
+
+
+def test_unmask_rejects_reordered_sequential_placeholders():
+    _, tokens = mask('Page %d of %d')
+    assert unmask('第 {1} 页中的第 {0} 页', tokens) is None
+    assert unmask('第 {0} 页，共 {1} 页', tokens) == '第 %d 页，共 %d 页'
+
+
+def test_unmask_allows_reordered_positional_placeholders():
+    _, tokens = mask('%1$s has %2$d items for %(user)s')
+    assert unmask('{2} {1} {0}', tokens) == '%(user)s %2$d %1$s'
+
+
+def test_unmask_parts_drops_broken_translations():
+    masks = [mask('Hi %s'), mask('Bye %s')]
+    assert unmask_parts({0: '你好 {0}', 1: '再见'}, masks) == {0: '你好 %s'}
+
+
+@pytest.mark.parametrize('text, kind', [
+    ('%s', 'placeholder'),
+    ('https://example.com', 'url'),
+    ('12px', 'number'),
+    ('#fff', 'number'),
+    ('color: red; margin: 0 auto;', 'css'),
+    ('user_id', 'identifier'),
+    ('-webkit-transform: none;', 'css'),
+    ('.button { label: none; }', 'css'),
+    ('warning: disk is full;', None),
+    ('label: word;', None),
+    ('Save file', None),
+])
+def test_classify(text, kind):
+    assert classify(text) == kind
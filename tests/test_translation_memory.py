@@ -0,0 +1,70 @@
+import sqlite3
+import time
+
+import polib
+
+import translation_memory
+from translation_memory import TranslationMemory
+
+
+def entries(*msgids, msgstr=''):
+    return [polib.POEntry(msgid=msgid, msgstr=msgstr and msgstr + msgid) for msgid in msgids]
+
+
+def test_lookup_fills_hits_and_returns_misses(tmp_path):
+    memory = TranslationMemory(str(tmp_path / 'tm.sqlite3'))
+    memory.store(entries('Open', 'Close', msgstr='译'), 'en', 'zh-cn', 'google')
+    pending = entries('Open', 'Save')
+    misses = memory.lookup(pending, 'en', 'zh-cn', 'google')
+    assert [entry.msgid for entry in misses] == ['Save']
+    assert pending[0].msgstr == '译Open'
+    # 目标语言和上下文不同的条目互不命中
+    assert len(memory.lookup(entries('Open'), 'en', 'ja', 'google')) == 1
+    assert len(memory.lookup([polib.POEntry(msgid='Open', msgctxt='menu')], 'en', 'zh-cn', 'google')) == 1
+
+
+def test_backends_do_not_share_translations(tmp_path):
+    memory = TranslationMemory(str(tmp_path / 'tm.sqlite3'))
+    memory.store(entries('Open', msgstr='FAKE '), 'en', 'zh-cn', 'fake')
+    assert len(memory.lookup(entries('Open'), 'en', 'zh-cn', 'google')) == 1
+    assert memory.lookup(entries('Open'), 'en', 'zh-cn', 'fake') == []
+
+
+def test_old_records_migrate_as_google(tmp_path):
+    path = str(tmp_path / 'tm.sqlite3')
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE memory (msgid TEXT, msgctxt TEXT, src TEXT, dest TEXT, msgstr TEXT, last_used REAL)"
+    )
+    conn.execute("INSERT INTO memory VALUES ('Open', '', 'en', 'zh-cn', '打开', 0)")
+    conn.commit()
+    conn.close()
+    memory = TranslationMemory(path)
+    pending = entries('Open')
+    assert memory.lookup(pending, 'en', 'zh-cn', 'google') == []
+    assert pending[0].msgstr == '打开'
+
+
+def test_evicts_least_recently_used(tmp_path, monkeypatch):
+    monkeypatch.setattr(translation_memory, 'EVICT_CHECK_INTERVAL', 1)
+    memory = TranslationMemory(str(tmp_path / 'tm.sqlite3'), max_entries=2)
+    memory.store(entries('a', msgstr='译'), 'en', 'zh-cn', 'google')
+    time.sleep(0.01)
+    memory.store(entries('b', msgstr='译'), 'en', 'zh-cn', 'google')
+    time.sleep(0.01)
+    # 命中刷新 a 的使用时间，超出容量时淘汰的是 b
+    memory.lookup(entries('a'), 'en', 'zh-cn', 'google')
+    time.sleep(0.01)
+    memory.store(entries('c', msgstr='译'), 'en', 'zh-cn', 'google')
+    misses = memory.lookup(entries('a', 'b', 'c'), 'en', 'zh-cn', 'google')
+    assert [entry.msgid for entry in misses] == ['b']
+
+
+def test_capacity_is_checked_periodically(tmp_path, monkeypatch):
+    monkeypatch.setattr(translation_memory, 'EVICT_CHECK_INTERVAL', 3)
+    memory = TranslationMemory(str(tmp_path / 'tm.sqlite3'), max_entries=1)
+    memory.store(entries('a', 'b', msgstr='译'), 'en', 'zh-cn', 'google')
+    # 写入的记录数未达到检查间隔时不统计总数，也不淘汰
+    assert memory.lookup(entries('a', 'b'), 'en', 'zh-cn', 'google') == []
+    memory.store(entries('c', msgstr='译'), 'en', 'zh-cn', 'google')
+    assert len(memory.lookup(entries('a', 'b', 'c'), 'en', 'zh-cn', 'google')) == 2
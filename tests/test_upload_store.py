@@ -0,0 +1,115 @@
+import io
+import os
+import time
+
+import pytest
+
+from upload_store import UploadStore
+
+PO_TEXT = (
+    'msgid ""\nmsgstr ""\n"Content-Type: text/plain; charset=UTF-8\\n"\n\n'
+    + ''.join(f'msgid "Hello world {i}"\nmsgstr ""\n\n' for i in range(30))
+)
+SETTINGS = {'backend': 'fake', 'incremental': False}
+
+
+def test_same_content_shares_one_blob(tmp_path):
+    store = UploadStore(str(tmp_path))
+    first = store.save_stream(io.BytesIO(b'content'), 'a.po')
+    second = store.save_stream(io.BytesIO(b'content'), 'b.po')
+    assert first == second
+    assert store.digest_of(first[1]) == first[0]
+    assert os.listdir(store.blob_folder) == [os.path.basename(first[1])]
+
+
+def test_result_reuse(tmp_path):
+    store = UploadStore(str(tmp_path))
+    digest, _ = store.save_stream(io.BytesIO(b'content'), 'a.po')
+    output = tmp_path / 'out.po'
+    output.write_text('translated')
+    stored = store.store_result(digest, 'ja', SETTINGS, str(output), 'a_ja.po', {'total_entries': 1})
+
+    assert store.find_result(digest, 'ja', dict(SETTINGS)) == {
+        'output_file': stored, 'output_filename': 'a_ja.po', 'summary': {'total_entries': 1}
+    }
+    assert store.find_result(digest, 'de', SETTINGS) is None
+    assert store.find_result(digest, 'ja', dict(SETTINGS, incremental=True)) is None
+    # 结果文件已被清理时视为没有结果
+    os.remove(stored)
+    assert store.find_result(digest, 'ja', SETTINGS) is None
+
+
+def test_resolve_only_accepts_stored_files(tmp_path):
+    store = UploadStore(str(tmp_path / 'store'))
+    digest, path = store.save_stream(io.BytesIO(b'content'), 'a.po')
+    outside = tmp_path / 'other.po'
+    outside.write_text('x')
+    assert store.resolve(path) == path
+    assert store.resolve(digest) == path
+    assert store.resolve(str(outside)) is None
+    assert store.resolve('/etc/passwd') is None
+    assert store.resolve(None) is None
+
+
+@pytest.fixture
+def client():
+    import app as web_app
+    return web_app, web_app.app.test_client()
+
+
+def upload(client, text, filename='a.po'):
+    return client.post('/upload', data={'file': (io.BytesIO(text.encode('utf-8')), filename)}).get_json()
+
+
+def wait_for(web_app, job_id):
+    job = web_app.job_manager.get(job_id)
+    deadline = time.time() + 30
+    while not job.finished and time.time() < deadline:
+        job.wait_events(job.event_count, timeout=1)
+    return job
+
+
+def test_translate_then_reuse_cached_result(client):
+    web_app, http = client
+    uploaded = upload(http, PO_TEXT)
+    other = upload(http, PO_TEXT)
+    assert other['filepath'] == uploaded['filepath']
+
+    reply = http.post('/translate', json={'filepath': uploaded['filepath'], 'filename': 'a.po'})
+    job = wait_for(web_app, reply.get_json()['job_id'])
+    assert job.status == 'complete'
+    # 内容相同的上传共用一个文件，任务完成后不删除，其他用户仍可提交
+    assert os.path.exists(other['filepath'])
+
+    reply = http.post('/translate', json={'filepath': other['filepath'], 'filename': 'a.po'})
+    assert reply.get_json()['status'] == 'complete'
+    download = http.get(f"/jobs/{reply.get_json()['job_id']}/download")
+    assert download.status_code == 200
+    assert 'HELLO WORLD 7' in download.get_data(as_text=True)
+
+
+def test_reference_must_be_uploaded(client, tmp_path):
+    _, http = client
+    uploaded = upload(http, PO_TEXT)
+    outside = tmp_path / 'reference.po'
+    outside.write_text(PO_TEXT)
+    reply = http.post('/translate', json={
+        'filepath': uploaded['filepath'], 'filename': 'a.po', 'incremental': True,
+        'reference_filepath': str(outside)
+    })
+    assert reply.status_code == 400
+    assert outside.exists()
+
+
+def test_source_must_be_uploaded(client, tmp_path):
+    web_app, http = client
+    outside = tmp_path / 'secret.po'
+    outside.write_text(PO_TEXT)
+    for filepath in (str(outside), '/etc/passwd', None):
+        reply = http.post('/translate', json={'filepath': filepath, 'filename': 'a.po'})
+        assert reply.status_code == 400
+
+    # 上传返回的哈希也可以作为文件句柄
+    digest = web_app.upload_store.digest_of(upload(http, PO_TEXT + '\n')['filepath'])
+    reply = http.post('/translate', json={'filepath': digest, 'filename': 'a.po', 'dests': ['de']})
+    assert wait_for(web_app, reply.get_json()['job_id']).status == 'complete'
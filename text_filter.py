@@ -0,0 +1,173 @@
+import re
+from collections import Counter
+
+# 格式化占位符：printf 风格（%s、%(name)s、%1$d、%%）、Qt 风格（%1）、
+# Ruby 风格（%{name}）、${name}、Python/ICU 风格（{0}、{count}、{value:.2f}）和模板变量（{{ name }}）
+PLACEHOLDER = (
+    r'%(?:\(\w+\))?[-+#0]*(?:\d+\$)?(?:\d+|\*)?(?:\.\d+)?[hlLqjzt]*[diouxXeEfFgGcrsaA@%]'
+    r'|%\d+|%\{\w+\}|\$\{\w+\}'
+    r'|\{\{\s*[\w.]+\s*\}\}'
+    r'|\{\w*(?:\.\w+|\[\w+\])*(?:![rsa])?(?::[^{}\s]*)?\}'
+)
+# HTML/XML 标签和字符实体
+MARKUP = r'</?[A-Za-z][\w:.-]*(?:\s+[^<>]*?)?/?>|&(?:[A-Za-z]+|#\d+|#x[0-9A-Fa-f]+);'
+URL = r'(?:https?|ftp)://[^\s<>"\']*[^\s<>"\'.,;:!?)]|www\.[\w-]+(?:\.[\w-]+)+(?:/[^\s<>"\']*[^\s<>"\'.,;:!?)])?'
+EMAIL = r'[\w.+-]+@[\w-]+(?:\.[\w-]+)+'
+
+# 需要保护的片段，翻译前替换为编号标记，翻译后还原（标签先于网址匹配，属性中的网址随标签一起保护）
+PROTECTED_PATTERN = re.compile(
+    f'(?P<markup>{MARKUP})|(?P<url>{URL})|(?P<email>{EMAIL})|(?P<placeholder>{PLACEHOLDER})'
+)
+# 替换受保护片段的标记，翻译服务通常原样保留
+MASK_TOKEN = '{{{}}}'
+MASK_TOKEN_PATTERN = re.compile(r'\{\s*(\d+)\s*\}')
+
+NUMBER_PATTERN = re.compile(r'[-+]?(?:\d[\d,.\s]*)?\d(?:px|em|rem|pt|vh|vw|ms|s|%)?')
+HEX_COLOR_PATTERN = re.compile(r'#(?:[0-9A-Fa-f]{3,4}|[0-9A-Fa-f]{6}|[0-9A-Fa-f]{8})')
+# CSS 声明，如 "color: red; margin: 0 auto;"（每条声明都以分号结尾）；
+# 值为单个关键字、数值（可带单位）、颜色、函数、字符串或 !important，多个值以空格或逗号分隔
+CSS_VALUE = r'(?:[-+]?\d*\.?\d+(?:[a-z]+|%)?|#[0-9A-Fa-f]{3,8}|[a-z-]+\([^()]*\)|!important|[a-z][a-z-]*|"[^"]*"|\'[^\']*\')'
+CSS_DECLARATION_PATTERN = re.compile(
+    rf'\s*(?P<property>-?[a-z][a-z-]*)\s*:\s*(?P<value>{CSS_VALUE}(?:\s*,\s*{CSS_VALUE}|\s+{CSS_VALUE})*)\s*;'
+)
+CSS_PATTERN = re.compile(rf'(?:{CSS_DECLARATION_PATTERN.pattern})+\s*')
+# 带花括号的规则，如 ".button { color: red; }"，选择器只含常见的选择器字符
+CSS_RULE_PATTERN = re.compile(rf'[\w.#:*>+~,\s-]*\{{(?P<body>{CSS_PATTERN.pattern})\}}\s*')
+# 不带花括号时只有常见的属性名才按 CSS 处理，避免 "label: word;" 这样的文本被当作 CSS
+CSS_PROPERTIES = frozenset({
+    'align-items', 'align-self', 'animation', 'background', 'background-color', 'background-image',
+    'background-position', 'background-repeat', 'background-size', 'border', 'border-collapse', 'border-color',
+    'border-radius', 'border-style', 'border-width', 'bottom', 'box-shadow', 'box-sizing', 'clear', 'color',
+    'content', 'cursor', 'display', 'fill', 'flex', 'flex-direction', 'flex-grow', 'flex-shrink', 'flex-wrap',
+    'float', 'font', 'font-family', 'font-size', 'font-style', 'font-weight', 'gap', 'grid-template-columns',
+    'height', 'justify-content', 'left', 'letter-spacing', 'line-height', 'list-style', 'margin', 'max-height',
+    'max-width', 'min-height', 'min-width', 'opacity', 'outline', 'overflow', 'padding', 'position', 'right',
+    'stroke', 'text-align', 'text-decoration', 'text-overflow', 'text-transform', 'top', 'transform',
+    'transition', 'vertical-align', 'visibility', 'white-space', 'width', 'word-break', 'z-index',
+} | {
+    f'{box}-{side}' for box in ('border', 'margin', 'padding') for side in ('top', 'right', 'bottom', 'left')
+})
+# 浏览器前缀，如 -webkit-、-moz-
+CSS_VENDOR_PREFIX_PATTERN = re.compile(r'\A-[a-z]+-')
+# 按参数顺序取值的占位符（%s、%d、{}、{:.2f}），译文中调换顺序会改变参数的对应关系
+SEQUENTIAL_PLACEHOLDER_PATTERN = re.compile(r'%(?![%({]|\d+(?:\$|\Z))|\{(?:[!:][^{}]*)?\}\Z')
+# 代码标识符：snake_case、camelCase 或点分路径（如 user_id、maxSize、os.path.join）
+IDENTIFIER_PATTERN = re.compile(r'[A-Za-z_$][\w$]*(?:(?:\.|::)[A-Za-z_$][\w$]*)*(?:\(\))?')
+IDENTIFIER_HINT_PATTERN = re.compile(r'_|\.|::|[a-z][A-Z]|\(\)$')
+LETTER_PATTERN = re.compile(r'[^\W\d_]')
+
+# 无需翻译的条目类别及说明
+KIND_LABELS = {
+    'placeholder': '占位符',
+    'markup': '标记',
+    'url': '网址',
+    'email': '邮箱',
+    'number': '数字',
+    'css': 'CSS',
+    'identifier': '代码标识符',
+    'symbols': '符号',
+}
+
+
+def classify(text):
+    """判断原文是否无需翻译，返回类别（KIND_LABELS 的键），需要翻译时返回 None
+
+    只由占位符、标记、网址、邮箱、数字和标点组成的原文，以及整条为
+    CSS 声明、颜色值或代码标识符的原文无需翻译，译文与原文相同。
+    """
+    stripped = text.strip()
+    if not stripped:
+        return 'symbols'
+    if NUMBER_PATTERN.fullmatch(stripped) or HEX_COLOR_PATTERN.fullmatch(stripped):
+        return 'number'
+    rule = CSS_RULE_PATTERN.fullmatch(stripped)
+    if (rule or CSS_PATTERN.fullmatch(stripped)) and all(
+        (rule or CSS_VENDOR_PREFIX_PATTERN.sub('', match.group('property'), count=1) in CSS_PROPERTIES)
+        # 多个值都是普通单词时更像 "warning: disk is full;" 这样的句子
+        and (len(match.group('value').split()) == 1 or re.search(r'[\d#("\',]', match.group('value')))
+        for match in CSS_DECLARATION_PATTERN.finditer(rule.group('body') if rule else stripped)
+    ):
+        return 'css'
+    if IDENTIFIER_PATTERN.fullmatch(stripped) and IDENTIFIER_HINT_PATTERN.search(stripped):
+        return 'identifier'
+
+    kinds = []
+
+    def remove(match):
+        kinds.append(match.lastgroup)
+        return ' '
+
+    remainder = PROTECTED_PATTERN.sub(remove, stripped)
+    if LETTER_PATTERN.search(remainder):
+        return None
+    if kinds:
+        return kinds[0]
+    return 'number' if any(ch.isdigit() for ch in remainder) else 'symbols'
+
+
+def filter_entries(entries):
+    """在本地处理无需翻译的条目（译文设为原文），返回 (需要翻译的条目, 各类别的跳过数)"""
+    pending = []
+    skipped = Counter()
+    for entry in entries:
+        kind = classify(entry.msgid)
+        if kind is None:
+            pending.append(entry)
+            continue
+        entry.msgstr = entry.msgid
+        skipped[kind] += 1
+    return pending, skipped
+
+
+def describe_skipped(skipped):
+    """把各类别的跳过数转为日志文本，如：占位符 3，网址 1"""
+    return '，'.join(f"{KIND_LABELS[kind]} {count}" for kind, count in skipped.most_common())
+
+
+def mask(text):
+    """把原文中的占位符、标记、网址和邮箱替换为编号标记，返回 (替换后的文本, 被替换的片段列表)"""
+    tokens = []
+
+    def replace(match):
+        tokens.append(match.group(0))
+        return MASK_TOKEN.format(len(tokens) - 1)
+
+    return PROTECTED_PATTERN.sub(replace, text), tokens
+
+
+def unmask(text, tokens):
+    """把译文中的编号标记还原为原来的片段
+
+    每个标记都必须恰好出现一次，否则返回 None（译文破坏了占位符，不能使用）。
+    按参数顺序取值的占位符（如两个 %d）在译文中调换了顺序时也返回 None，避免参数错位。
+    """
+    if not tokens:
+        return text
+    found = Counter()
+    order = []
+
+    def restore(match):
+        index = int(match.group(1))
+        if index >= len(tokens):
+            return match.group(0)
+        found[index] += 1
+        order.append(index)
+        return tokens[index]
+
+    restored = MASK_TOKEN_PATTERN.sub(restore, text)
+    if len(found) != len(tokens) or any(count != 1 for count in found.values()):
+        return None
+    sequential = [index for index in order if SEQUENTIAL_PLACEHOLDER_PATTERN.match(tokens[index])]
+    if sequential != sorted(sequential):
+        return None
+    return restored
+
+
+def unmask_parts(parts, masks):
+    """还原批量译文 {索引: 译文} 中的编号标记，丢弃标记损坏的译文"""
+    result = {}
+    for i, text in parts.items():
+        restored = unmask(text, masks[i][1])
+        if restored is not None:
+            result[i] = restored
+    return result
@@ -0,0 +1,129 @@
+import contextvars
+import json
+import os
+import threading
+import time
+
+# 当前线程所属任务的跟踪记录，未开启跟踪时为 None
+current_tracer = contextvars.ContextVar('current_tracer', default=None)
+
+# 单个任务最多记录的事件数，超出后丢弃并计数，避免长任务占用过多内存
+DEFAULT_MAX_EVENTS = int(os.environ.get('TRACE_MAX_EVENTS', 200000))
+
+
+class _NullSpan:
+    """未开启跟踪时使用的空操作区间"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """一个计时区间，退出 with 块时记录为跟踪事件"""
+
+    __slots__ = ('_tracer', 'name', 'category', 'args', '_start')
+
+    def __init__(self, tracer, name, category, args):
+        self._tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        self._tracer.add(self.name, self.category, self._start, time.perf_counter(), self.args)
+        return False
+
+    def set(self, **args):
+        """补充区间的参数（如请求结果），在 with 块内调用"""
+        self.args.update(args)
+
+
+class Tracer:
+    """记录一个任务中各阶段和每次请求的耗时，导出为 Chrome/Perfetto 跟踪格式（JSON）
+
+    每个区间记录为一个完整事件（ph 为 X），时间以任务开始为零点、单位为微秒，
+    按线程分行显示；可在 chrome://tracing 或 ui.perfetto.dev 中打开。
+    """
+
+    def __init__(self, name='mopo', max_events=DEFAULT_MAX_EVENTS):
+        self.name = name
+        self.max_events = max_events
+        self.dropped = 0
+        self._origin = time.perf_counter()
+        self._pid = os.getpid()
+        self._events = []
+        self._threads = {}
+        self._lock = threading.Lock()
+
+    def span(self, name, category='job', **args):
+        """返回记录 with 块耗时的区间"""
+        return Span(self, name, category, args)
+
+    def add(self, name, category, start, end, args=None):
+        """记录一个区间，start 和 end 为 time.perf_counter() 的值"""
+        thread = threading.current_thread()
+        tid = thread.native_id or thread.ident
+        event = {
+            'name': name,
+            'cat': category,
+            'ph': 'X',
+            'ts': round((start - self._origin) * 1e6, 1),
+            'dur': round((end - start) * 1e6, 1),
+            'pid': self._pid,
+            'tid': tid,
+        }
+        if args:
+            event['args'] = args
+        with self._lock:
+            if len(self._events) >= self.max_events:
+                self.dropped += 1
+                return
+            self._events.append(event)
+            self._threads.setdefault(tid, thread.name)
+
+    def to_dict(self):
+        """Chrome 跟踪格式的数据（可在任务运行中导出当前已记录的部分）"""
+        with self._lock:
+            events = list(self._events)
+            threads = dict(self._threads)
+        metadata = [{'name': 'process_name', 'ph': 'M', 'pid': self._pid, 'tid': 0, 'args': {'name': self.name}}]
+        metadata.extend(
+            {'name': 'thread_name', 'ph': 'M', 'pid': self._pid, 'tid': tid, 'args': {'name': thread_name}}
+            for tid, thread_name in threads.items()
+        )
+        return {
+            'traceEvents': metadata + events,
+            'displayTimeUnit': 'ms',
+            'otherData': {'dropped_events': self.dropped},
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), ensure_ascii=False, separators=(',', ':'))
+
+    def save(self, path):
+        """写出为跟踪文件"""
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.to_json())
+
+
+def span(name, category='job', **args):
+    """在当前任务的跟踪记录中记录 with 块的耗时；未开启跟踪时返回空操作区间，几乎没有开销"""
+    tracer = current_tracer.get()
+    if tracer is None:
+        return NULL_SPAN
+    return Span(tracer, name, category, args)
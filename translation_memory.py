@@ -0,0 +1,133 @@
+import os
+import sqlite3
+import threading
+import time
+
+# 默认存放在用户目录下，Web应用和桌面GUI共用同一个翻译记忆库
+DEFAULT_PATH = os.environ.get(
+    'TRANSLATION_MEMORY_PATH',
+    os.path.join(os.path.expanduser('~'), '.mopo-translator', 'translation_memory.sqlite3')
+)
+DEFAULT_MAX_ENTRIES = int(os.environ.get('TRANSLATION_MEMORY_MAX_ENTRIES', 500000))
+# 每写入多少条记录检查一次容量（统计总数需要扫描整张表，不在每个批次都做）
+EVICT_CHECK_INTERVAL = 5000
+
+
+class TranslationMemory:
+    """基于SQLite的持久化翻译记忆库
+
+    以 (msgid, msgctxt, 源语言, 目标语言, 翻译后端) 为键缓存译文，不同后端（如离线模拟后端）的译文互不混用。
+    每写入 EVICT_CHECK_INTERVAL 条记录检查一次容量，超过上限时按最近使用时间淘汰（LRU）。
+    """
+
+    def __init__(self, path=DEFAULT_PATH, max_entries=DEFAULT_MAX_ENTRIES):
+        """打开（或创建）翻译记忆库"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # 上次检查容量后写入的记录数
+        self._stored_since_check = 0
+        # 翻译在工作线程中进行，连接需要跨线程使用
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        # WAL模式允许多个进程（gunicorn worker、GUI）同时读写
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS translations (
+                msgid TEXT NOT NULL,
+                msgctxt TEXT NOT NULL,
+                src TEXT NOT NULL,
+                dest TEXT NOT NULL,
+                backend TEXT NOT NULL,
+                msgstr TEXT NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (msgid, msgctxt, src, dest, backend)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS translations_last_used ON translations (last_used)")
+        self._migrate()
+        self._conn.commit()
+
+    def _migrate(self):
+        """把旧版（不区分后端）的记录迁移到新表；旧版只有 Google 后端写入正式的记忆库"""
+        exists = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'memory'"
+        ).fetchone()
+        if exists:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO translations (msgid, msgctxt, src, dest, backend, msgstr, last_used) "
+                "SELECT msgid, msgctxt, src, dest, 'google', msgstr, last_used FROM memory"
+            )
+            self._conn.execute("DROP TABLE memory")
+
+    def lookup(self, entries, src, dest, backend):
+        """用后端 backend 缓存的译文填充条目，返回未命中、仍需翻译的条目列表"""
+        misses = []
+        hit_keys = []
+
+        with self._lock:
+            cursor = self._conn.cursor()
+            for entry in entries:
+                key = (entry.msgid, entry.msgctxt or '', src, dest, backend)
+                row = cursor.execute(
+                    "SELECT msgstr FROM translations "
+                    "WHERE msgid = ? AND msgctxt = ? AND src = ? AND dest = ? AND backend = ?",
+                    key
+                ).fetchone()
+                if row:
+                    entry.msgstr = row[0]
+                    hit_keys.append(key)
+                else:
+                    misses.append(entry)
+
+            # 刷新命中条目的使用时间
+            if hit_keys:
+                now = time.time()
+                cursor.executemany(
+                    "UPDATE translations SET last_used = ? "
+                    "WHERE msgid = ? AND msgctxt = ? AND src = ? AND dest = ? AND backend = ?",
+                    [(now,) + key for key in hit_keys]
+                )
+                self._conn.commit()
+
+        return misses
+
+    def store(self, entries, src, dest, backend):
+        """保存后端 backend 翻译的译文，并定期在超出容量时淘汰最久未使用的记录"""
+        now = time.time()
+        rows = [
+            (entry.msgid, entry.msgctxt or '', src, dest, backend, entry.msgstr, now)
+            for entry in entries
+            if entry.msgid and entry.msgstr
+        ]
+        if not rows:
+            return
+
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.executemany(
+                "INSERT OR REPLACE INTO translations (msgid, msgctxt, src, dest, backend, msgstr, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+            self._stored_since_check += len(rows)
+            if self._stored_since_check >= EVICT_CHECK_INTERVAL:
+                self._stored_since_check = 0
+                count = cursor.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+                if count > self.max_entries:
+                    cursor.execute(
+                        "DELETE FROM translations WHERE rowid IN "
+                        "(SELECT rowid FROM translations ORDER BY last_used LIMIT ?)",
+                        (count - self.max_entries,)
+                    )
+            self._conn.commit()
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
@@ -3,14 +3,34 @@ from tkinter import ttk, filedialog, messagebox
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
 import polib
-from googletrans import Translator
 import os
 import threading
+import queue
 import json
 import time
 import ssl
 import urllib3
 from requests.exceptions import SSLError, ConnectionError
+from backends import create_backend
+from translation_memory import TranslationMemory
+from dedup import group_entries, expand_groups
+from batching import BatchPacker, build_batch_text, parse_batch_reply
+from rate_limit import RateLimiter, CircuitBreaker, backoff_delay
+from incremental import load_reference, select_entries
+from streaming import estimate_entries, read_po_chunks
+from text_filter import describe_skipped, filter_entries, mask, unmask_parts
+from mo_file import MOCatalog, read_mofile, write_mofile
+from tracing import Tracer, current_tracer, span
+
+# 翻译语言
+SOURCE_LANG = 'auto'
+TARGET_LANG = 'zh-cn'
+
+# 界面更新队列的处理间隔（毫秒）和每次最多处理的消息数
+UI_POLL_INTERVAL = 100
+UI_MAX_MESSAGES = 5000
+# 表格每次创建的行数，滚动到接近底部时再创建下一批
+ROW_PAGE_SIZE = 500
 
 class TranslatorApp:
     def __init__(self, root):
@@ -24,7 +44,25 @@ class TranslatorApp:
         
         # 初始化变量
         self.current_file = None
+        self.reference_file = None  # 增量模式下复用其译文的旧版目录
+        self.incremental_var = tk.BooleanVar(value=False)
+        # 开启后记录每次翻译各阶段和每次请求的耗时，可从日志面板导出
+        self.trace_var = tk.BooleanVar(value=False)
+        self.tracer = None
+        self.dest_var = tk.StringVar(value=TARGET_LANG)
+        self.dest = TARGET_LANG  # 本次翻译的目标语言，开始翻译时从输入框读取
         self.translation_data = []
+        self.po_file = None
+        # 表格行与条目的双向索引，按条目查找或更新行无需遍历表格
+        self.item_entries = {}
+        self.entry_items = {}
+        # 需要显示的全部条目，表格中只创建了前 len(self.item_entries) 行
+        self.display_entries = []
+        # 每次选择文件时递增，丢弃已被取代的后台加载结果
+        self.load_generation = 0
+        # 工作线程不直接操作Tk控件，而是把界面更新放入队列，由主线程定时合并处理
+        self.ui_queue = queue.Queue()
+        self.main_thread = threading.current_thread()
         self.progress_var = tk.DoubleVar()
         self.time_label = None
         self.translation_start_time = None
@@ -33,9 +71,22 @@ class TranslatorApp:
         self.last_update_time = None
         self.speed_samples = []  # 用于存储速度样本
         self.initial_estimate = None  # 初始预估总时间
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.fallbacks = 0  # 译文分段不匹配的次数
+        self.rebatched_entries = 0  # 因分段不匹配而重新翻译的条目数
+        # 批次打包器，根据请求结果自适应调整每批的字符数
+        self.packer = BatchPacker()
+        
+        # 持久化翻译记忆库，与Web应用共用
+        self.translation_memory = TranslationMemory()
+        # 与Web应用共享限流额度和熔断状态
+        self.rate_limiter = RateLimiter()
+        self.circuit_breaker = CircuitBreaker()
         
         # 创建主框架
         self.create_main_frame()
+        self.root.after(UI_POLL_INTERVAL, self.process_ui_queue)
         
     def init_translator(self):
         """初始化翻译器，处理SSL问题"""
@@ -48,8 +99,8 @@ class TranslatorApp:
             ssl_context.check_hostname = False
             ssl_context.verify_mode = ssl.CERT_NONE
             
-            # 初始化翻译器
-            self.translator = Translator()
+            # 初始化翻译器（后端由环境变量 TRANSLATION_BACKEND 指定，默认 google）
+            self.translator = create_backend()
             
         except Exception as e:
             self.log_message(f"初始化翻译器时出错: {str(e)}")
@@ -63,6 +114,7 @@ class TranslatorApp:
         
         # 左侧日志面板
         self.log_frame = ttk.LabelFrame(self.paned, text="日志信息")
+        ttk.Button(self.log_frame, text="导出性能跟踪", command=self.export_trace).pack(side="bottom", anchor="e", padx=5, pady=(0, 5))
         self.log_text = tk.Text(self.log_frame, width=40, height=40)
         self.log_text.pack(fill="both", expand=True, padx=5, pady=5)
         self.paned.add(self.log_frame)
@@ -77,6 +129,11 @@ class TranslatorApp:
         
         ttk.Button(self.button_frame, text="选择文件", command=self.select_file).pack(side="left", padx=5)
         ttk.Button(self.button_frame, text="开始翻译", command=self.start_translation).pack(side="left", padx=5)
+        ttk.Label(self.button_frame, text="目标语言").pack(side="left", padx=(5, 0))
+        ttk.Entry(self.button_frame, textvariable=self.dest_var, width=8).pack(side="left", padx=5)
+        ttk.Checkbutton(self.button_frame, text="增量翻译", variable=self.incremental_var).pack(side="left", padx=5)
+        ttk.Button(self.button_frame, text="选择参考译文", command=self.select_reference_file).pack(side="left", padx=5)
+        ttk.Checkbutton(self.button_frame, text="性能跟踪", variable=self.trace_var).pack(side="left", padx=5)
         
         # 添加倒计时标签
         self.time_label = ttk.Label(self.button_frame, text="预计剩余时间: --:--")
@@ -114,7 +171,14 @@ class TranslatorApp:
         
         # 添加滚动条
         scrollbar = ttk.Scrollbar(self.table_frame, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scrollbar.set)
+        
+        def on_scroll(first, last):
+            scrollbar.set(first, last)
+            # 滚动到接近底部时创建下一批行
+            if float(last) > 0.9:
+                self.show_more_rows()
+                
+        self.tree.configure(yscrollcommand=on_scroll)
         
         # 布局
         self.tree.pack(side="left", fill="both", expand=True)
@@ -124,10 +188,57 @@ class TranslatorApp:
         self.tree.bind("<Double-1>", self.edit_cell)
         
     def log_message(self, message):
-        """添加日志信息"""
+        """添加日志信息（可在任意线程中调用）"""
+        if threading.current_thread() is not self.main_thread:
+            self.post_ui('log', message)
+            return
         self.log_text.insert("end", f"{message}\n")
         self.log_text.see("end")
         
+    def post_ui(self, kind, payload=None):
+        """从工作线程提交界面更新：log（日志）、rows（条目列表）、progress（进度）、call（函数）"""
+        self.ui_queue.put((kind, payload))
+        
+    def process_ui_queue(self):
+        """在主线程中处理界面更新队列，同一行的多次更新合并为一次"""
+        logs = []
+        rows = {}
+        progress = None
+        calls = []
+        try:
+            for _ in range(UI_MAX_MESSAGES):
+                kind, payload = self.ui_queue.get_nowait()
+                if kind == 'log':
+                    logs.append(payload)
+                elif kind == 'rows':
+                    for entry in payload:
+                        item = self.entry_items.get(id(entry))
+                        if item is not None:
+                            rows[item] = entry
+                elif kind == 'progress':
+                    progress = payload
+                elif kind == 'call':
+                    calls.append(payload)
+        except queue.Empty:
+            pass
+            
+        try:
+            if logs:
+                self.log_text.insert("end", "".join(f"{message}\n" for message in logs))
+                self.log_text.see("end")
+            for item, entry in rows.items():
+                self.tree.item(item, values=(entry.msgid, entry.msgstr))
+            if rows:
+                self.tree.see(item)  # 滚动到最后更新的行
+            if progress is not None:
+                self.progress_var.set(progress)
+        finally:
+            # 先安排下一次处理，对话框等阻塞调用不会中断队列处理
+            self.root.after(UI_POLL_INTERVAL, self.process_ui_queue)
+            
+        for func in calls:
+            func()
+        
     def select_file(self):
         """选择要翻译的文件"""
         file_path = filedialog.askopenfilename(
@@ -138,38 +249,88 @@ class TranslatorApp:
             self.log_message(f"已选择文件: {file_path}")
             self.load_file()
             
+    def select_reference_file(self):
+        """选择参考译文（增量模式下复用其中相同原文的译文）"""
+        file_path = filedialog.askopenfilename(
+            filetypes=[("PO files", "*.po"), ("MO files", "*.mo")]
+        )
+        if file_path:
+            self.reference_file = file_path
+            self.incremental_var.set(True)
+            self.log_message(f"已选择参考译文: {file_path}")
+            
     def load_file(self):
-        """加载PO/MO文件内容"""
+        """在后台线程中加载PO/MO文件内容，加载进度显示在日志中"""
+        self.load_generation += 1
+        self.po_file = None
+        self.display_entries = []
+        self.item_entries = {}
+        self.entry_items = {}
+        self.tree.delete(*self.tree.get_children())
+        
+        threading.Thread(
+            target=self.parse_file, args=(self.current_file, self.load_generation), daemon=True
+        ).start()
+        
+    def parse_file(self, filepath, generation):
+        """解析文件（在后台线程中运行），完成后交给主线程显示"""
         try:
-            # 判断文件类型并加载
-            is_mo = self.current_file.endswith('.mo')
-            if is_mo:
-                self.po_file = polib.mofile(self.current_file)
+            if filepath.endswith('.mo'):
+                catalog = read_mofile(filepath)
                 self.log_message("已加载MO文件，将在保存时自动转换为对应格式")
             else:
-                self.po_file = polib.pofile(self.current_file)
+                # PO文件分块解析以便报告进度，各块的条目合并到第一个块（包含文件头）中
+                total = estimate_entries(filepath)
+                catalog = None
+                for chunk in read_po_chunks(filepath):
+                    if generation != self.load_generation:
+                        return
+                    if catalog is None:
+                        catalog = chunk
+                    else:
+                        catalog.extend(chunk)
+                    self.log_message(f"正在加载: {len(catalog)}/{total} 个条目")
+                if catalog is None:
+                    catalog = polib.pofile(filepath)
                 self.log_message("已加载PO文件")
                 
-            # 清空现有表格内容
-            for item in self.tree.get_children():
-                self.tree.delete(item)
-                
-            # 加载内容到表格
-            for entry in self.po_file:
-                if entry.msgid:
-                    self.tree.insert("", "end", values=(entry.msgid, entry.msgstr))
-                    
-            self.log_message(f"成功加载了 {len(self.po_file)} 个翻译条目")
+            self.post_ui('call', lambda: self.show_file(catalog, generation))
         except Exception as e:
-            self.log_message(f"加载文件时出错: {str(e)}")
-            messagebox.showerror("错误", f"加载文件时出错: {str(e)}")
+            error = str(e)
+            self.log_message(f"加载文件时出错: {error}")
+            self.post_ui('call', lambda: messagebox.showerror("错误", f"加载文件时出错: {error}"))
+            
+    def show_file(self, catalog, generation):
+        """显示加载完成的文件（在主线程中运行）"""
+        if generation != self.load_generation:
+            return
+        self.po_file = catalog
+        self.display_entries = [entry for entry in catalog if entry.msgid]
+        self.show_more_rows()
+        self.log_message(f"成功加载了 {len(catalog)} 个翻译条目")
+        
+    def show_more_rows(self):
+        """创建下一批表格行，同时建立行与条目的索引"""
+        start = len(self.item_entries)
+        for entry in self.display_entries[start:start + ROW_PAGE_SIZE]:
+            item = self.tree.insert("", "end", values=(entry.msgid, entry.msgstr))
+            self.item_entries[item] = entry
+            self.entry_items[id(entry)] = item
             
     def start_translation(self):
         """开始翻译过程"""
         if not self.current_file:
             messagebox.showwarning("警告", "请先选择要翻译的文件")
             return
+        if self.po_file is None:
+            messagebox.showwarning("警告", "文件仍在加载中，请稍候")
+            return
             
+        # 工作线程中不读取Tk变量，目标语言、增量模式和是否跟踪在这里确定
+        self.dest = self.dest_var.get().strip() or TARGET_LANG
+        incremental = self.incremental_var.get()
+        self.tracer = Tracer(os.path.basename(self.current_file)) if self.trace_var.get() else None
+        
         # 重置计数器和开始时间
         self.processed_entries = 0
         self.translation_start_time = time.time()
@@ -183,7 +344,7 @@ class TranslatorApp:
         self.update_time_estimate()
         
         # 在新线程中执行翻译
-        threading.Thread(target=self.translate_content, daemon=True).start()
+        threading.Thread(target=self.translate_content, args=(incremental,), daemon=True).start()
 
     def update_time_estimate(self):
         """更新预计完成时间"""
@@ -264,80 +425,107 @@ class TranslatorApp:
             if self.translation_start_time:
                 self.root.after(1000, self.update_time_estimate)
 
-    def translate_content(self):
-        """执行翻译过程"""
+    def translate_content(self, incremental=False):
+        """执行翻译过程；incremental 为是否只翻译未翻译和模糊的条目"""
+        # 跟踪记录写入本次翻译的 Tracer（未开启时为 None）
+        current_tracer.set(self.tracer)
         try:
-            entries = [entry for entry in self.po_file if entry.msgid]
-            total = len(entries)
-            batch_size = 2000  # 每批翻译的字符数限制
-            current_batch = []
-            current_batch_chars = 0
-            
-            for i, entry in enumerate(entries):
-                # 更新进度条
-                self.progress_var.set((i / total) * 100)
-                self.root.update_idletasks()
+            all_entries = [entry for entry in self.po_file if entry.msgid]
+            total = len(all_entries)
+            
+            # 增量模式：跳过已翻译的条目，并复用参考译文
+            candidates = all_entries
+            if incremental:
+                with span('select_entries', 'prepare'):
+                    reference = load_reference(self.reference_file) if self.reference_file else None
+                    candidates, skipped, reused = select_entries(all_entries, reference)
+                self.log_message(f"增量翻译：跳过已翻译的 {skipped} 个条目，复用参考译文 {reused} 个")
+                if reused:
+                    self.refresh_table()
+            
+            # 只有占位符、网址、数字等的条目译文与原文相同，在本地处理
+            with span('filter_entries', 'prepare', entries=len(candidates)):
+                candidates, filtered = filter_entries(candidates)
+            if filtered:
+                self.log_message(f"本地处理无需翻译的 {sum(filtered.values())} 个条目（{describe_skipped(filtered)}）")
+                self.refresh_table()
+            
+            # 先查询翻译记忆库，命中的条目无需再请求翻译服务
+            with span('memory_lookup', 'prepare', entries=len(candidates)):
+                entries = self.translation_memory.lookup(candidates, SOURCE_LANG, self.dest, self.translator.name)
+            self.cache_hits = len(candidates) - len(entries)
+            self.cache_misses = len(entries)
+            self.processed_entries = total - len(entries)
+            self.fallbacks = 0
+            self.rebatched_entries = 0
+            self.log_message(f"翻译记忆命中 {self.cache_hits} 个条目，需要在线翻译 {self.cache_misses} 个条目")
+            if self.cache_hits:
+                self.refresh_table()
                 
-                if not entry.msgid.strip():
-                    continue
-                    
-                # 检查当前批次的字符数
-                if current_batch_chars + len(entry.msgid) > batch_size:
-                    # 翻译当前批次
-                    self.translate_batch(current_batch)
-                    current_batch = []
-                    current_batch_chars = 0
-                    
-                current_batch.append(entry)
-                current_batch_chars += len(entry.msgid)
+            # 合并原文相同的条目，每个原文只翻译一次
+            groups = [group for group in group_entries(entries) if group.msgid.strip()]
+            self.log_message(f"去重后需要翻译 {len(groups)} 个原文")
+            
+            # 按字符预算自适应打包批次
+            for batch in self.packer.pack(groups):
+                # 更新进度条（按原始条目数统计）
+                self.post_ui('progress', (self.processed_entries / total) * 100)
                 
-            # 翻译最后一批
-            if current_batch:
-                self.translate_batch(current_batch)
+                with span('batch', 'batch', entries=len(batch)):
+                    self.translate_batch(batch)
                 
-            self.progress_var.set(100)
+            self.post_ui('progress', 100)
             self.translation_start_time = None  # 停止时间更新
-            self.time_label.config(text="翻译完成")
-            self.log_message("翻译完成")
-            messagebox.showinfo("完成", "翻译已完成")
+            self.post_ui('call', lambda: self.time_label.config(text="翻译完成"))
+            self.log_message(f"翻译完成（缓存命中 {self.cache_hits}，未命中 {self.cache_misses}）")
+            if self.fallbacks:
+                self.log_message(f"译文分段不匹配 {self.fallbacks} 次，重新翻译了 {self.rebatched_entries} 个条目")
+            if self.tracer is not None:
+                self.log_message("已记录性能跟踪，可点击日志面板下方的“导出性能跟踪”保存")
+            self.post_ui('call', lambda: messagebox.showinfo("完成", "翻译已完成"))
             
         except Exception as e:
             self.log_message(f"翻译过程中出错: {str(e)}")
-            messagebox.showerror("错误", f"翻译过程中出错: {str(e)}")
+            error = str(e)
+            self.post_ui('call', lambda: messagebox.showerror("错误", f"翻译过程中出错: {error}"))
             
     def translate_with_retry(self, text, max_retries=3, delay=1):
-        """带重试机制的翻译函数"""
+        """带重试机制的翻译函数，重试间隔按指数退避"""
         for attempt in range(max_retries):
             try:
-                return self.translator.translate(text, dest='zh-cn')
+                with span('circuit_wait', 'wait'):
+                    circuit_wait = self.circuit_breaker.wait()
+                if circuit_wait > 0:
+                    self.log_message("翻译服务熔断结束，继续翻译")
+                with span('throttle_wait', 'wait'):
+                    self.rate_limiter.acquire()
+                with span('backend_request', 'request', chars=len(text), dest=self.dest):
+                    translated_text = self.translator.translate(text, dest=self.dest, src=SOURCE_LANG)
+                self.circuit_breaker.record_success()
+                return translated_text
             except (SSLError, ConnectionError, Exception) as e:
+                self.circuit_breaker.record_failure()
                 if attempt == max_retries - 1:  # 最后一次尝试
                     raise
                 self.log_message(f"翻译出错 (尝试 {attempt + 1}/{max_retries}): {str(e)}")
-                time.sleep(delay)  # 等待一段时间后重试
-                # 重新初始化翻译器
-                self.init_translator()
+                with span('retry_backoff', 'wait', retry=attempt + 1):
+                    time.sleep(backoff_delay(attempt, delay))  # 等待一段时间后重试
+                # 翻译器长期复用，出错的连接由其连接池自动重建，无需重新初始化
                 
     def translate_batch(self, entries):
-        """批量翻译条目"""
+        """批量翻译条目（每项为原文相同的一组条目）"""
         try:
-            # 使用不太可能出现在正常文本中的分隔符
-            separator = "\n=+=+=+=+=\n"  # 使用多个特殊字符组合作为分隔符
-            
-            # 组合文本时添加索引标记
-            combined_texts = []
-            for i, entry in enumerate(entries):
-                # 在每个文本前添加索引标记
-                marked_text = f"[{i}]{entry.msgid}"
-                combined_texts.append(marked_text)
-            
-            combined_text = separator.join(combined_texts)
+            # 组合文本时添加索引标记，占位符和标记替换为编号标记以免被翻译服务改写
+            masks = [mask(entry.msgid) for entry in entries]
+            combined_text = build_batch_text([text for text, _ in masks])
             
             # 执行翻译（带重试机制）
             try:
-                translation = self.translate_with_retry(combined_text)
-                translated_text = translation.text
+                request_start = time.time()
+                translated_text = self.translate_with_retry(combined_text)
+                request_latency = time.time() - request_start
             except Exception as e:
+                self.packer.record_failure()
                 self.log_message(f"翻译失败，尝试减小批量大小重新翻译: {str(e)}")
                 # 如果批量翻译失败，将批次分成两半重试
                 if len(entries) > 1:
@@ -348,45 +536,60 @@ class TranslatorApp:
                 else:
                     raise
             
-            # 分割并处理翻译结果
-            translated_parts = translated_text.split(separator)
+            # 按索引标记解析译文并还原占位符，能匹配上的部分直接保留
+            translated_parts = unmask_parts(parse_batch_reply(translated_text or '', len(entries)), masks)
+            missing = [entry for i, entry in enumerate(entries) if i not in translated_parts]
             
-            # 验证翻译结果数量
-            if len(translated_parts) != len(entries):
-                self.log_message(f"警告：翻译结果数量不匹配（原文：{len(entries)}，译文：{len(translated_parts)}）")
-                # 如果数量不匹配，尝试减小批量重新翻译
-                if len(entries) > 1:
-                    mid = len(entries) // 2
-                    self.translate_batch(entries[:mid])
-                    self.translate_batch(entries[mid:])
-                    return
+            if missing:
+                self.packer.record_mismatch()
+                self.fallbacks += 1
+                self.rebatched_entries += len(missing)
+                self.log_message(f"警告：翻译结果数量不匹配（原文：{len(entries)}，匹配：{len(translated_parts)}），重新翻译缺失的条目")
+                if len(missing) == len(entries):
+                    # 译文完全无法解析时，将批次分成两半重试
+                    if len(entries) > 1:
+                        mid = len(entries) // 2
+                        self.translate_batch(entries[:mid])
+                        self.translate_batch(entries[mid:])
+                        return
+                    # 单个条目丢失了索引标记或占位符，直接翻译原文
+                    translated_parts = {0: self.translate_with_retry(entries[0].msgid).strip()}
+                    missing = []
+            else:
+                self.packer.record_success(request_latency, len(combined_text))
             
             # 处理每个翻译结果
-            for i, (entry, translated_part) in enumerate(zip(entries, translated_parts)):
-                # 去除可能的索引标记和空白
-                cleaned_text = translated_part.strip()
-                if cleaned_text.startswith(f"[{i}]"):
-                    cleaned_text = cleaned_text[len(f"[{i}]"):].strip()
-                
-                # 更新PO文件和表格
-                entry.msgstr = cleaned_text
-                
-                # 更新表格显示
-                for item in self.tree.get_children():
-                    if self.tree.item(item)['values'][0] == entry.msgid:
-                        self.tree.item(item, values=(entry.msgid, cleaned_text))
-                        self.tree.see(item)  # 滚动到当前项
-                        break
+            matched = []
+            for i, cleaned_text in translated_parts.items():
+                # 更新PO文件（同步到组内所有条目）
+                entries[i].msgstr = cleaned_text
+                matched.append(entries[i])
+            
+            # 更新表格显示，重复原文对应的所有行一并更新
+            batch_entries = expand_groups(matched)
+            self.post_ui('rows', batch_entries)
+            
+            # 写入翻译记忆库
+            with span('store_batch', 'save', entries=len(batch_entries)):
+                self.translation_memory.store(batch_entries, SOURCE_LANG, self.dest, self.translator.name)
             
             # 更新已处理的条目数
-            self.processed_entries += len(entries)
+            self.processed_entries += len(batch_entries)
             
-            self.log_message(f"成功翻译了 {len(entries)} 个条目")
+            self.log_message(f"成功翻译了 {len(batch_entries)} 个条目")
+            
+            # 只重新翻译缺失的条目
+            if missing:
+                self.translate_batch(missing)
             
         except Exception as e:
             self.log_message(f"批量翻译时出错: {str(e)}")
             raise
             
+    def refresh_table(self):
+        """刷新表格中所有行的译文（可在任意线程中调用）"""
+        self.post_ui('rows', self.display_entries)
+            
     def edit_cell(self, event):
         """处理单元格编辑"""
         item = self.tree.selection()[0]
@@ -404,20 +607,38 @@ class TranslatorApp:
             def save_edit(event):
                 new_text = entry_edit.get()
                 self.tree.set(item, column="#2", value=new_text)
-                # 更新PO文件中的译文
-                for entry in self.po_file:
-                    if entry.msgid == value[0]:
-                        entry.msgstr = new_text
-                        break
+                # 更新PO文件中该行对应条目的译文
+                self.item_entries[item].msgstr = new_text
                 entry_edit.destroy()
                 
             entry_edit.bind('<Return>', save_edit)
             entry_edit.bind('<FocusOut>', save_edit)
             entry_edit.focus()
             
+    def export_trace(self):
+        """把最近一次翻译的性能跟踪导出为 Chrome/Perfetto 跟踪文件"""
+        if self.tracer is None:
+            messagebox.showwarning("警告", "没有性能跟踪记录，请勾选“性能跟踪”后开始翻译")
+            return
+            
+        save_path = filedialog.asksaveasfilename(
+            initialfile="trace.json",
+            filetypes=[("跟踪文件", "*.json")],
+            defaultextension=".json"
+        )
+        if not save_path:
+            return
+            
+        try:
+            self.tracer.save(save_path)
+            self.log_message(f"性能跟踪已导出至: {save_path}（可在 ui.perfetto.dev 或 chrome://tracing 中打开）")
+        except Exception as e:
+            self.log_message(f"导出性能跟踪时出错: {str(e)}")
+            messagebox.showerror("错误", f"导出性能跟踪时出错: {str(e)}")
+            
     def save_file(self):
         """保存翻译后的文件"""
-        if not self.current_file:
+        if not self.current_file or self.po_file is None:
             messagebox.showwarning("警告", "没有打开的文件")
             return
             
@@ -431,7 +652,7 @@ class TranslatorApp:
             file_types = [("PO 文件", "*.po"), ("MO 文件", "*.mo")]
             save_path = filedialog.asksaveasfilename(
                 initialdir=directory,
-                initialfile=f"{base}_zh{ext}",
+                initialfile=f"{base}_{'zh' if self.dest == TARGET_LANG else self.dest}{ext}",
                 filetypes=file_types,
                 defaultextension=ext
             )
@@ -442,10 +663,14 @@ class TranslatorApp:
             # 根据选择的文件类型保存
             if save_path.endswith('.mo'):
                 self.log_message("正在保存为MO格式...")
-                self.po_file.save_as_mofile(save_path)
+                # 写出带哈希表的MO文件，运行时查找无需二分搜索
+                write_mofile(self.po_file, save_path)
             else:
                 self.log_message("正在保存为PO格式...")
-                self.po_file.save(save_path)
+                if isinstance(self.po_file, MOCatalog):
+                    self.po_file.save_as_pofile(save_path)
+                else:
+                    self.po_file.save(save_path)
             
             self.log_message(f"文件已保存至: {save_path}")
             messagebox.showinfo("成功", f"文件已保存至:\n{save_path}")
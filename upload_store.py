@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+
+from checkpoint import file_digest, settings_key
+
+HASH_PATTERN = re.compile(r'[0-9a-f]{64}')
+
+
+class UploadStore:
+    """按内容寻址的上传文件和翻译结果存储
+
+    上传文件边写入磁盘边计算 SHA-256，保存为 blobs/<哈希><扩展名>，
+    同名文件不会互相覆盖，内容相同的文件只保存一份。
+    翻译结果按 (输入哈希, 目标语言, 引擎设置) 建立索引，
+    再次提交相同内容时直接返回已有的结果。
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.blob_folder = os.path.join(folder, 'blobs')
+        self.result_folder = os.path.join(folder, 'results')
+        os.makedirs(self.blob_folder, exist_ok=True)
+        os.makedirs(self.result_folder, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(folder, 'index.sqlite3'), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                input_hash TEXT NOT NULL,
+                dest TEXT NOT NULL,
+                settings TEXT NOT NULL,
+                output_path TEXT NOT NULL,
+                output_filename TEXT NOT NULL,
+                summary TEXT NOT NULL,
+                created REAL NOT NULL,
+                PRIMARY KEY (input_hash, dest, settings)
+            )
+        """)
+        self._conn.commit()
+
+    def _blob_path(self, digest, filename):
+        ext = os.path.splitext(filename)[1].lower()
+        return os.path.join(self.blob_folder, f"{digest}{ext}")
+
+    def save_stream(self, stream, filename, chunk_size=1024 * 1024):
+        """边写入边计算哈希，返回 (哈希, 存储路径)"""
+        digest = hashlib.sha256()
+        temp_path = os.path.join(self.blob_folder, f".{uuid.uuid4().hex}.tmp")
+        try:
+            with open(temp_path, 'wb') as f:
+                for chunk in iter(lambda: stream.read(chunk_size), b''):
+                    digest.update(chunk)
+                    f.write(chunk)
+            return self._commit_blob(temp_path, digest.hexdigest(), filename)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def add_file(self, path, filename):
+        """把已写入磁盘的文件（如分块上传的结果）移入存储，返回 (哈希, 存储路径)"""
+        return self._commit_blob(path, file_digest(path), filename)
+
+    def _commit_blob(self, temp_path, digest, filename):
+        blob_path = self._blob_path(digest, filename)
+        if os.path.exists(blob_path):
+            # 相同内容已存在，只更新修改时间
+            os.utime(blob_path)
+            os.remove(temp_path)
+        else:
+            os.replace(temp_path, blob_path)
+        return digest, blob_path
+
+    def digest_of(self, path):
+        """文件的内容哈希；存储中的文件直接取自文件名"""
+        name = os.path.splitext(os.path.basename(path))[0]
+        if os.path.dirname(os.path.abspath(path)) == os.path.abspath(self.blob_folder) and HASH_PATTERN.fullmatch(name):
+            return name
+        return file_digest(path)
+
+    def resolve(self, handle, extensions=('.po', '.mo')):
+        """把上传返回的文件路径或哈希解析为存储中的文件路径；不是存储中的文件时返回 None"""
+        if not isinstance(handle, str):
+            return None
+        if HASH_PATTERN.fullmatch(handle):
+            candidates = [os.path.join(self.blob_folder, f"{handle}{ext}") for ext in extensions]
+        else:
+            path = os.path.abspath(handle)
+            name, ext = os.path.splitext(os.path.basename(path))
+            if (os.path.dirname(path) != os.path.abspath(self.blob_folder) or not HASH_PATTERN.fullmatch(name)
+                    or ext not in extensions):
+                return None
+            candidates = [path]
+        for path in candidates:
+            if os.path.isfile(path):
+                return path
+        return None
+
+    def find_result(self, input_hash, dest, settings):
+        """查找已有的翻译结果，返回 {'output_file', 'output_filename', 'summary'} 或 None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT output_path, output_filename, summary FROM results "
+                "WHERE input_hash = ? AND dest = ? AND settings = ?",
+                (input_hash, dest, settings_key(settings))
+            ).fetchone()
+        if row is None or not os.path.exists(row[0]):
+            return None
+        return {'output_file': row[0], 'output_filename': row[1], 'summary': json.loads(row[2])}
+
+    def store_result(self, input_hash, dest, settings, temp_output, output_filename, summary):
+        """把翻译结果移入存储并建立索引，返回存储路径"""
+        key = hashlib.sha256(f"{input_hash}\n{dest}\n{settings_key(settings)}".encode('utf-8')).hexdigest()
+        output_path = os.path.join(self.result_folder, f"{key}{os.path.splitext(output_filename)[1]}")
+        shutil.move(temp_output, output_path)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results "
+                "(input_hash, dest, settings, output_path, output_filename, summary, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (input_hash, dest, settings_key(settings), output_path, output_filename,
+                 json.dumps(summary, ensure_ascii=False), time.time())
+            )
+            self._conn.commit()
+        return output_path
+
+    def close(self):
+        with self._lock:
+            self._conn.close()